@@ -0,0 +1,853 @@
+import re  # 导入re模块，用于匹配请求路径
+import sys  # 导入系统模块，用于设置退出码和输出错误信息
+import json  # 导入json模块，用于编码请求和响应
+import base64  # 导入base64模块，用于编码分页游标
+import asyncio  # 导入asyncio模块，在一个线程中处理所有HTTP连接
+import datetime  # 导入datetime模块，用于解析和输出日期
+import threading  # 导入threading模块，用于线程本地的数据库连接和写入锁
+import traceback  # 导入traceback模块，用于输出未预料的错误
+import contextlib  # 导入contextlib模块，只读操作不需要写入锁
+from http import HTTPStatus  # 导入HTTPStatus，用于生成状态行
+from collections import namedtuple  # 导入namedtuple，用于定义请求类型
+from concurrent.futures import ThreadPoolExecutor  # 导入线程池，数据库操作在线程池中执行
+from urllib.parse import urlsplit, parse_qs  # 导入URL解析函数
+
+from sqlalchemy import Date, DateTime  # 导入日期和时间类型，解析游标中的排序键值
+from sqlalchemy.exc import IntegrityError, OperationalError  # 导入数据库异常，分别映射为409和503
+
+from models.database import engine, SessionLocal, API_DEFAULT_WORKERS  # 导入数据库引擎、会话工厂和默认的线程数
+from models.service import TaskService  # 导入业务操作，API与界面和命令行执行相同的操作
+from models.models import PriorityEnum, TASK_SORT_KEYS, task_row, sort_key_value  # 导入优先级、排序键和行转换函数
+from models.smart_lists import SMART_LISTS  # 导入智能列表的定义
+
+# HTTP/JSON API服务器
+# 不依赖图形界面，供团队的看板等程序读写任务和分类：
+#   python -m todo serve --port 8080 --workers 8
+#
+# 所有连接由asyncio在一个线程中处理，HTTP/1.1连接保持打开，一个连接可以发送多个请求。
+# 数据库操作在固定大小的线程池中执行，每个线程在第一次使用时从引擎的连接池取出一个连接并一直持有，
+# 每个请求是该连接上的一个独立的工作单元。SQLite同一时间只允许一个写事务，
+# 写操作在线程之间用一个锁串行执行，读操作在WAL模式下互不阻塞。
+# GET请求的响应按数据库的PRAGMA data_version缓存，任何连接提交修改后缓存立即失效，
+# 重复的读请求不进入线程池，也不执行查询。
+#
+# 接口(请求和响应都是JSON)：
+#   GET    /categories                 所有分类及其任务数
+#   POST   /categories                 创建分类 {"name", "icon", "color"}
+#   GET    /categories/{id}            获取分类
+#   PATCH  /categories/{id}            修改分类的部分字段
+#   DELETE /categories/{id}            删除分类及其所有任务
+#   GET    /tasks                      列出任务，查询参数见list_tasks()
+#   POST   /tasks                      创建任务 {"title", "description", "priority", "category_id", "due_date"}
+#   GET    /tasks/{id}                 获取任务(包括描述)
+#   PATCH  /tasks/{id}                 修改任务的部分字段，还可以修改completed
+#   DELETE /tasks/{id}                 删除任务
+#   POST   /tasks/bulk                 批量操作 {"action", "ids", "value"}
+
+# 默认监听的地址和端口
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+
+# 缓存的GET响应数上限，达到上限时清空
+CACHE_SIZE = 10000
+
+# 列出任务时每页的默认和最多任务数
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# 一次批量操作最多的任务数
+MAX_BULK_IDS = 10000
+
+# 请求体的最大字节数
+MAX_BODY_SIZE = 1024 * 1024
+
+# 请求行和每个请求头的最大字节数，超过时asyncio.StreamReader.readline()抛出ValueError
+MAX_LINE_SIZE = 16 * 1024
+
+# 任务可以创建和修改的字段
+TASK_FIELDS = {"title", "description", "priority", "completed", "due_date", "category_id"}
+
+# 优先级的取值
+PRIORITIES = [priority.value for priority in PriorityEnum]
+
+# 分类可以创建和修改的字段
+CATEGORY_FIELDS = {"name", "icon", "color"}
+
+# 一个HTTP请求，params是路径中的参数
+Request = namedtuple("Request", ["method", "path", "query", "body", "params"])
+
+class ApiError(Exception):
+    """
+    返回给客户端的错误
+
+    status是HTTP状态码，消息作为响应中的error字段
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class DbPool:
+    """
+    执行数据库操作的线程池
+
+    每个线程持有一个固定的连接，避免每个请求都从连接池取出和归还连接；
+    连接在线程第一次执行操作时建立，关闭线程池时一起关闭
+    """
+    def __init__(self, workers=API_DEFAULT_WORKERS):
+        """
+        创建线程池
+
+        参数:
+            workers: 线程数，也是同时执行的数据库操作数
+        """
+        self.local = threading.local()
+        self.connections = []  # 所有线程的连接，关闭时使用
+        self.connections_lock = threading.Lock()
+        # SQLite同一时间只有一个写事务：先读后写的事务在其他连接提交后无法升级为写事务，
+        # 写操作在这里排队，不会因为并发的写入得到"database is locked"错误
+        self.write_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-db")
+
+    def connection(self):
+        """获取当前线程的连接，第一次调用时建立"""
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = engine.connect()
+            self.local.connection = connection
+            with self.connections_lock:
+                self.connections.append(connection)
+        return connection
+
+    def call(self, fn, write):
+        """
+        在当前线程中执行一个工作单元
+
+        参数:
+            fn: 函数fn(service)，返回值不应是绑定到会话的对象
+            write: 是否是写操作
+
+        返回:
+            fn的返回值，成功时提交，出错时回滚
+        """
+        db = SessionLocal(bind=self.connection(), expire_on_commit=False)
+        try:
+            with self.write_lock if write else contextlib.nullcontext():
+                result = fn(TaskService(db))
+                db.commit()
+            return result
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def run(self, fn, write=False):
+        """
+        在线程池中执行数据库操作，等待结果时不阻塞事件循环
+
+        参数:
+            fn: 函数fn(service)
+            write: 是否是写操作
+
+        返回:
+            fn的返回值
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.call, fn, write)
+
+    def close(self):
+        """等待正在执行的操作完成，然后关闭所有连接"""
+        self.executor.shutdown(wait=True)
+        for connection in self.connections:
+            connection.close()
+        self.connections.clear()
+
+class ResponseCache:
+    """
+    GET响应的缓存
+
+    缓存的是编码后的响应体，命中时不进入线程池，也不编码JSON。
+    专用连接上的PRAGMA data_version在任何其他连接提交事务后都会变化，
+    包括本服务器的数据库线程和其他程序，这时所有缓存的响应失效；
+    读取它不读取任何表，只需几微秒，因此在事件循环中直接执行。
+    智能列表与当天的日期有关，日期也是版本的一部分
+    """
+    def __init__(self, max_entries=CACHE_SIZE):
+        """
+        初始化缓存，从连接池取出一个专用连接
+
+        参数:
+            max_entries: 缓存的响应数上限
+        """
+        self.connection = engine.raw_connection()
+        self.max_entries = max_entries
+        self.version = None  # 当前缓存对应的版本
+        self.entries = {}  # 请求目标(路径和查询参数) -> 响应体
+
+    def check(self):
+        """
+        读取当前的版本，版本变化时清空缓存
+
+        返回:
+            (data_version, 当天的日期)
+        """
+        data_version = self.connection.driver_connection.execute("PRAGMA data_version").fetchone()[0]
+        version = (data_version, datetime.date.today())
+        if version != self.version:
+            self.version = version
+            self.entries.clear()
+        return version
+
+    def get(self, target):
+        """
+        查找缓存的响应
+
+        参数:
+            target: 请求目标
+
+        返回:
+            (版本, 响应体)，没有缓存时响应体为None。版本在执行查询前读取，传给put()
+        """
+        version = self.check()
+        return version, self.entries.get(target)
+
+    def put(self, target, version, body):
+        """
+        保存响应
+
+        参数:
+            target: 请求目标
+            version: 执行查询前get()返回的版本
+            body: 响应体
+
+        作用:
+            查询期间有其他连接提交修改时版本已经变化，不保存可能过期的响应
+        """
+        if version != self.check():
+            return
+        if len(self.entries) >= self.max_entries:
+            self.entries.clear()
+        self.entries[target] = body
+
+    def close(self):
+        """归还专用连接"""
+        self.connection.close()
+
+def encode(payload):
+    """把响应数据编码为JSON，None编码为空的响应体，已编码的响应体原样返回"""
+    if payload is None:
+        return b""
+    if isinstance(payload, bytes):
+        return payload
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+def format_date(value):
+    """把date或datetime转换为ISO格式的文本，值为空时返回None"""
+    return value.isoformat() if value is not None else None
+
+def task_json(row, description=None, include_description=False):
+    """
+    把TaskRow转换为响应中的任务
+
+    参数:
+        row: TaskRow元组
+        description: 任务描述
+        include_description: 是否包含描述，列表中的任务不包含描述
+
+    返回:
+        字典
+    """
+    task = {
+        "id": row.id,
+        "title": row.title,
+        "priority": row.priority,
+        "completed": bool(row.completed),
+        "due_date": format_date(row.due_date),
+        "created_at": format_date(row.created_at),
+        "completed_at": format_date(row.completed_at),
+        "category_id": row.category_id,
+    }
+    if include_description:
+        task["description"] = description
+    return task
+
+def category_json(row, counts=None):
+    """
+    把(分类ID, 名称, 图标, 颜色)转换为响应中的分类
+
+    参数:
+        row: list_category_rows()返回的一行
+        counts: [未完成任务数, 全部任务数]，没有任务的分类为None
+
+    返回:
+        字典
+    """
+    open_count, total = counts or (0, 0)
+    return {"id": row[0], "name": row[1], "icon": row[2], "color": row[3], "open": open_count, "total": total}
+
+def parse_int(value, name):
+    """把查询参数或字段转换为整数，无效时抛出ApiError"""
+    if isinstance(value, bool):
+        raise ApiError(400, f"{name} must be an integer")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"{name} must be an integer") from None
+
+def parse_bool(value, name):
+    """把查询参数转换为布尔值，接受true/false/1/0"""
+    text = str(value).lower()
+    if text in ("true", "1"):
+        return True
+    if text in ("false", "0"):
+        return False
+    raise ApiError(400, f"{name} must be true or false")
+
+def parse_date(value, name):
+    """把YYYY-MM-DD格式的文本转换为date，值为None时返回None"""
+    if value is None:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"{name} must be a date in YYYY-MM-DD format") from None
+
+def encode_cursor(sort, row):
+    """
+    生成从某一行之后继续分页的游标
+
+    参数:
+        sort: 排序键名称
+        row: 一页中的最后一行
+
+    返回:
+        [排序键值, 任务ID]的JSON经过URL安全的base64编码的文本，日期和时间编码为ISO格式
+    """
+    cursor = json.dumps([sort_key_value(sort, row), row.id], ensure_ascii=False, default=format_date)
+    return base64.urlsafe_b64encode(cursor.encode("utf-8")).decode("ascii").rstrip("=")
+
+def parse_cursor(value, sort):
+    """
+    解析encode_cursor()生成的游标
+
+    参数:
+        value: 游标文本
+        sort: 排序键名称，必须与生成游标时相同
+
+    返回:
+        (锚点任务ID, 排序键值)，无效时抛出ApiError
+    """
+    try:
+        key_value, task_id = json.loads(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+        key_type = TASK_SORT_KEYS[sort].type
+        if isinstance(key_type, DateTime):
+            key_value = datetime.datetime.fromisoformat(key_value)
+        elif isinstance(key_type, Date):
+            key_value = datetime.date.fromisoformat(key_value)
+        return parse_int(task_id, "cursor"), key_value
+    except (TypeError, ValueError, ApiError):
+        raise ApiError(400, "cursor is invalid") from None
+
+def read_json(request):
+    """
+    解析请求体
+
+    返回:
+        JSON对象(字典)，请求体不是JSON对象时抛出ApiError
+    """
+    try:
+        body = json.loads(request.body or b"null")
+    except ValueError:
+        raise ApiError(400, "request body is not valid JSON") from None
+    if not isinstance(body, dict):
+        raise ApiError(400, "request body must be a JSON object")
+    return body
+
+def task_values(body, allowed=TASK_FIELDS):
+    """
+    检查并转换请求中的任务字段
+
+    参数:
+        body: 请求的JSON对象
+        allowed: 允许的字段
+
+    返回:
+        字典{字段: 值}，只包含请求中给出的字段
+    """
+    unknown = set(body) - allowed
+    if unknown:
+        raise ApiError(400, f"unknown fields: {', '.join(sorted(unknown))}")
+    values = {}
+    for name, value in body.items():
+        if name == "title":
+            if not isinstance(value, str) or not value.strip():
+                raise ApiError(400, "title must be a non-empty string")
+            value = value.strip()
+        elif name == "description":
+            if value is not None and not isinstance(value, str):
+                raise ApiError(400, "description must be a string")
+        elif name == "priority":
+            if value not in PRIORITIES:
+                raise ApiError(400, f"priority must be one of {', '.join(PRIORITIES)}")
+        elif name == "completed":
+            if not isinstance(value, bool):
+                raise ApiError(400, "completed must be true or false")
+        elif name == "due_date":
+            value = parse_date(value, name)
+        elif name == "category_id":
+            value = None if value is None else parse_int(value, name)
+        values[name] = value
+    return values
+
+def category_values(body):
+    """
+    检查请求中的分类字段
+
+    返回:
+        字典{字段: 值}，只包含请求中给出的字段
+    """
+    unknown = set(body) - CATEGORY_FIELDS
+    if unknown:
+        raise ApiError(400, f"unknown fields: {', '.join(sorted(unknown))}")
+    for name, value in body.items():
+        if name == "name" and (not isinstance(value, str) or not value.strip()):
+            raise ApiError(400, "name must be a non-empty string")
+        if value is not None and not isinstance(value, str):
+            raise ApiError(400, f"{name} must be a string")
+    return {name: value.strip() if name == "name" else value for name, value in body.items()}
+
+def check_category(service, category_id):
+    """分类ID不为空且分类不存在时抛出ApiError，在工作单元中调用"""
+    if category_id is not None and service.get_category(category_id) is None:
+        raise ApiError(400, f"category {category_id} does not exist")
+
+def task_detail(service, task_id):
+    """
+    读取任务及其描述，在工作单元中调用
+
+    返回:
+        响应中的任务，不存在时抛出ApiError
+    """
+    task = service.get_task(task_id)
+    if task is None:
+        raise ApiError(404, f"task {task_id} not found")
+    return task_json(task_row(task), task.description, include_description=True)
+
+def category_detail(service, category_id):
+    """
+    读取分类及其任务数，在工作单元中调用
+
+    返回:
+        响应中的分类，不存在时抛出ApiError
+    """
+    rows = service.list_category_rows(category_id)
+    if not rows:
+        raise ApiError(404, f"category {category_id} not found")
+    return category_json(rows[0], service.category_counts([category_id]).get(category_id))
+
+def bulk_move(service, ids, category_id):
+    """批量移动任务，目标分类不存在时抛出ApiError"""
+    check_category(service, category_id)
+    return service.move_tasks(ids, category_id)
+
+# 批量操作：名称 -> (执行函数fn(service, ids, value), 检查并转换value的函数，不需要value时为None)
+BULK_ACTIONS = {
+    "complete": (lambda service, ids, value: service.set_completed(ids, True), None),
+    "reopen": (lambda service, ids, value: service.set_completed(ids, False), None),
+    "delete": (lambda service, ids, value: service.delete_tasks(ids), None),
+    "priority": (
+        lambda service, ids, value: service.set_priority(ids, value),
+        lambda value: task_values({"priority": value})["priority"],
+    ),
+    "move": (bulk_move, lambda value: task_values({"category_id": value})["category_id"]),
+}
+
+class ApiServer:
+    """
+    HTTP/JSON API
+
+    handle_connection()处理一个连接上的所有请求，按ROUTES找到处理方法；
+    处理方法是协程，在DbPool中执行数据库操作，返回(状态码, 响应数据)
+    """
+    # 路由表：(方法, 路径的正则表达式, 处理方法的名称)
+    ROUTES = [
+        ("GET", r"/categories", "list_categories"),
+        ("POST", r"/categories", "create_category"),
+        ("GET", r"/categories/(?P<id>\d+)", "get_category"),
+        ("PATCH", r"/categories/(?P<id>\d+)", "update_category"),
+        ("DELETE", r"/categories/(?P<id>\d+)", "delete_category"),
+        ("GET", r"/tasks", "list_tasks"),
+        ("POST", r"/tasks", "create_task"),
+        ("POST", r"/tasks/bulk", "bulk_tasks"),
+        ("GET", r"/tasks/(?P<id>\d+)", "get_task"),
+        ("PATCH", r"/tasks/(?P<id>\d+)", "update_task"),
+        ("DELETE", r"/tasks/(?P<id>\d+)", "delete_task"),
+    ]
+
+    def __init__(self, pool, cache=None):
+        """
+        初始化API
+
+        参数:
+            pool: 执行数据库操作的DbPool
+            cache: GET响应的ResponseCache，为None时不缓存
+        """
+        self.pool = pool
+        self.cache = cache
+        self.routes = [(method, re.compile(pattern + r"/?\Z"), getattr(self, name)) for method, pattern, name in self.ROUTES]
+
+    # ---------- HTTP ----------
+
+    async def handle_connection(self, reader, writer):
+        """
+        处理一个连接上的请求
+
+        作用:
+            HTTP/1.1默认保持连接，依次处理同一个连接上的多个请求；
+            客户端要求关闭、使用HTTP/1.0或请求格式错误时处理完当前请求后关闭连接
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    await self.send(writer, 400, {"error": "malformed request line"}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    length = -1
+                if length < 0 or length > MAX_BODY_SIZE:
+                    await self.send(writer, 413 if length > 0 else 400, {"error": "invalid Content-Length"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self.respond(method, target, body)
+                await self.send(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # 客户端断开连接，或请求行、请求头超过MAX_LINE_SIZE
+            pass
+        finally:
+            writer.close()
+
+    async def send(self, writer, status, payload, keep_alive=True):
+        """
+        发送响应
+
+        参数:
+            writer: 连接的StreamWriter
+            status: HTTP状态码
+            payload: 响应数据，为None时没有响应体(204)，也可以是已编码的响应体
+            keep_alive: 是否保持连接
+        """
+        body = encode(payload)
+        head = (
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def respond(self, method, target, body):
+        """
+        处理一个请求，GET请求先查找缓存
+
+        返回:
+            (状态码, 响应数据或已编码的响应体)
+        """
+        if method != "GET" or self.cache is None:
+            return await self.dispatch(method, target, body)
+        version, cached = self.cache.get(target)
+        if cached is not None:
+            return 200, cached
+        status, payload = await self.dispatch(method, target, body)
+        if status != 200:
+            return status, payload
+        encoded = encode(payload)
+        self.cache.put(target, version, encoded)
+        return status, encoded
+
+    async def dispatch(self, method, target, body):
+        """
+        按路由表调用处理方法
+
+        返回:
+            (状态码, 响应数据)，错误时响应数据是{"error": 消息}
+        """
+        url = urlsplit(target)
+        path_matched = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(url.path)
+            if match is None:
+                continue
+            path_matched = True
+            if route_method != method:
+                continue
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            request = Request(method, url.path, query, body, match.groupdict())
+            try:
+                return await handler(request)
+            except ApiError as error:
+                return error.status, {"error": str(error)}
+            except IntegrityError as error:
+                # 违反唯一约束，例如分类重名
+                return 409, {"error": str(error.orig)}
+            except OperationalError as error:
+                # 其他程序长时间持有写锁
+                return 503, {"error": str(error.orig)}
+            except Exception:
+                traceback.print_exc()
+                return 500, {"error": "internal server error"}
+        if path_matched:
+            return 405, {"error": f"method {method} not allowed"}
+        return 404, {"error": "not found"}
+
+    # ---------- 分类 ----------
+
+    async def list_categories(self, request):
+        """列出所有分类，每个分类包括未完成任务数(open)和全部任务数(total)"""
+        def fetch(service):
+            return service.list_category_rows(), service.category_counts()
+        rows, counts = await self.pool.run(fetch)
+        return 200, {"items": [category_json(row, counts.get(row[0])) for row in rows]}
+
+    async def get_category(self, request):
+        """获取一个分类"""
+        category_id = int(request.params["id"])
+        return 200, await self.pool.run(lambda service: category_detail(service, category_id))
+
+    async def create_category(self, request):
+        """创建分类，名称必须唯一，重名时返回409"""
+        values = category_values(read_json(request))
+        if "name" not in values:
+            raise ApiError(400, "name is required")
+
+        def create(service):
+            category_id = service.create_category(
+                values["name"], values.get("icon"), values.get("color") or "#3498db"
+            )
+            return category_detail(service, category_id)
+        return 201, await self.pool.run(create, write=True)
+
+    async def update_category(self, request):
+        """修改分类的部分字段"""
+        category_id = int(request.params["id"])
+        values = category_values(read_json(request))
+
+        def update(service):
+            category = service.get_category(category_id)
+            if category is None:
+                raise ApiError(404, f"category {category_id} not found")
+            service.update_category(
+                category_id,
+                values.get("name", category.name),
+                values.get("icon", category.icon),
+                values.get("color", category.color),
+            )
+            service.db.flush()
+            return category_detail(service, category_id)
+        return 200, await self.pool.run(update, write=True)
+
+    async def delete_category(self, request):
+        """删除分类，它的任务由数据库级联删除"""
+        category_id = int(request.params["id"])
+
+        def delete(service):
+            if service.get_category(category_id) is None:
+                raise ApiError(404, f"category {category_id} not found")
+            service.delete_category(category_id)
+        await self.pool.run(delete, write=True)
+        return 204, None
+
+    # ---------- 任务 ----------
+
+    async def list_tasks(self, request):
+        """
+        列出任务
+
+        查询参数:
+            category_id: 只列出该分类的任务
+            completed: true或false，按完成状态筛选
+            view: 智能列表的名称(SMART_LISTS)，跨越所有分类，不能与其他筛选和排序参数同时使用
+            sort: 排序键(TASK_SORT_KEYS)，默认按ID
+            desc: true时降序
+            limit: 每页的任务数，默认100，最多1000
+            cursor: 上一页响应中的next_cursor
+
+        返回:
+            {"items": 任务列表, "next_cursor": 下一页的游标，没有下一页时为null}
+
+        作用:
+            游标记录上一页最后一个任务的排序键值和ID，下一页直接从(排序键值, ID)在索引中的位置开始键集分页，
+            耗时与翻到第几页无关，也不需要查询该任务，该任务之后被删除或修改时照常继续
+        """
+        query = request.query
+        limit = parse_int(query.get("limit", DEFAULT_PAGE_SIZE), "limit")
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ApiError(400, f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+        view = query.get("view")
+        if view is not None:
+            if view not in SMART_LISTS:
+                raise ApiError(400, f"view must be one of {', '.join(SMART_LISTS)}")
+            if set(query) & {"category_id", "completed", "sort", "desc"}:
+                raise ApiError(400, "view cannot be combined with category_id, completed, sort or desc")
+            sort = SMART_LISTS[view].sort
+        else:
+            category_id = parse_int(query["category_id"], "category_id") if "category_id" in query else None
+            completed = parse_bool(query["completed"], "completed") if "completed" in query else None
+            sort = query.get("sort", "id")
+            if sort not in TASK_SORT_KEYS:
+                raise ApiError(400, f"sort must be one of {', '.join(TASK_SORT_KEYS)}")
+            descending = parse_bool(query.get("desc", "false"), "desc")
+        after, anchor_key = parse_cursor(query["cursor"], sort) if "cursor" in query else (None, None)
+
+        def fetch(service):
+            if view is not None:
+                return service.list_smart_rows(view, 0, limit, after=after, anchor_key=anchor_key)
+            return service.list_task_rows(
+                category_id, 0, limit, completed, sort=sort, descending=descending, after=after, anchor_key=anchor_key
+            )
+
+        rows = await self.pool.run(fetch)
+        next_cursor = encode_cursor(sort, rows[-1]) if len(rows) == limit else None
+        return 200, {"items": [task_json(row) for row in rows], "next_cursor": next_cursor}
+
+    async def get_task(self, request):
+        """获取一个任务，包括描述"""
+        task_id = int(request.params["id"])
+        return 200, await self.pool.run(lambda service: task_detail(service, task_id))
+
+    async def create_task(self, request):
+        """创建任务，title是必需的字段"""
+        values = task_values(read_json(request), TASK_FIELDS - {"completed"})
+        if "title" not in values:
+            raise ApiError(400, "title is required")
+
+        def create(service):
+            check_category(service, values.get("category_id"))
+            task = service.create_task(
+                values["title"],
+                description=values.get("description"),
+                priority=values.get("priority", PriorityEnum.MEDIUM.value),
+                category_id=values.get("category_id"),
+                due_date=values.get("due_date"),
+            )
+            return task_detail(service, task.id)
+        return 201, await self.pool.run(create, write=True)
+
+    async def update_task(self, request):
+        """修改任务的部分字段，修改completed时同时设置或清除完成时间"""
+        task_id = int(request.params["id"])
+        values = task_values(read_json(request))
+
+        def update(service):
+            if service.get_task(task_id) is None:
+                raise ApiError(404, f"task {task_id} not found")
+            if "category_id" in values:
+                check_category(service, values["category_id"])
+            service.update_task(task_id, **values)
+            service.db.flush()
+            return task_detail(service, task_id)
+        return 200, await self.pool.run(update, write=True)
+
+    async def delete_task(self, request):
+        """删除任务"""
+        task_id = int(request.params["id"])
+
+        def delete(service):
+            if service.get_task(task_id) is None:
+                raise ApiError(404, f"task {task_id} not found")
+            service.delete_task(task_id)
+        await self.pool.run(delete, write=True)
+        return 204, None
+
+    async def bulk_tasks(self, request):
+        """
+        批量操作
+
+        请求:
+            {"action": 操作, "ids": 任务ID列表, "value": 参数}
+            操作是complete、reopen、delete、priority(value为优先级)或move(value为分类ID，null表示没有分类)
+
+        返回:
+            {"counts": 分类计数的变化列表}，每一项是{"category_id", "open", "total"}
+        """
+        body = read_json(request)
+        action = BULK_ACTIONS.get(body.get("action"))
+        if action is None:
+            raise ApiError(400, f"action must be one of {', '.join(BULK_ACTIONS)}")
+        ids = body.get("ids")
+        if not isinstance(ids, list) or not ids:
+            raise ApiError(400, "ids must be a non-empty list")
+        if len(ids) > MAX_BULK_IDS:
+            raise ApiError(400, f"at most {MAX_BULK_IDS} ids per request")
+        ids = [parse_int(task_id, "ids") for task_id in ids]
+        run, check = action
+        value = check(body.get("value")) if check else None
+        changes = await self.pool.run(lambda service: run(service, ids, value), write=True)
+        return 200, {
+            "counts": [
+                {"category_id": category_id, "open": open_delta, "total": total_delta}
+                for category_id, open_delta, total_delta in changes
+            ]
+        }
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=API_DEFAULT_WORKERS, cache=True, ready=None):
+    """
+    运行API服务器直到被取消
+
+    参数:
+        host: 监听的地址
+        port: 监听的端口，为0时由系统分配
+        workers: 数据库线程池的大小
+        cache: 是否缓存GET响应
+        ready: 开始监听后调用的函数ready(地址, 端口)
+    """
+    pool = DbPool(workers)
+    response_cache = ResponseCache() if cache else None
+    api = ApiServer(pool, response_cache)
+    server = await asyncio.start_server(api.handle_connection, host, port, limit=MAX_LINE_SIZE, backlog=1024)
+    try:
+        if ready:
+            ready(*server.sockets[0].getsockname()[:2])
+        async with server:
+            await server.serve_forever()
+    finally:
+        pool.close()
+        if response_cache is not None:
+            response_cache.close()
+
+def run(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=API_DEFAULT_WORKERS, cache=True):
+    """
+    在当前线程中运行API服务器，按Ctrl+C停止
+
+    参数:
+        与serve()相同
+    """
+    def ready(address, actual_port):
+        print(
+            f"API服务器运行在 http://{address}:{actual_port} "
+            f"(数据库线程 {workers} 个，响应缓存{'开启' if cache else '关闭'})",
+            file=sys.stderr,
+        )
+    try:
+        asyncio.run(serve(host, port, workers, cache, ready))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1 @@
+# 性能基准测试：可重复的合成数据生成器和各项操作的计时
@@ -0,0 +1,229 @@
+import os  # 导入os模块，用于设置数据库路径的环境变量
+import sys  # 导入系统模块，用于设置退出码
+import json  # 导入json模块，用于读写基准测试结果
+import argparse  # 导入argparse模块，用于解析命令行参数
+import platform  # 导入platform模块，用于记录运行环境
+import tempfile  # 导入tempfile模块，用于创建临时数据库
+import datetime  # 导入datetime模块，用于记录运行时间
+
+# 基准测试工具
+# models包在导入时就会根据环境变量TODO_DATABASE_URL创建数据库引擎，
+# 因此这里先解析参数、设置环境变量，再在各个命令中导入models和benchmarks中的其他模块
+#
+# 用法示例:
+#   python -m benchmarks run --sizes 1000 10000 --output current.json
+#   python -m benchmarks run --baseline baseline.json
+#   python -m benchmarks compare baseline.json current.json
+#   python -m benchmarks generate --tasks 100000
+#   python -m benchmarks load --url http://127.0.0.1:8080 --concurrency 32
+
+def use_database(path):
+    """
+    让models包使用指定的数据库文件
+
+    参数:
+        path: SQLite数据库文件路径
+
+    注意:
+        必须在第一次导入models包之前调用
+    """
+    # 与models.database.DATABASE_URL_ENV一致
+    os.environ["TODO_DATABASE_URL"] = f"sqlite:///{os.path.abspath(path)}"
+
+def print_progress(count):
+    """在同一行显示已生成的任务数"""
+    print(f"\r  已生成 {count:,} 个任务", end="", file=sys.stderr, flush=True)
+
+def cmd_generate(args):
+    """向数据库追加合成数据"""
+    if args.db:
+        use_database(args.db)
+    from models import init_db, SessionLocal
+    from benchmarks.dataset import DatasetGenerator
+
+    init_db()
+    generator = DatasetGenerator(args.seed, args.categories)
+    db = SessionLocal()
+    try:
+        generator.fill(db, args.tasks, print_progress)
+    finally:
+        db.close()
+    print(file=sys.stderr)
+    return 0
+
+def cmd_run(args):
+    """在逐步增大的数据集上运行基准测试"""
+    if args.db:
+        # 数据集的任务ID必须从1开始连续编号，因此只能使用新的数据库文件
+        if os.path.exists(args.db):
+            print(f"错误: {args.db} 已存在，请指定一个新的数据库文件", file=sys.stderr)
+            return 1
+        use_database(args.db)
+    else:
+        use_database(os.path.join(tempfile.mkdtemp(prefix="todo-bench-"), "bench.db"))
+
+    import sqlite3
+    import sqlalchemy
+    from models import init_db, SessionLocal
+    from models.database import get_db_profile
+    from benchmarks.dataset import DatasetGenerator
+    from benchmarks.suite import run_operations
+
+    init_db()
+    generator = DatasetGenerator(args.seed, args.categories)
+    # 与DbWorker一样使用长期会话，提交后对象不过期
+    session = SessionLocal(expire_on_commit=False)
+    report = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlite": sqlite3.sqlite_version,
+            "sqlalchemy": sqlalchemy.__version__,
+            "db_profile": get_db_profile(),
+            "seed": args.seed,
+            "categories": args.categories,
+            "repeat": args.repeat,
+        },
+        "results": {},
+    }
+    try:
+        for size in sorted(args.sizes):
+            print(f"规模 {size:,}:", file=sys.stderr)
+            generator.fill(session, size, print_progress)
+            print(file=sys.stderr)
+            results = run_operations(session, size, args.repeat, args.seed)
+            report["results"][str(size)] = results
+            for name, stats in results.items():
+                print(f"  {name:<20} 中位数 {stats['median_ms']:>10.3f} ms   p95 {stats['p95_ms']:>10.3f} ms", file=sys.stderr)
+    finally:
+        session.close()
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        return report_comparison(baseline, report, args.threshold)
+    return 0
+
+def report_comparison(baseline, current, threshold):
+    """
+    输出对比结果
+
+    返回:
+        退出码，存在性能退化时为1
+    """
+    from benchmarks.suite import compare
+
+    rows = compare(baseline, current, threshold)
+    regressions = 0
+    for size, name, before, after, ratio, status in rows:
+        marker = {"regression": "退化", "improvement": "改进"}.get(status, "")
+        print(f"{int(size):>9,}  {name:<20} {before:>10.3f} -> {after:>10.3f} ms  x{ratio:5.2f}  {marker}", file=sys.stderr)
+        if status == "regression":
+            regressions += 1
+    if regressions:
+        print(f"发现 {regressions} 项性能退化(阈值 {threshold:.0%})", file=sys.stderr)
+        return 1
+    return 0
+
+def cmd_compare(args):
+    """对比两个结果文件"""
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)
+    return report_comparison(baseline, current, args.threshold)
+
+def cmd_load(args):
+    """对正在运行的API服务器进行负载测试"""
+    from benchmarks.load import run_load_test
+
+    report = run_load_test(
+        args.url, concurrency=args.concurrency, duration=args.duration,
+        warmup=args.warmup, writes=args.writes, seed=args.seed,
+    )
+    print(
+        f"{report['requests']:,} 个请求，{report['requests_per_s']:,.1f} 请求/秒，失败 {report['errors']:,} 个",
+        file=sys.stderr,
+    )
+    for name, stats in report["operations"].items():
+        if stats["runs"]:
+            print(
+                f"  {name:<16} {stats['runs']:>8,} 次  中位数 {stats['median_ms']:>8.3f} ms"
+                f"  p95 {stats['p95_ms']:>8.3f} ms  p99 {stats['p99_ms']:>8.3f} ms",
+                file=sys.stderr,
+            )
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if report["errors"] else 0
+
+def build_parser():
+    """
+    创建命令行参数解析器
+
+    返回:
+        argparse.ArgumentParser对象
+    """
+    # 默认值与benchmarks.dataset和benchmarks.suite中的常量一致，这里不导入它们以免提前导入models包
+    parser = argparse.ArgumentParser(prog="benchmarks", description="待办事项性能基准测试")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="向数据库追加合成数据")
+    generate.add_argument("--db", help="数据库文件路径，默认使用data/todo.db或TODO_DATABASE_URL")
+    generate.add_argument("--tasks", type=int, required=True, help="生成的任务数")
+    generate.add_argument("--categories", type=int, default=20, help="分类数量")
+    generate.add_argument("--seed", type=int, default=20240308, help="随机种子")
+    generate.set_defaults(handler=cmd_generate)
+
+    run = commands.add_parser("run", help="运行基准测试并输出JSON结果")
+    run.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000], help="任务数规模")
+    run.add_argument("--repeat", type=int, default=50, help="每个操作重复的次数")
+    run.add_argument("--categories", type=int, default=20, help="分类数量")
+    run.add_argument("--seed", type=int, default=20240308, help="随机种子")
+    run.add_argument("--db", help="保存数据集的新数据库文件，默认使用临时目录")
+    run.add_argument("--output", help="结果文件路径，默认输出到标准输出")
+    run.add_argument("--baseline", help="与该基线结果对比，存在退化时以退出码1结束")
+    run.add_argument("--threshold", type=float, default=0.25, help="中位数增长超过该比例视为退化")
+    run.set_defaults(handler=cmd_run)
+
+    compare = commands.add_parser("compare", help="对比两个结果文件")
+    compare.add_argument("baseline", help="基线结果文件")
+    compare.add_argument("current", help="当前结果文件")
+    compare.add_argument("--threshold", type=float, default=0.25, help="中位数增长超过该比例视为退化")
+    compare.set_defaults(handler=cmd_compare)
+
+    load = commands.add_parser("load", help="对正在运行的API服务器(python -m todo serve)进行负载测试")
+    load.add_argument("--url", default="http://127.0.0.1:8080", help="服务器地址")
+    load.add_argument("--concurrency", type=int, default=32, help="并发连接数")
+    load.add_argument("--duration", type=float, default=10.0, help="计入结果的测试时长(秒)")
+    load.add_argument("--warmup", type=float, default=1.0, help="预热时长(秒)，这段时间的请求不计入结果")
+    load.add_argument("--writes", type=float, default=0.0, help="写请求(修改任务的优先级)所占的比例，0到1之间")
+    load.add_argument("--seed", type=int, default=20240308, help="随机种子")
+    load.add_argument("--output", help="结果文件路径，默认输出到标准输出")
+    load.set_defaults(handler=cmd_load)
+
+    return parser
+
+def main(argv=None):
+    """
+    基准测试工具的入口点
+
+    返回:
+        退出码
+    """
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import random  # 导入random模块，用固定种子生成可重复的数据
+import datetime  # 导入datetime模块，用于生成日期
+
+from sqlalchemy import insert, func  # 导入insert用于插入分类，func用于统计任务数
+
+from models.models import Category, Task  # 导入数据模型
+from models.transfer import INSERT_TASK_SQL  # 复用导入功能的批量插入语句
+
+# 默认的随机种子，相同的种子和参数总是生成完全相同的数据
+DEFAULT_SEED = 20240308
+
+# 默认的分类数量
+DEFAULT_CATEGORIES = 20
+
+# 每个批次插入的任务数
+BATCH_SIZE = 5000
+
+# 日期都相对于固定的基准日期生成，不受运行当天的影响
+BASE_DATE = datetime.date(2024, 3, 8)
+
+# 优先级和完成状态的分布
+PRIORITY_WEIGHTS = {"low": 30, "medium": 50, "high": 20}
+COMPLETED_RATIO = 0.6
+# 设置了截止日期的任务比例
+DUE_DATE_RATIO = 0.3
+
+# 描述长度的分布：(权重, 最小长度, 最大长度)，长度为0表示没有描述
+DESCRIPTION_LENGTHS = [
+    (40, 0, 0),
+    (40, 10, 80),
+    (17, 80, 400),
+    (3, 400, 2000),
+]
+
+# 生成标题和描述使用的词汇
+VERBS = ["整理", "完成", "检查", "准备", "更新", "回复", "预约", "购买", "学习", "修复", "review", "draft", "plan"]
+NOUNS = ["周报", "会议纪要", "项目文档", "发票", "邮件", "代码", "测试用例", "旅行计划", "课程笔记", "预算", "report", "backlog", "slides"]
+WORDS = VERBS + NOUNS + ["需要", "明天", "之前", "客户", "团队", "细节", "版本", "数据", "问题", "方案", "the", "and", "for", "with"]
+
+class DatasetGenerator:
+    """
+    可重复的合成数据生成器
+
+    按固定的随机种子生成分类和任务，优先级、完成状态、截止日期和描述长度都服从预设的分布，
+    分类的大小近似齐普夫分布(少数分类包含大部分任务)。
+    多次调用fill()时数据按顺序追加，较小规模的数据集总是较大规模数据集的前缀
+    """
+    def __init__(self, seed=DEFAULT_SEED, categories=DEFAULT_CATEGORIES):
+        """
+        初始化生成器
+
+        参数:
+            seed: 随机种子
+            categories: 分类数量
+        """
+        self.random = random.Random(seed)
+        self.category_count = categories
+        self.category_ids = []  # 已创建的分类ID
+        self.generated = 0  # 已生成的任务数
+
+    def create_categories(self, db):
+        """
+        创建分类
+
+        参数:
+            db: 数据库会话
+        """
+        for index in range(self.category_count):
+            values = {"name": f"分类 {index + 1:02d}", "icon": None, "color": "#3498db"}
+            result = db.execute(insert(Category.__table__).values(**values))
+            self.category_ids.append(result.inserted_primary_key[0])
+        db.commit()
+
+    def description(self):
+        """
+        生成一段描述
+
+        返回:
+            描述文本，按DESCRIPTION_LENGTHS的分布可能为None
+        """
+        weights = [weight for weight, _, _ in DESCRIPTION_LENGTHS]
+        _, low, high = self.random.choices(DESCRIPTION_LENGTHS, weights)[0]
+        if not high:
+            return None
+        length = self.random.randint(low, high)
+        words = []
+        size = 0
+        while size < length:
+            word = self.random.choice(WORDS)
+            words.append(word)
+            size += len(word) + 1
+        return " ".join(words)[:length]
+
+    def task(self, number):
+        """
+        生成一个任务的插入参数
+
+        参数:
+            number: 任务序号，用于生成唯一的标题
+
+        返回:
+            与INSERT_TASK_SQL的列顺序一致的元组
+        """
+        rng = self.random
+        created_at = BASE_DATE - datetime.timedelta(days=rng.randint(0, 730))
+        due_date = None
+        if rng.random() < DUE_DATE_RATIO:
+            due_date = (created_at + datetime.timedelta(days=rng.randint(-10, 60))).isoformat()
+        return (
+            f"{rng.choice(VERBS)}{rng.choice(NOUNS)} #{number}",
+            self.description(),
+            rng.random() < COMPLETED_RATIO,
+            rng.choices(list(PRIORITY_WEIGHTS), list(PRIORITY_WEIGHTS.values()))[0],
+            due_date,
+            created_at.isoformat(),
+            rng.choices(self.category_ids, self.category_weights)[0],
+        )
+
+    def fill(self, db, total, progress=None):
+        """
+        追加任务，直到生成的任务总数达到total
+
+        参数:
+            db: 数据库会话
+            total: 目标任务总数
+            progress: 每插入一个批次后调用的函数progress(已生成的任务数)
+
+        作用:
+            第一次调用时先创建分类；任务按批次用executemany插入，每个批次单独提交
+        """
+        if not self.category_ids:
+            self.create_categories(db)
+            # 第k个分类的权重为1/k
+            self.category_weights = [1 / (index + 1) for index in range(len(self.category_ids))]
+
+        while self.generated < total:
+            count = min(BATCH_SIZE, total - self.generated)
+            batch = [self.task(self.generated + index + 1) for index in range(count)]
+            db.connection().exec_driver_sql(INSERT_TASK_SQL, batch)
+            db.commit()
+            self.generated += count
+            if progress:
+                progress(self.generated)
+
+def largest_category(db):
+    """
+    查找任务最多的分类
+
+    参数:
+        db: 数据库会话
+
+    返回:
+        (分类ID, 任务数)
+    """
+    return (
+        db.query(Task.category_id, func.count(Task.id))
+        .group_by(Task.category_id)
+        .order_by(func.count(Task.id).desc())
+        .first()
+    )
@@ -0,0 +1,283 @@
+import time  # 导入time模块，用于高精度计时
+import json  # 导入json模块，用于编码请求和解析响应
+import random  # 导入random模块，用固定种子选择请求
+import asyncio  # 导入asyncio模块，用少量线程模拟大量并发客户端
+from urllib.parse import urlsplit  # 导入URL解析函数
+
+# API服务器的负载测试
+# 不导入models包，只通过HTTP访问正在运行的服务器(python -m todo serve)：
+#   python -m benchmarks load --url http://127.0.0.1:8080 --concurrency 32 --duration 10
+#
+# 每个并发客户端保持一个HTTP/1.1连接，按权重随机发送请求，收到响应后立即发送下一个请求。
+# 预热阶段的请求不计入结果
+
+# 默认的并发连接数、测试时长和预热时长(秒)
+DEFAULT_CONCURRENCY = 32
+DEFAULT_DURATION = 10.0
+DEFAULT_WARMUP = 1.0
+
+# 列出任务时每页的任务数
+PAGE_SIZE = 50
+
+# 预先读取的任务ID数，get_task和update_task从中随机选择
+SAMPLE_TASKS = 1000
+
+# 读请求的种类和权重
+READ_MIX = [
+    ("get_task", 4),
+    ("list_tasks", 3),
+    ("next_page", 1),
+    ("smart_list", 1),
+    ("list_categories", 1),
+]
+
+# 列出任务时随机使用的排序键
+SORT_KEYS = ["id", "title", "priority", "due_date", "created_at"]
+
+# 智能列表的名称，与models.smart_lists.SMART_LISTS一致
+SMART_LISTS = ["open", "high", "recent", "overdue", "week"]
+
+class HttpConnection:
+    """
+    一个保持打开的HTTP/1.1连接
+
+    请求依次发送，每次等待完整的响应后才发送下一个请求
+    """
+    def __init__(self, host, port):
+        """
+        初始化连接，第一次请求时才建立TCP连接
+
+        参数:
+            host: 服务器地址
+            port: 服务器端口
+        """
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, payload=None):
+        """
+        发送请求并读取响应
+
+        参数:
+            method: HTTP方法
+            path: 路径和查询参数
+            payload: 请求的JSON数据
+
+        返回:
+            (状态码, 响应体字节串)
+
+        注意:
+            服务器关闭连接时下一次请求重新建立连接
+        """
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        head = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n"
+        )
+        self.writer.write(head.encode("latin-1") + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        close = False
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "connection" and value.strip().lower() == "close":
+                close = True
+        data = await self.reader.readexactly(length) if length else b""
+        if close:
+            self.close()
+        return status, data
+
+    def close(self):
+        """关闭连接"""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+def percentile(ordered, fraction):
+    """从已排序的列表中取百分位数"""
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def summarize(samples, errors):
+    """
+    计算一种请求的统计量
+
+    参数:
+        samples: 成功请求的耗时列表(毫秒)
+        errors: 失败的请求数
+
+    返回:
+        包含runs、errors、median_ms、p95_ms、p99_ms、max_ms的字典
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return {"runs": 0, "errors": errors}
+    return {
+        "runs": len(ordered),
+        "errors": errors,
+        "median_ms": round(percentile(ordered, 0.5), 3),
+        "p95_ms": round(percentile(ordered, 0.95), 3),
+        "p99_ms": round(percentile(ordered, 0.99), 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+class LoadTest:
+    """
+    对API服务器的一次负载测试
+
+    prepare()读取分类和任务ID，run()启动并发客户端并汇总结果
+    """
+    def __init__(self, url, concurrency=DEFAULT_CONCURRENCY, duration=DEFAULT_DURATION,
+                 warmup=DEFAULT_WARMUP, writes=0.0, seed=0):
+        """
+        初始化负载测试
+
+        参数:
+            url: 服务器地址，例如http://127.0.0.1:8080
+            concurrency: 并发连接数
+            duration: 计入结果的测试时长(秒)
+            warmup: 预热时长(秒)
+            writes: 写请求(修改任务的优先级)所占的比例，0到1之间
+            seed: 随机种子
+        """
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.writes = writes
+        self.seed = seed
+        self.category_ids = []
+        self.task_ids = []
+        self.cursors = []  # 每个分类第一页的next_cursor，next_page从这里翻页
+        self.samples = {}  # 请求种类 -> 耗时列表
+        self.errors = {}  # 请求种类 -> 失败数
+
+    async def prepare(self):
+        """读取分类ID、一部分任务ID和每个分类第一页的游标"""
+        connection = HttpConnection(self.host, self.port)
+        try:
+            status, data = await connection.request("GET", "/categories")
+            if status != 200:
+                raise RuntimeError(f"GET /categories 返回 {status}")
+            self.category_ids = [category["id"] for category in json.loads(data)["items"]]
+            _, data = await connection.request("GET", f"/tasks?limit={SAMPLE_TASKS}")
+            self.task_ids = [task["id"] for task in json.loads(data)["items"]]
+            for category_id in self.category_ids:
+                _, data = await connection.request("GET", f"/tasks?category_id={category_id}&limit={PAGE_SIZE}")
+                cursor = json.loads(data)["next_cursor"]
+                if cursor:
+                    self.cursors.append((category_id, cursor))
+        finally:
+            connection.close()
+        if not self.category_ids or not self.task_ids:
+            raise RuntimeError("服务器的数据库中没有任务，请先用python -m benchmarks generate生成数据")
+
+    def next_request(self, rng):
+        """
+        随机选择下一个请求
+
+        返回:
+            (种类, 方法, 路径, 请求数据)
+        """
+        if self.writes and rng.random() < self.writes:
+            priority = rng.choice(["low", "medium", "high"])
+            return "update_task", "PATCH", f"/tasks/{rng.choice(self.task_ids)}", {"priority": priority}
+        kind = rng.choices([name for name, _ in READ_MIX], [weight for _, weight in READ_MIX])[0]
+        if kind == "get_task":
+            return kind, "GET", f"/tasks/{rng.choice(self.task_ids)}", None
+        if kind == "list_tasks":
+            sort = rng.choice(SORT_KEYS)
+            category_id = rng.choice(self.category_ids)
+            return kind, "GET", f"/tasks?category_id={category_id}&sort={sort}&limit={PAGE_SIZE}", None
+        if kind == "next_page" and self.cursors:
+            category_id, cursor = rng.choice(self.cursors)
+            return kind, "GET", f"/tasks?category_id={category_id}&limit={PAGE_SIZE}&cursor={cursor}", None
+        if kind == "smart_list":
+            return kind, "GET", f"/tasks?view={rng.choice(SMART_LISTS)}&limit={PAGE_SIZE}", None
+        return "list_categories", "GET", "/categories", None
+
+    async def client(self, index, start, end):
+        """
+        一个并发客户端，在end之前不断发送请求
+
+        参数:
+            index: 客户端序号，用于生成各自的随机序列
+            start: 开始计入结果的时间(预热结束)
+            end: 结束时间
+        """
+        rng = random.Random(self.seed * 1000 + index)
+        connection = HttpConnection(self.host, self.port)
+        try:
+            while True:
+                begin = time.perf_counter()
+                if begin >= end:
+                    break
+                kind, method, path, payload = self.next_request(rng)
+                try:
+                    status, _ = await connection.request(method, path, payload)
+                    failed = status >= 400
+                except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                    connection.close()
+                    failed = True
+                if begin < start:
+                    continue
+                if failed:
+                    self.errors[kind] = self.errors.get(kind, 0) + 1
+                else:
+                    self.samples.setdefault(kind, []).append((time.perf_counter() - begin) * 1000)
+        finally:
+            connection.close()
+
+    async def run(self):
+        """
+        运行负载测试
+
+        返回:
+            结果字典：总请求数、每秒请求数、失败数以及每种请求的耗时统计
+        """
+        await self.prepare()
+        start = time.perf_counter() + self.warmup
+        end = start + self.duration
+        await asyncio.gather(*(self.client(index, start, end) for index in range(self.concurrency)))
+        total = sum(len(samples) for samples in self.samples.values())
+        errors = sum(self.errors.values())
+        all_samples = [sample for samples in self.samples.values() for sample in samples]
+        kinds = sorted(set(self.samples) | set(self.errors))
+        return {
+            "concurrency": self.concurrency,
+            "duration_s": self.duration,
+            "writes": self.writes,
+            "requests": total,
+            "errors": errors,
+            "requests_per_s": round(total / self.duration, 1),
+            "overall": summarize(all_samples, errors),
+            "operations": {kind: summarize(self.samples.get(kind, []), self.errors.get(kind, 0)) for kind in kinds},
+        }
+
+def run_load_test(url, **options):
+    """
+    运行负载测试
+
+    参数:
+        url: 服务器地址
+        options: LoadTest的其他参数
+
+    返回:
+        LoadTest.run()的结果字典
+    """
+    return asyncio.run(LoadTest(url, **options).run())
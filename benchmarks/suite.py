@@ -0,0 +1,207 @@
+import time  # 导入time模块，用于高精度计时
+import random  # 导入random模块，用固定种子选择被操作的任务
+import statistics  # 导入statistics模块，用于计算中位数等统计量
+
+from models.database import session_scope  # 导入工作单元
+from models.service import TaskService  # 导入业务操作，基准测试与界面执行完全相同的操作
+from models.worker import snapshot  # 导入对象快照函数，用于在测试后恢复任务
+from models.smart_lists import SMART_LISTS  # 导入智能列表的定义
+from benchmarks.dataset import largest_category, BASE_DATE  # 导入查找最大分类的函数和数据集的基准日期
+
+# 默认测试的数据规模(任务数)
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+# 每个操作默认重复的次数
+DEFAULT_REPEAT = 50
+
+# 每次加载的任务行数，与任务列表视口(约25行)加上下缓冲区(各50行)一致
+PAGE_SIZE = 125
+
+# 对比基线时，中位数增长超过该比例视为性能退化
+DEFAULT_THRESHOLD = 0.25
+# 中位数增长小于该值(毫秒)时视为计时噪声，不报告退化
+MIN_DELTA_MS = 0.2
+
+def summarize(samples):
+    """
+    计算一组耗时的统计量
+
+    参数:
+        samples: 每次操作的耗时列表(毫秒)
+
+    返回:
+        包含runs、min_ms、median_ms、p95_ms、mean_ms的字典
+    """
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "runs": len(ordered),
+        "min_ms": round(ordered[0], 4),
+        "median_ms": round(statistics.median(ordered), 4),
+        "p95_ms": round(p95, 4),
+        "mean_ms": round(statistics.fmean(ordered), 4),
+    }
+
+def measure(session, operation, arguments):
+    """
+    逐次执行并计时一个操作
+
+    参数:
+        session: 长期会话，与DbWorker一样在每个工作单元结束时提交
+        operation: 函数operation(service, argument)
+        arguments: 参数列表，每个参数执行一次操作
+
+    返回:
+        (统计量字典, 每次操作返回值的列表)
+
+    作用:
+        每次操作是一个独立的工作单元，计时包括提交，与界面中一次操作的耗时一致
+    """
+    samples = []
+    results = []
+    for argument in arguments:
+        start = time.perf_counter()
+        with session_scope(session) as db:
+            results.append(operation(TaskService(db), argument))
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples), results
+
+def run_operations(session, size, repeat=DEFAULT_REPEAT, seed=0):
+    """
+    在当前数据集上测量所有操作
+
+    参数:
+        session: 长期会话
+        size: 数据集中的任务数，任务ID为1到size
+        repeat: 每个操作重复的次数
+        seed: 选择被操作任务的随机种子
+
+    返回:
+        字典{操作名称: 统计量字典}
+
+    作用:
+        测量界面中各个处理函数在后台执行的操作。编辑和切换完成状态的任务在测量后恢复原状，
+        新增的任务在测量删除时删除，数据集本身保持不变
+    """
+    rng = random.Random(seed + size)
+    targets = rng.sample(range(1, size + 1), min(repeat, size))
+    with session_scope(session) as db:
+        category_id, category_size = largest_category(db)
+    results = {}
+
+    def load_categories(service, _):
+        """加载分类列表和每个分类的计数"""
+        return service.list_categories(), service.category_counts()
+
+    def load_tasks(service, offset):
+        """切换到分类：统计任务数并加载一页任务列表的行"""
+        service.count_tasks(category_id)
+        return [(row.id, row.title) for row in service.list_task_rows(category_id, offset, PAGE_SIZE)]
+
+    def load_tasks_orm(service, offset):
+        """与load_tasks相同，但加载完整的Task对象，用于对比列投影的效果"""
+        service.db.expire_all()
+        service.count_tasks(category_id)
+        return [(task.id, task.title) for task in service.list_tasks(category_id, offset, PAGE_SIZE)]
+
+    results["load_categories"], _ = measure(session, load_categories, range(repeat))
+    results["load_tasks"], _ = measure(session, load_tasks, [0] * repeat)
+    results["load_tasks_orm"], _ = measure(session, load_tasks_orm, [0] * repeat)
+    # 从分类中间开始加载一页，相当于把滚动条拖到中间
+    results["load_tasks_middle"], _ = measure(session, load_tasks, [category_size // 2] * repeat)
+
+    def load_sorted(service, sort):
+        """点击列标题：按另一列排序并加载第一屏"""
+        return [row.id for row in service.list_task_rows(category_id, 0, PAGE_SIZE, sort=sort)]
+
+    # 依次按标题、优先级和截止日期排序
+    sorts = ["title", "priority", "due_date"] * (repeat // 3 + 1)
+    results["load_tasks_sorted"], _ = measure(session, load_sorted, sorts[:repeat])
+
+    # 在分类中间按标题排序向下滚动，从上一页的最后一个任务开始键集分页
+    with session_scope(session) as db:
+        anchors = [
+            row.id for row in TaskService(db).list_task_rows(category_id, category_size // 2, repeat, sort="title")
+        ]
+    results["scroll_keyset"], _ = measure(
+        session,
+        lambda service, task_id: len(service.list_task_rows(category_id, limit=PAGE_SIZE, sort="title", after=task_id)),
+        anchors,
+    )
+
+    def load_smart_lists(service, _):
+        """依次打开每个智能列表：统计任务数并加载第一屏(不使用界面中的缓存)"""
+        return [
+            (service.count_smart_list(name, BASE_DATE), len(service.list_smart_rows(name, 0, PAGE_SIZE, today=BASE_DATE)))
+            for name in SMART_LISTS
+        ]
+
+    results["load_smart_lists"], _ = measure(session, load_smart_lists, range(repeat))
+
+    # 新增任务
+    results["add"], added = measure(
+        session,
+        lambda service, number: service.create_task(f"基准测试任务 {number}", None, "medium", category_id).id,
+        range(repeat),
+    )
+
+    # 编辑任务，测量前保存原来的内容
+    with session_scope(session) as db:
+        originals = [snapshot(TaskService(db).get_task(task_id)) for task_id in targets]
+    results["edit"], _ = measure(
+        session,
+        lambda service, task_id: service.update_task(
+            task_id, title=f"已编辑 {task_id}", description="基准测试修改的描述", priority="high"
+        ),
+        targets,
+    )
+    with session_scope(session) as db:
+        service = TaskService(db)
+        for task in originals:
+            service.update_task(task.id, title=task.title, description=task.description, priority=task.priority)
+
+    # 切换完成状态，测量后再切换一次恢复原状
+    results["toggle"], _ = measure(session, lambda service, task_id: service.toggle_task(task_id), targets)
+    with session_scope(session) as db:
+        service = TaskService(db)
+        for task_id in targets:
+            service.toggle_task(task_id)
+
+    # 删除测量新增时添加的任务
+    results["delete"], _ = measure(session, lambda service, task_id: service.delete_task(task_id), added)
+
+    # 全文搜索一个常见词和一个较少见的词
+    results["search_common"], _ = measure(session, lambda service, _: service.search("周报"), range(repeat))
+    results["search_rare"], _ = measure(session, lambda service, _: service.search("会议纪要 #1"), range(repeat))
+    return results
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD, min_delta=MIN_DELTA_MS):
+    """
+    对比两次基准测试的结果
+
+    参数:
+        baseline: 基线结果(run命令输出的JSON对象)
+        current: 当前结果
+        threshold: 中位数增长超过该比例视为退化
+        min_delta: 中位数增长小于该值(毫秒)时不视为退化
+
+    返回:
+        列表，每一项是(规模, 操作, 基线中位数, 当前中位数, 比值, 状态)，
+        状态为"regression"、"improvement"或"ok"。只包含两次结果中都存在的规模和操作
+    """
+    rows = []
+    for size, operations in current["results"].items():
+        base_operations = baseline["results"].get(size, {})
+        for name, stats in operations.items():
+            if name not in base_operations:
+                continue
+            before = base_operations[name]["median_ms"]
+            after = stats["median_ms"]
+            ratio = after / before if before else float("inf")
+            status = "ok"
+            if after - before > min_delta and ratio > 1 + threshold:
+                status = "regression"
+            elif before - after > min_delta and ratio < 1 / (1 + threshold):
+                status = "improvement"
+            rows.append((size, name, before, after, ratio, status))
+    return rows
@@ -1,44 +1,111 @@
 import sys  # 导入系统模块，用于访问与Python解释器和环境相关的变量和函数
 import os   # 导入操作系统模块，用于文件和目录操作
-import tkinter as tk  # 导入tkinter库，Python的标准GUI库，用于创建图形用户界面
-from tkinter import ttk  # 导入ttk模块，提供了themed Tk小部件，外观更现代
-
-# 从views包导入MainWindow类，这是应用程序的主窗口
-from views import MainWindow
-# 从models包导入init_db函数，用于初始化数据库
-from models import init_db
+import time  # 导入time模块，用于测量启动各阶段的耗时
 
 # 待办事项应用 v0.1
 # 一个简洁的个人任务管理桌面应用程序
 # 作者：hunter
 # 许可证：MIT
 
+# tkinter、主窗口和数据库模块都在main()中导入：
+# 主窗口先完成第一次绘制，SQLAlchemy和数据库初始化在后台工作线程中进行
+
+# 打印启动耗时分析的命令行参数
+PROFILE_FLAG = "--profile-startup"
+
+class StartupProfile:
+    """
+    启动耗时分析
+
+    记录启动过程中每个阶段的耗时，使用--profile-startup参数运行时在标准错误中输出
+    """
+    def __init__(self, enabled):
+        """
+        初始化并开始计时
+
+        参数:
+            enabled: 是否输出分析结果
+        """
+        self.enabled = enabled
+        self.start = self.last = time.perf_counter()
+        self.phases = []  # (阶段名称, 阶段耗时, 从启动开始的累计耗时)，单位为秒
+
+    def mark(self, name):
+        """
+        记录一个阶段的结束
+
+        参数:
+            name: 阶段名称
+        """
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last, now - self.start))
+        self.last = now
+
+    def report(self, title):
+        """
+        输出各阶段的耗时
+
+        参数:
+            title: 本次输出的标题
+        """
+        if not self.enabled:
+            return
+        print(f"启动耗时分析 - {title}", file=sys.stderr)
+        for name, duration, elapsed in self.phases:
+            print(f"  {name:<24} {duration * 1000:8.1f} ms  (累计 {elapsed * 1000:8.1f} ms)", file=sys.stderr)
+        # 第一次绘制时是否已经加载了SQLAlchemy，正常情况下应为否
+        loaded = "sqlalchemy" in sys.modules
+        print(f"  已加载SQLAlchemy: {'是' if loaded else '否'}", file=sys.stderr)
+        self.phases = []
+
 def main():
     """应用程序的主入口点"""
+    profile = StartupProfile(PROFILE_FLAG in sys.argv[1:])
+
     # 如果不存在，创建数据目录
     # exist_ok=True 参数表示如果目录已存在，不会引发错误
     os.makedirs('data', exist_ok=True)
-    
-    # 初始化数据库
-    # 这个函数在models包中定义，用于创建数据库表结构
-    init_db()
-    
+
+    # 导入tkinter库，Python的标准GUI库，用于创建图形用户界面
+    import tkinter as tk
+    # 导入ttk模块，提供了themed Tk小部件，外观更现代
+    from tkinter import ttk
+    profile.mark("导入tkinter")
+
     # 创建应用程序
     # Tk()是tkinter的主窗口类，所有GUI元素都将放在这个窗口中
     root = tk.Tk()
     # 设置窗口标题
     root.title("待办事项 v0.1")
-    
+
     # 设置主题
     # ttk.Style()用于自定义ttk小部件的外观
     style = ttk.Style()
     # 使用"clam"主题，这是一个现代外观的主题
     style.theme_use("clam")  # 使用现代主题
-    
+    profile.mark("创建根窗口")
+
+    # 导入MainWindow类，这是应用程序的主窗口
+    # 主窗口模块不会导入SQLAlchemy和对话框
+    from views.main_window import MainWindow
+    profile.mark("导入主窗口模块")
+
+    def on_ready():
+        """数据库初始化和分类列表加载完成"""
+        profile.mark("数据库就绪并加载分类")
+        profile.report("数据加载")
+
     # 创建并显示主窗口
     # 实例化MainWindow类，传入root作为父窗口
-    app = MainWindow(root)
-    
+    # 数据库在后台工作线程中初始化(数据库结构版本一致时跳过建表)，完成后加载分类列表
+    app = MainWindow(root, on_ready=on_ready)
+    profile.mark("创建主窗口部件")
+
+    # 处理一次事件和空闲任务，完成第一次绘制
+    root.update_idletasks()
+    profile.mark("第一次绘制")
+    profile.report("第一次绘制")
+
     # 运行应用程序
     # mainloop()是tkinter的主事件循环，它等待用户操作并处理事件
     root.mainloop()
@@ -46,4 +113,4 @@ def main():
 # 这是Python的标准惯例，确保只有在直接运行此脚本时才执行main()函数
 # 如果此文件被导入为模块，则不会执行main()
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
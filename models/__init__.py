@@ -1,4 +1,36 @@
-from models.models import Category, Task, PriorityEnum
-from models.database import Base, init_db, get_db
+import importlib  # 导入importlib模块，用于在第一次访问时导入子模块
 
-__all__ = ['Category', 'Task', 'PriorityEnum', 'Base', 'init_db', 'get_db'] 
\ No newline at end of file
+# 包中公开的名称及其所在的模块
+# 导入models包本身不会加载SQLAlchemy，第一次访问某个名称时才导入对应的模块，
+# 图形界面因此可以先显示窗口，再在后台线程中加载数据库模块
+_EXPORTS = {
+    'Category': 'models.models',
+    'Task': 'models.models',
+    'ArchivedTask': 'models.models',
+    'PriorityEnum': 'models.models',
+    'Base': 'models.database',
+    'SessionLocal': 'models.database',
+    'init_db': 'models.database',
+    'get_db': 'models.database',
+    'session_scope': 'models.database',
+    'get_connection_stats': 'models.database',
+    'TaskService': 'models.service',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    """
+    按需导入包中公开的名称
+
+    参数:
+        name: 名称
+
+    返回:
+        对应模块中的对象，导入后保存在包的命名空间中，之后的访问不再经过这里
+    """
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'models' has no attribute '{name}'")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
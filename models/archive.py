@@ -0,0 +1,165 @@
+import datetime  # 导入datetime模块，用于计算归档的截止时间
+
+from sqlalchemy import select, insert, update, delete, literal, func, DateTime  # 导入Core语句的构造函数、SQL函数和时间类型
+
+from models.models import Category, Task, ArchivedTask, ChangeLog, TASK_SORT_KEYS  # 导入数据模型和排序键
+from models.changes import latest_change  # 导入读取最新修改序号的函数
+
+# 归档
+# 很久以前完成的任务从tasks表移动到archived_tasks表，tasks表和它的索引只包含经常访问的任务，
+# 日常的查询读取的页更少，更容易全部留在页缓存中。
+# 每个批次是一个独立的事务，归档大量任务时界面和其他连接不会被长时间阻塞。
+# 归档和恢复只是在本地的两个表之间移动任务，写入的修改日志标记为"archive"，同步时不会上传，
+# 其他数据库中的任务不会因为本地归档而被删除
+
+# 默认归档多少天之前完成的任务，保存在配置项archive_days中
+DEFAULT_ARCHIVE_DAYS = 90
+
+# 每个批次移动的任务数，与models.bulk一样不超过SQLite默认的参数个数上限
+BATCH_SIZE = 900
+
+# 归档和恢复写入的修改日志的来源
+ARCHIVE_ORIGIN = "archive"
+
+# 在两个表之间复制的列，ID和全局唯一ID单独处理
+COPIED_COLUMNS = ["title", "description", "completed", "priority", "due_date", "created_at", "completed_at", "category_id"]
+
+def archive_cutoff(days, now=None):
+    """
+    计算归档的截止时间
+
+    参数:
+        days: 完成超过这么多天的任务会被归档
+        now: 当前时间，为None时使用datetime.datetime.now()
+
+    返回:
+        完成时间早于该时间的任务会被归档
+    """
+    now = now or datetime.datetime.now()
+    return now - datetime.timedelta(days=days)
+
+def archive_completed(db, before, batch_size=BATCH_SIZE, progress=None):
+    """
+    把完成时间早于before的任务移动到归档表
+
+    参数:
+        db: 数据库会话
+        before: 截止时间
+        batch_size: 每个批次移动的任务数
+        progress: 每提交一个批次后调用的函数progress(已归档的任务数)
+
+    返回:
+        归档的任务数
+
+    作用:
+        每个批次先用(completed, 完成时间)索引找到一批任务，
+        再用INSERT ... SELECT复制到归档表、用DELETE从任务表删除，然后提交。
+        在加入completed_at列之前完成的任务没有完成时间，视为很久以前完成，同样会被归档。
+        删除写入的修改日志标记为"archive"，同步时不会作为删除标记上传
+    """
+    # 与索引ix_tasks_completed_completed_at中的表达式一致
+    condition = (Task.completed == True) & (TASK_SORT_KEYS["completed_at"] < before)
+    task_columns = [getattr(Task, name) for name in COPIED_COLUMNS]
+    archived = 0
+    while True:
+        ids = db.execute(select(Task.id).where(condition).limit(batch_size)).scalars().all()
+        if not ids:
+            break
+        # 归档时间与其他时间列一样使用本地时间
+        now = literal(datetime.datetime.now(), DateTime)
+        db.execute(
+            insert(ArchivedTask.__table__).from_select(
+                ["task_id", "uid", *COPIED_COLUMNS, "archived_at"],
+                select(Task.id, Task.uid, *task_columns, now).where(Task.id.in_(ids)),
+            )
+        )
+        # INSERT已经开始写事务，大于这个序号的修改日志都是下面的删除写入的
+        log_seq = latest_change(db.connection())
+        # ORM的批量删除同时从会话的标识映射中移除这些任务
+        db.execute(delete(Task).where(Task.id.in_(ids)))
+        mark_archive_changes(db, log_seq)
+        db.commit()
+        archived += len(ids)
+        if progress:
+            progress(archived)
+    return archived
+
+def restore_archived(db, archive_ids):
+    """
+    把归档的任务恢复到任务表
+
+    参数:
+        db: 数据库会话
+        archive_ids: 归档记录的ID列表
+
+    返回:
+        恢复的任务数
+
+    作用:
+        原来的任务ID没有被新任务占用时保留原来的ID，否则分配新的ID。
+        分类已被删除的任务恢复为没有分类。恢复的任务保留原来的全局唯一ID，
+        插入写入的修改日志标记为"archive"，同步时不会上传：归档时没有上传删除标记，
+        其他数据库中仍然是同一个任务。调用者在同一个事务中执行
+    """
+    archive_ids = list(archive_ids)
+    restored = 0
+    for start in range(0, len(archive_ids), BATCH_SIZE):
+        chunk = archive_ids[start:start + BATCH_SIZE]
+        rows = db.execute(select(ArchivedTask.id, ArchivedTask.task_id).where(ArchivedTask.id.in_(chunk))).all()
+        if not rows:
+            continue
+        # 加入uid列之前归档的任务没有全局唯一ID，先在归档表中补全。
+        # 这条UPDATE同时开始写事务，之后其他连接不能写入，大于这个序号的修改日志都是本次恢复写入的
+        db.execute(
+            update(ArchivedTask.__table__)
+            .where(ArchivedTask.id.in_(chunk), ArchivedTask.uid.is_(None))
+            .values(uid=func.lower(func.hex(func.randomblob(16))))
+        )
+        log_seq = latest_change(db.connection())
+        task_ids = [task_id for _, task_id in rows]
+        # 之前的批次恢复的任务已经在任务表中，同样算作被占用
+        taken = set(db.execute(select(Task.id).where(Task.id.in_(task_ids))).scalars())
+        # 任务ID会被重复使用(删除最大ID的任务后新任务得到相同的ID)，两条归档记录的task_id可能相同，
+        # 每个任务ID只由归档记录ID最小的一行保留
+        keep = set()
+        for archive_id, task_id in sorted(rows):
+            if task_id not in taken:
+                taken.add(task_id)
+                keep.add(archive_id)
+        # 先恢复可以保留原来ID的任务，再恢复其余的任务
+        for keep_id in (True, False):
+            selected = [archive_id for archive_id, _ in rows if (archive_id in keep) == keep_id]
+            if not selected:
+                continue
+            columns = [getattr(ArchivedTask, name) for name in COPIED_COLUMNS]
+            # 分类已被删除时恢复为没有分类
+            columns[COPIED_COLUMNS.index("category_id")] = (
+                select(Category.id).where(Category.id == ArchivedTask.category_id).scalar_subquery()
+            )
+            names = [*COPIED_COLUMNS, "uid"]
+            columns.append(ArchivedTask.uid)
+            if keep_id:
+                names.insert(0, "id")
+                columns.insert(0, ArchivedTask.task_id)
+            db.execute(
+                insert(Task.__table__).from_select(
+                    names, select(*columns).where(ArchivedTask.id.in_(selected)).order_by(ArchivedTask.id)
+                )
+            )
+        db.execute(delete(ArchivedTask).where(ArchivedTask.id.in_(chunk)))
+        mark_archive_changes(db, log_seq)
+        restored += len(rows)
+    return restored
+
+def mark_archive_changes(db, log_seq):
+    """
+    把归档或恢复写入的修改日志标记为"archive"
+
+    参数:
+        db: 数据库会话，已经开始写事务
+        log_seq: 开始写入任务表之前的最大修改序号
+
+    作用:
+        与models.sync应用下载的修改一样按序号标记，写事务期间其他连接不能写入修改日志
+    """
+    db.execute(update(ChangeLog.__table__).where(ChangeLog.seq > log_seq).values(origin=ARCHIVE_ORIGIN))
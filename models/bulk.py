@@ -0,0 +1,136 @@
+import datetime  # 导入datetime模块，用于记录完成时间
+
+from sqlalchemy import func, update, delete  # 导入func用于聚合，update和delete用于生成批量语句
+
+from models.models import Task  # 导入任务模型
+
+# 每条语句中IN列表的最大长度
+# 旧版本SQLite限制每条语句最多999个参数，超过时分批执行(仍在同一个事务中)
+CHUNK_SIZE = 900
+
+# 批量语句使用默认的会话同步策略：
+# 会话标识映射中已加载的任务会被原地更新或移除，不需要让整个会话过期
+
+def chunked(ids, size=CHUNK_SIZE):
+    """
+    把ID列表按固定大小分批
+
+    参数:
+        ids: 任务ID列表
+        size: 每批的大小
+
+    返回:
+        生成器，依次产生每一批ID的列表
+    """
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+def count_by_category(db, ids):
+    """
+    统计一组任务按分类和完成状态的分布
+
+    参数:
+        db: 数据库会话
+        ids: 任务ID列表
+
+    返回:
+        列表，每一项是(分类ID, 是否完成, 任务数)
+    """
+    counts = {}
+    for chunk in chunked(ids):
+        rows = (
+            db.query(Task.category_id, Task.completed, func.count(Task.id))
+            .filter(Task.id.in_(chunk))
+            .group_by(Task.category_id, Task.completed)
+            .all()
+        )
+        for category_id, completed, count in rows:
+            key = (category_id, bool(completed))
+            counts[key] = counts.get(key, 0) + count
+    return [(category_id, completed, count) for (category_id, completed), count in counts.items()]
+
+def set_completed(db, ids, completed):
+    """
+    批量设置任务的完成状态
+
+    参数:
+        db: 数据库会话
+        ids: 任务ID列表
+        completed: 新的完成状态
+
+    返回:
+        分类计数的变化列表，每一项是(分类ID, 未完成数变化, 全部任务数变化)
+    """
+    changes = []
+    for category_id, was_completed, count in count_by_category(db, ids):
+        # 只有状态真正改变的任务才影响未完成计数
+        if was_completed != completed:
+            changes.append((category_id, -count if completed else count, 0))
+    # 只更新状态真正改变的任务，已完成的任务保留原来的完成时间
+    completed_at = datetime.datetime.now() if completed else None
+    for chunk in chunked(ids):
+        db.execute(
+            update(Task)
+            .where(Task.id.in_(chunk), Task.completed.is_not(completed))
+            .values(completed=completed, completed_at=completed_at)
+        )
+    return changes
+
+def set_priority(db, ids, priority):
+    """
+    批量设置任务的优先级
+
+    参数:
+        db: 数据库会话
+        ids: 任务ID列表
+        priority: 新的优先级("low"、"medium"或"high")
+
+    返回:
+        分类计数的变化列表，优先级不影响计数，因此总是空列表
+    """
+    for chunk in chunked(ids):
+        db.execute(update(Task).where(Task.id.in_(chunk)).values(priority=priority))
+    return []
+
+def move_to_category(db, ids, category_id):
+    """
+    批量把任务移动到另一个分类
+
+    参数:
+        db: 数据库会话
+        ids: 任务ID列表
+        category_id: 目标分类ID
+
+    返回:
+        分类计数的变化列表，每一项是(分类ID, 未完成数变化, 全部任务数变化)
+    """
+    changes = []
+    for source_id, completed, count in count_by_category(db, ids):
+        if source_id == category_id:
+            continue
+        open_count = 0 if completed else count
+        changes.append((source_id, -open_count, -count))
+        changes.append((category_id, open_count, count))
+    for chunk in chunked(ids):
+        db.execute(update(Task).where(Task.id.in_(chunk)).values(category_id=category_id))
+    return changes
+
+def delete_tasks(db, ids):
+    """
+    批量删除任务
+
+    参数:
+        db: 数据库会话
+        ids: 任务ID列表
+
+    返回:
+        分类计数的变化列表，每一项是(分类ID, 未完成数变化, 全部任务数变化)
+    """
+    changes = [
+        (category_id, 0 if completed else -count, -count)
+        for category_id, completed, count in count_by_category(db, ids)
+    ]
+    for chunk in chunked(ids):
+        db.execute(delete(Task).where(Task.id.in_(chunk)))
+    return changes
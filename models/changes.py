@@ -0,0 +1,202 @@
+from collections import namedtuple  # 导入namedtuple，用于定义修改记录的行类型
+
+from sqlalchemy import text  # 导入text，用于执行原生SQL
+
+# 修改检测
+# 多个窗口、命令行工具或其他脚本可能同时使用同一个数据库文件。
+# 任务表和分类表上的触发器把每一次修改追加到change_log表中，序号单调递增；
+# 界面定时读取PRAGMA data_version，只有其他连接提交过事务时它才会变化，
+# 这时才从change_log中读取上次之后的修改，空闲时每次检查只执行一条PRAGMA，不读取任何表
+
+# 修改日志最多保留的行数，更早的行在init_db()中清理
+# 落后太多的窗口发现需要的行已被清理时重新加载整个界面
+CHANGE_LOG_KEEP = 10000
+
+# 一次检查最多处理的修改数，超过时(例如其他程序导入了大量任务)直接重新加载整个界面
+MAX_CHANGES = 500
+
+# change_log中的一行
+Change = namedtuple("Change", ["seq", "table_name", "row_id", "operation", "category_id", "previous_category_id"])
+
+# 写入修改日志的触发器
+# 触发器在数据库中执行，不依赖应用程序，其他程序直接用sqlite3修改数据时同样会记录。
+# 删除分类时由外键级联删除的任务也会触发删除任务的触发器。
+# 删除时记录删除前的全局唯一ID，同步时作为删除标记上传
+CHANGE_LOG_TRIGGERS = {
+    "tasks_change_insert": """
+    CREATE TRIGGER IF NOT EXISTS tasks_change_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO change_log(table_name, row_id, operation, category_id, row_uid)
+        VALUES ('tasks', new.id, 'insert', new.category_id, new.uid);
+    END
+    """,
+    "tasks_change_update": """
+    CREATE TRIGGER IF NOT EXISTS tasks_change_update AFTER UPDATE ON tasks BEGIN
+        INSERT INTO change_log(table_name, row_id, operation, category_id, previous_category_id, row_uid)
+        VALUES ('tasks', new.id, 'update', new.category_id, old.category_id, new.uid);
+    END
+    """,
+    "tasks_change_delete": """
+    CREATE TRIGGER IF NOT EXISTS tasks_change_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO change_log(table_name, row_id, operation, category_id, row_uid)
+        VALUES ('tasks', old.id, 'delete', old.category_id, old.uid);
+    END
+    """,
+    "categories_change_insert": """
+    CREATE TRIGGER IF NOT EXISTS categories_change_insert AFTER INSERT ON categories BEGIN
+        INSERT INTO change_log(table_name, row_id, operation, row_uid) VALUES ('categories', new.id, 'insert', new.uid);
+    END
+    """,
+    "categories_change_update": """
+    CREATE TRIGGER IF NOT EXISTS categories_change_update AFTER UPDATE ON categories BEGIN
+        INSERT INTO change_log(table_name, row_id, operation, row_uid) VALUES ('categories', new.id, 'update', new.uid);
+    END
+    """,
+    "categories_change_delete": """
+    CREATE TRIGGER IF NOT EXISTS categories_change_delete AFTER DELETE ON categories BEGIN
+        INSERT INTO change_log(table_name, row_id, operation, row_uid) VALUES ('categories', old.id, 'delete', old.uid);
+    END
+    """,
+}
+
+def create_change_log_triggers(connection):
+    """
+    创建写入修改日志的触发器
+
+    参数:
+        connection: 数据库连接
+
+    作用:
+        已存在的触发器不会被修改。change_log表本身由模型定义创建
+    """
+    for trigger in CHANGE_LOG_TRIGGERS.values():
+        connection.execute(text(trigger))
+
+def drop_change_log_triggers(connection):
+    """
+    删除写入修改日志的触发器
+
+    参数:
+        connection: 数据库连接
+
+    作用:
+        修改触发器的定义时先删除旧的触发器，再由create_change_log_triggers()重新创建
+    """
+    for name in CHANGE_LOG_TRIGGERS:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+
+def latest_change(connection):
+    """
+    获取最新的修改序号
+
+    参数:
+        connection: 数据库连接
+
+    返回:
+        最大的序号，没有修改时返回0。seq是整数主键，读取最大值只需查找B树的最右端
+    """
+    return connection.execute(text("SELECT MAX(seq) FROM change_log")).scalar() or 0
+
+def prune_change_log(connection, keep=CHANGE_LOG_KEEP):
+    """
+    清理旧的修改日志
+
+    参数:
+        connection: 数据库连接
+        keep: 保留的最新行数
+
+    返回:
+        删除的行数
+
+    注意:
+        同步过的数据库还需要上传修改日志中尚未上传的行(见models.sync)，这些行不会被清理
+    """
+    result = connection.execute(
+        text(
+            "DELETE FROM change_log WHERE seq <= MIN("
+            "(SELECT MAX(seq) FROM change_log) - :keep, "
+            "COALESCE((SELECT CAST(value AS INTEGER) FROM sync_state WHERE key = 'push_seq'), "
+            "(SELECT MAX(seq) FROM change_log)))"
+        ),
+        {"keep": keep},
+    )
+    return result.rowcount
+
+class ChangeWatcher:
+    """
+    检测其他连接对数据库的修改
+
+    必须始终在同一个数据库连接上使用：PRAGMA data_version只在其他连接提交事务后变化，
+    本连接自己的提交不会改变它。DbWorker的长期会话绑定在一个固定的连接上，
+    因此界面自己的修改不会被当作外部修改重复处理
+    """
+    def __init__(self, max_changes=MAX_CHANGES):
+        """
+        初始化检测器
+
+        参数:
+            max_changes: 一次检查最多返回的修改数
+        """
+        self.max_changes = max_changes
+        self.data_version = None  # 上一次读到的PRAGMA data_version
+        self.last_seq = None  # 已经处理过的最大修改序号
+        self.commits = None  # 上一次检查时本连接已提交的事务数
+
+    def poll(self, db, commits):
+        """
+        检查上次之后其他连接的修改
+
+        参数:
+            db: 绑定在固定连接上的会话
+            commits: 本连接到目前为止提交的事务数(DbWorker.commits)
+
+        返回:
+            Change的列表，没有外部修改时为空列表；
+            修改太多或需要的日志已被清理时返回None，调用者应重新加载全部数据
+
+        作用:
+            空闲时只执行一条PRAGMA data_version。本连接提交过事务时额外读取一次最大序号，
+            跳过自己写入的日志。同时有外部修改和自己的修改时，自己的修改也会被返回，
+            调用者按数据库中的最新状态处理，重复处理不会产生错误的结果。
+            检查本身只读，不会开始写事务
+        """
+        connection = db.connection()
+        # 延迟写入模式下可能有尚未提交的修改，它们的日志序号在回滚后会被重新使用，这次跳过检查
+        if connection.connection.dbapi_connection.in_transaction:
+            return []
+        if self.last_seq is None:
+            # 第一次检查只记录当前的状态
+            self.last_seq = latest_change(connection)
+            self.data_version = self._data_version(connection)
+            self.commits = commits
+            return []
+
+        # 先读最大序号再读data_version：两次读取之间有外部提交时data_version一定会变化
+        latest = latest_change(connection) if commits != self.commits else None
+        self.commits = commits
+        version = self._data_version(connection)
+        if version == self.data_version:
+            if latest is not None:
+                # 没有外部修改，新增的日志都是自己写入的
+                self.last_seq = latest
+            return []
+        self.data_version = version
+
+        rows = connection.execute(
+            text(
+                "SELECT seq, table_name, row_id, operation, category_id, previous_category_id "
+                "FROM change_log WHERE seq > :seq ORDER BY seq LIMIT :limit"
+            ),
+            {"seq": self.last_seq, "limit": self.max_changes + 1},
+        ).all()
+        if not rows:
+            return []
+        # 序号不连续说明需要的日志已被其他窗口清理
+        if rows[0].seq != self.last_seq + 1 or len(rows) > self.max_changes:
+            self.last_seq = latest_change(connection)
+            return None
+        self.last_seq = rows[-1].seq
+        return [Change._make(row) for row in rows]
+
+    def _data_version(self, connection):
+        """读取本连接的PRAGMA data_version"""
+        return connection.exec_driver_sql("PRAGMA data_version").scalar()
@@ -0,0 +1,157 @@
+import os  # 导入os模块，用于文件和目录操作
+import json  # 导入json模块，用于处理JSON格式的数据
+import atexit  # 导入atexit模块，用于在进程退出时写入未保存的配置
+import tempfile  # 导入tempfile模块，用于创建原子替换使用的临时文件
+import threading  # 导入threading模块，用于延迟写入的定时器和锁
+
+# 用户配置的读写
+# 本模块不依赖SQLAlchemy，界面在数据库模块加载之前就可以读取配置
+
+# 配置文件路径
+# 用于存储用户配置，如上次选择的分类等
+CONFIG_FILE = "data/config.json"
+
+# 修改配置后延迟写入的时间(秒)，这段时间内的多次修改只写一次文件
+SAVE_DELAY = 1.0
+
+def save_config(config_data):
+    """
+    保存配置到文件
+    
+    参数:
+        config_data: 要保存的配置数据，通常是一个字典
+        
+    作用:
+        将配置数据序列化为JSON，先写入同一目录下的临时文件并同步到磁盘，
+        再用os.replace原子地替换配置文件。写入过程中崩溃或断电时，
+        配置文件要么是旧内容，要么是新内容，不会被截断
+    """
+    directory = os.path.dirname(CONFIG_FILE) or "."
+    # 数据目录可能还不存在(例如只使用过命令行工具)，先创建
+    os.makedirs(directory, exist_ok=True)
+    # 临时文件必须与配置文件在同一个文件系统中，os.replace才是原子操作
+    fd, temp_path = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=directory)
+    try:
+        # encoding='utf-8'确保正确处理中文等Unicode字符
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            # 将配置数据转换为JSON格式并写入文件
+            json.dump(config_data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, CONFIG_FILE)
+    except BaseException:
+        # 写入失败时删除临时文件，原来的配置文件保持不变
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def load_config():
+    """
+    从文件加载配置
+    
+    返回:
+        配置数据字典，如果文件不存在或格式错误则返回空字典
+        
+    作用:
+        读取配置文件并将JSON数据反序列化为Python对象
+    """
+    # 检查配置文件是否存在
+    if not os.path.exists(CONFIG_FILE):
+        # 如果不存在，返回空字典
+        return {}
+    
+    try:
+        # 尝试打开并读取配置文件
+        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+            # 将JSON数据转换为Python对象并返回
+            return json.load(f)
+    except (json.JSONDecodeError, FileNotFoundError):
+        # 如果文件格式错误或找不到文件，返回空字典
+        return {}
+
+class ConfigStore:
+    """
+    进程内的配置缓存
+
+    配置文件只在第一次读取时加载一次，之后的读取直接使用内存中的字典。
+    修改配置只更新内存并启动一个延迟定时器，连续的多次修改合并为一次后台写入；
+    调用flush()或进程退出时立即写入尚未保存的修改
+    """
+    def __init__(self, delay=SAVE_DELAY):
+        """
+        初始化配置缓存
+
+        参数:
+            delay: 修改后延迟写入的时间(秒)
+        """
+        self.delay = delay
+        self._data = None  # 配置字典，第一次访问时加载
+        self._dirty = False  # 是否有尚未写入文件的修改
+        self._timer = None  # 延迟写入的定时器
+        # 界面线程、数据库工作线程和定时器线程都会访问配置
+        self._lock = threading.RLock()
+        # 进程正常退出时写入尚未保存的修改
+        atexit.register(self.flush)
+
+    def _load(self):
+        """在第一次访问时从文件加载配置"""
+        if self._data is None:
+            self._data = load_config()
+        return self._data
+
+    def get(self, key, default=None):
+        """
+        读取配置项
+
+        参数:
+            key: 配置项名称
+            default: 配置项不存在时返回的默认值
+
+        返回:
+            配置项的值
+        """
+        with self._lock:
+            return self._load().get(key, default)
+
+    def set(self, key, value):
+        """
+        修改配置项
+
+        参数:
+            key: 配置项名称
+            value: 新的值，必须可以序列化为JSON
+
+        作用:
+            只修改内存中的配置，并(重新)启动延迟写入的定时器；值没有变化时什么也不做
+        """
+        with self._lock:
+            data = self._load()
+            if key in data and data[key] == value:
+                return
+            data[key] = value
+            self._dirty = True
+            # 重新开始计时，连续修改时只在最后一次修改后写入
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """
+        立即写入尚未保存的修改
+
+        作用:
+            取消延迟写入的定时器，有修改时原子地写入配置文件；没有修改时不访问文件
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            save_config(self._data)
+            self._dirty = False
+
+# 整个进程共用的配置缓存
+config_store = ConfigStore()
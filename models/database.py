@@ -1,19 +1,57 @@
-from sqlalchemy import create_engine  # 导入SQLAlchemy的create_engine函数，用于创建数据库引擎
-from sqlalchemy.ext.declarative import declarative_base  # 导入declarative_base，用于创建ORM模型的基类
-from sqlalchemy.orm import sessionmaker  # 导入sessionmaker，用于创建数据库会话
+from sqlalchemy import create_engine, event  # 导入create_engine函数用于创建数据库引擎，event用于监听连接事件
+# declarative_base从sqlalchemy.orm导入，旧的sqlalchemy.ext.declarative路径已弃用，而且会额外加载扩展模块
+from sqlalchemy.orm import declarative_base, sessionmaker  # 导入declarative_base用于创建ORM模型的基类，sessionmaker用于创建数据库会话
 import os  # 导入os模块，用于文件和目录操作
-import json  # 导入json模块，用于处理JSON格式的数据
+import time  # 导入time模块，用于记录SQL语句的耗时
+from contextlib import contextmanager  # 导入contextmanager，用于实现工作单元上下文管理器
 
-# 如果不存在，创建数据目录
-# exist_ok=True 参数表示如果目录已存在，不会引发错误
-os.makedirs('data', exist_ok=True)
+# 配置文件的读写在不依赖SQLAlchemy的models.config中，这里导入以保持原有的导入路径
+from models.config import CONFIG_FILE, save_config, load_config, config_store
+# 性能计时记录器，SQL语句的耗时记录在这里
+from models.perf import perf
 
 # 创建数据库引擎
-# 这里使用SQLite数据库，数据库文件保存在data/todo.db
-DATABASE_URL = "sqlite:///data/todo.db"
+# 默认使用SQLite数据库，数据库文件保存在data/todo.db
+# 可以通过环境变量TODO_DATABASE_URL改用其他数据库文件，例如基准测试使用的临时数据库
+DATABASE_URL_ENV = "TODO_DATABASE_URL"
+DATABASE_URL = os.environ.get(DATABASE_URL_ENV) or "sqlite:///data/todo.db"
 # create_engine创建了一个数据库引擎，它是SQLAlchemy与数据库交互的入口点
+# 引擎在第一次使用时才建立连接，数据目录在init_db()中创建
 engine = create_engine(DATABASE_URL)
 
+# API服务器(api_server)执行数据库操作的默认和最多线程数
+# 每个线程和响应缓存各持有一个连接，总数不能超过引擎连接池的容量(QueuePool默认5个连接加10个溢出连接)。
+# 定义在这里而不是api_server中，命令行工具解析参数时不需要导入asyncio
+API_DEFAULT_WORKERS = 8
+API_MAX_WORKERS = 14
+
+# 数据库性能配置
+# 每个配置是一组在连接建立时执行的PRAGMA
+# durable：WAL日志 + 每次提交完整同步到磁盘，断电也不会丢失已提交的事务
+# fast：WAL日志 + synchronous=NORMAL，提交时不再等待fsync，断电时可能丢失最后几个事务，但数据库不会损坏
+DB_PROFILES = {
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -8000,  # 负数表示以KB为单位，约8MB页缓存
+        "mmap_size": 0,  # 不使用内存映射
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,  # 约64MB页缓存
+        "mmap_size": 268435456,  # 256MB内存映射
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    },
+}
+# 默认使用的配置
+DEFAULT_DB_PROFILE = "fast"
+# 用于选择配置的环境变量，优先级高于配置文件中的db_profile
+DB_PROFILE_ENV = "TODO_DB_PROFILE"
+
 # 创建会话工厂
 # sessionmaker创建一个工厂，用于生成与数据库交互的会话对象
 # autocommit=False：默认不自动提交事务
@@ -25,77 +63,147 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # declarative_base()返回一个类，所有ORM模型类都将继承这个基类
 Base = declarative_base()
 
-# 配置文件路径
-# 用于存储用户配置，如上次选择的分类等
-CONFIG_FILE = "data/config.json"
-
-def get_db():
+def get_db_profile():
     """
-    获取数据库会话
+    获取当前使用的数据库性能配置名称
     
     返回:
-        一个数据库会话对象，用于与数据库交互
+        配置名称，依次从环境变量TODO_DB_PROFILE、配置文件中的db_profile读取，
+        都没有设置或名称无效时返回默认配置
         
     注意:
-        使用try-finally确保会话在使用后被关闭，防止资源泄漏
+        每个新连接都会调用本函数，配置从内存中的config_store读取，不会重复读取配置文件
     """
-    # 创建一个新的数据库会话
-    db = SessionLocal()
-    try:
-        # 返回会话供调用者使用
-        return db
-    finally:
-        # 确保会话在使用后被关闭
-        # 这部分代码会在函数返回后执行
-        db.close()
+    name = os.environ.get(DB_PROFILE_ENV) or config_store.get("db_profile")
+    if name not in DB_PROFILES:
+        return DEFAULT_DB_PROFILE
+    return name
 
-def init_db():
+@event.listens_for(engine, "connect")
+def apply_db_profile(dbapi_connection, connection_record):
     """
-    初始化数据库
+    在每个新建立的数据库连接上应用性能配置
     
-    作用:
-        根据模型定义创建数据库表结构
-        如果表已存在，则不会重新创建
+    参数:
+        dbapi_connection: 底层的sqlite3连接对象
+        connection_record: 连接池中的连接记录
     """
-    # create_all方法会根据Base的子类(即我们的模型类)创建所有表
-    Base.metadata.create_all(bind=engine)
+    cursor = dbapi_connection.cursor()
+    for pragma, value in DB_PROFILES[get_db_profile()].items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
 
-def save_config(config_data):
+# 连接使用统计
+# connects：新建立的数据库连接数
+# checkouts：从连接池取出连接的次数
+# checkins：连接归还连接池的次数
+connection_stats = {"connects": 0, "checkouts": 0, "checkins": 0}
+
+@event.listens_for(engine, "connect")
+def count_connect(dbapi_connection, connection_record):
+    """记录新建立的连接"""
+    connection_stats["connects"] += 1
+
+@event.listens_for(engine, "checkout")
+def count_checkout(dbapi_connection, connection_record, connection_proxy):
+    """记录从连接池取出连接"""
+    connection_stats["checkouts"] += 1
+
+@event.listens_for(engine, "checkin")
+def count_checkin(dbapi_connection, connection_record):
+    """记录连接归还连接池"""
+    connection_stats["checkins"] += 1
+
+@event.listens_for(engine, "before_cursor_execute")
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    """在执行SQL语句之前记录开始时间"""
+    # 游标执行可能嵌套(例如在事件中执行语句)，开始时间保存在连接上的栈中
+    conn.info.setdefault("statement_start", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def record_statement_time(conn, cursor, statement, parameters, context, executemany):
+    """在执行SQL语句之后记录耗时"""
+    start = conn.info["statement_start"].pop()
+    perf.record_statement(statement, (time.perf_counter() - start) * 1000)
+
+@event.listens_for(engine, "handle_error")
+def discard_statement_timer(exception_context):
+    """执行失败的语句不会触发after_cursor_execute，丢弃它的开始时间"""
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("statement_start"):
+        connection.info["statement_start"].pop()
+
+def get_connection_stats():
     """
-    保存配置到文件
+    获取连接使用统计
+    
+    返回:
+        包含connects、checkouts、checkins计数的字典副本
+    """
+    return dict(connection_stats)
+
+def get_db():
+    """
+    获取数据库会话
+    
+    返回:
+        一个新的数据库会话对象，用于与数据库交互
+        
+    注意:
+        调用者负责在使用完毕后调用close()关闭会话，
+        一般情况下应优先使用session_scope()
+    """
+    return SessionLocal()
+
+@contextmanager
+def session_scope(session=None):
+    """
+    工作单元上下文管理器
     
     参数:
-        config_data: 要保存的配置数据，通常是一个字典
+        session: 要使用的会话，为None时创建一个新会话并在结束时关闭
         
     作用:
-        将配置数据序列化为JSON并保存到配置文件
+        在with块结束时提交事务并把连接归还连接池，出现异常时回滚。
+        传入长期存在的会话时，会话本身(以及其中的标识映射)在with块结束后继续保留，
+        同一个对象的重复读取可以直接从标识映射中获得，不需要再次查询
+        
+    用法:
+        with session_scope() as db:
+            db.add(Task(title="..."))
     """
-    # 以写模式打开配置文件，如果文件不存在则创建
-    # encoding='utf-8'确保正确处理中文等Unicode字符
-    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-        # 将配置数据转换为JSON格式并写入文件
-        json.dump(config_data, f)
+    db = session if session is not None else SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if session is None:
+            db.close()
 
-def load_config():
+def init_db():
     """
-    从文件加载配置
+    初始化数据库
     
-    返回:
-        配置数据字典，如果文件不存在或格式错误则返回空字典
-        
     作用:
-        读取配置文件并将JSON数据反序列化为Python对象
+        创建数据库文件所在的目录，然后检查保存在PRAGMA user_version中的结构版本：
+        版本与当前版本一致时直接返回，不执行任何建表或检查索引的语句；
+        新数据库一次创建所有表、索引和全文索引；旧版本的数据库依次执行升级函数。
+        最后清理旧的修改日志，没有需要清理的行时只是一次按主键的范围查找
     """
-    # 检查配置文件是否存在
-    if not os.path.exists(CONFIG_FILE):
-        # 如果不存在，返回空字典
-        return {}
+    # migrations模块依赖本模块中的Base和engine，因此在函数内导入
+    from models.migrations import migrate
+    from models.changes import prune_change_log
     
-    try:
-        # 尝试打开并读取配置文件
-        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-            # 将JSON数据转换为Python对象并返回
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        # 如果文件格式错误或找不到文件，返回空字典
-        return {} 
\ No newline at end of file
+    # 为SQLite数据库文件创建所在目录
+    database = engine.url.database
+    if database and database != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+    
+    # 整个检查和升级在一个事务中完成，升级失败时版本号不会改变
+    with engine.begin() as connection:
+        migrate(connection)
+        # 清理旧的修改日志，只保留最近的若干行
+        prune_change_log(connection)
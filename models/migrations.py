@@ -0,0 +1,218 @@
+from sqlalchemy.schema import CreateTable  # 导入CreateTable，用于生成重建表时的建表语句
+
+from models.database import Base  # 导入ORM模型的基类，其中的metadata描述了所有表
+from models.models import Category, Task, ArchivedTask, ChangeLog, SyncState  # 导入数据模型，使它们注册到Base.metadata
+from models.search import create_search_index, add_bigram_index  # 导入全文索引和短词二元组索引的创建函数
+from models.changes import create_change_log_triggers, drop_change_log_triggers  # 导入修改日志触发器的创建和删除函数
+
+# 当前的数据库结构版本
+# 版本号保存在SQLite数据库文件头的PRAGMA user_version中，读取它不需要查询任何表
+SCHEMA_VERSION = 11
+
+def create_schema(connection):
+    """
+    创建所有缺失的表、索引、全文索引和修改日志触发器
+
+    参数:
+        connection: 数据库连接
+
+    作用:
+        已存在的表和索引不会被修改
+    """
+    Base.metadata.create_all(bind=connection)
+    add_columns_and_indexes(connection)
+    create_search_index(connection)
+    create_change_log_triggers(connection)
+
+def add_missing_columns(connection):
+    """
+    为已存在的表添加模型中新增的列
+
+    参数:
+        connection: 数据库连接
+
+    作用:
+        create_all不会修改已存在的表，因此逐个比较模型中的列和PRAGMA table_info，
+        用ALTER TABLE ADD COLUMN添加缺失的列。新增的列必须可以为空，已有的行中该列为NULL。
+        还不存在的表没有列，跳过它们，由后续的create_all按模型定义创建
+    """
+    for table in Base.metadata.sorted_tables:
+        existing = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table.name})")}
+        if not existing:
+            continue
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+
+def add_columns_and_indexes(connection):
+    """
+    添加缺失的列，再创建缺失的索引
+
+    参数:
+        connection: 数据库连接
+
+    作用:
+        索引都按当前的模型定义创建，可能用到新增的列，因此必须先添加列。
+        每个补建索引的升级步骤都使用这个函数，从任何旧版本升级时都不会遇到缺失的列
+    """
+    add_missing_columns(connection)
+    create_indexes(connection)
+
+def create_indexes(connection):
+    """
+    创建模型中定义的所有缺失的索引
+
+    参数:
+        connection: 数据库连接
+
+    作用:
+        create_all不会为已存在的表补建索引，因此逐个检查模型中定义的索引。
+        SQLAlchemy的反射不支持表达式索引，按名称在sqlite_master中检查索引是否存在
+    """
+    existing = {
+        name for (name,) in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")
+    }
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=connection)
+
+def rebuild_tables_with_cascade(connection):
+    """
+    重建任务表和归档任务表，使分类外键带有ON DELETE CASCADE
+
+    参数:
+        connection: 数据库连接
+
+    作用:
+        SQLite不能修改已有的外键，只能按当前的模型定义新建表、复制所有行、删除旧表再改名。
+        先删除分类已不存在的孤立任务，否则复制时会违反外键约束。
+        行的ID保持不变，全文索引(外部内容表)依然有效；旧表的触发器在改名后重新创建，索引按模型重新创建
+    """
+    for table in (Task.__table__, ArchivedTask.__table__):
+        name = table.name
+        # 删除孤立的任务：旧版本用批量语句删除分类时没有删除它的任务
+        connection.exec_driver_sql(
+            f"DELETE FROM {name} WHERE category_id IS NOT NULL "
+            f"AND category_id NOT IN (SELECT id FROM categories)"
+        )
+        triggers = [
+            sql for (sql,) in connection.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (name,)
+            )
+        ]
+        create = str(CreateTable(table).compile(dialect=connection.dialect))
+        connection.exec_driver_sql(create.replace(f"CREATE TABLE {name} ", f"CREATE TABLE {name}_new ", 1))
+        # 旧表中可能还没有之后的版本才添加的列，只复制两个表都有的列
+        existing = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({name})")}
+        columns = ", ".join(column.name for column in table.columns if column.name in existing)
+        connection.exec_driver_sql(f"INSERT INTO {name}_new ({columns}) SELECT {columns} FROM {name}")
+        # 删除表时的隐式DELETE不会触发触发器，全文索引不受影响
+        connection.exec_driver_sql(f"DROP TABLE {name}")
+        connection.exec_driver_sql(f"ALTER TABLE {name}_new RENAME TO {name}")
+        for sql in triggers:
+            connection.exec_driver_sql(sql)
+    create_indexes(connection)
+
+def add_sync_columns(connection):
+    """
+    为同步添加全局唯一ID，并按新的定义重建修改日志
+
+    参数:
+        connection: 数据库连接
+
+    作用:
+        为任务和分类添加uid列，已有的行用lower(hex(randomblob(16)))补全；
+        修改日志只用于检测其他窗口的修改，没有需要保留的内容，删除后按新的定义重新创建，
+        补全ID时触发器已被删除，不会为每一行写入修改日志
+    """
+    drop_change_log_triggers(connection)
+    connection.exec_driver_sql("DROP TABLE IF EXISTS change_log")
+    add_missing_columns(connection)
+    for table in (Category.__table__, Task.__table__):
+        connection.exec_driver_sql(f"UPDATE {table.name} SET uid = lower(hex(randomblob(16))) WHERE uid IS NULL")
+    create_schema(connection)
+
+def rebuild_completed_at_index(connection):
+    """
+    按新的表达式重建(completed, 完成时间)索引
+
+    参数:
+        connection: 数据库连接
+
+    作用:
+        排序键completed_at中替换NULL的常量改为带微秒的格式，旧索引中的表达式与查询不再一致，
+        SQLite不会再使用它。删除旧索引后按当前的模型定义重新创建
+    """
+    connection.exec_driver_sql("DROP INDEX IF EXISTS ix_tasks_completed_completed_at")
+    add_columns_and_indexes(connection)
+
+# 升级函数列表，MIGRATIONS[i]把数据库从版本i升级到版本i+1
+# 版本0是还没有记录版本号的旧数据库，升级到版本1时补建缺失的表、索引和全文索引
+MIGRATIONS = [
+    create_schema,
+    # 版本2：任务列表排序使用的(category_id, 排序键)索引
+    add_columns_and_indexes,
+    # 版本3：截止日期视图使用的(completed, 截止日期)索引
+    add_columns_and_indexes,
+    # 版本4：任务的完成时间(completed_at)列和智能列表使用的索引
+    add_columns_and_indexes,
+    # 版本5：归档任务的archived_tasks表及其全文索引，create_schema只创建缺失的部分
+    create_schema,
+    # 版本6：分类外键改为ON DELETE CASCADE，并删除孤立的任务
+    rebuild_tables_with_cascade,
+    # 版本7：修改日志change_log表及其触发器，create_schema只创建缺失的部分
+    create_schema,
+    # 版本8：任务和分类的全局唯一ID、修改日志的修改时间和来源，以及同步状态表
+    add_sync_columns,
+    # 版本9：少于3个字符的搜索词使用的二元组索引，全文索引的触发器同时维护它
+    add_bigram_index,
+    # 版本10：归档任务的全局唯一ID及其索引，恢复时保留原来的ID
+    add_columns_and_indexes,
+    # 版本11：按新的完成时间排序键表达式重建(completed, 完成时间)索引
+    rebuild_completed_at_index,
+]
+
+def get_schema_version(connection):
+    """
+    读取数据库的结构版本
+
+    参数:
+        connection: 数据库连接
+
+    返回:
+        版本号，新数据库和旧版本应用创建的数据库都是0
+    """
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+def migrate(connection):
+    """
+    把数据库升级到当前的结构版本
+
+    参数:
+        connection: 数据库连接，调用者负责提交事务
+
+    返回:
+        执行了建表或升级时返回True，版本已是最新时返回False
+
+    注意:
+        数据库的版本比应用支持的版本新时抛出RuntimeError，避免旧版本的应用修改新的数据库结构
+    """
+    version = get_schema_version(connection)
+    if version == SCHEMA_VERSION:
+        return False
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"数据库结构版本 {version} 比应用支持的版本 {SCHEMA_VERSION} 新，请升级应用")
+
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks'"
+    ).first()
+    if not exists:
+        # 新数据库直接按当前的模型定义创建，不需要逐个执行升级函数
+        create_schema(connection)
+    else:
+        for upgrade in MIGRATIONS[version:]:
+            upgrade(connection)
+    connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return True
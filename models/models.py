@@ -1,7 +1,10 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, Text, Enum  # 导入SQLAlchemy的列类型和工具
-from sqlalchemy.orm import relationship  # 导入relationship，用于定义模型之间的关系
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, DateTime, Text, Enum, Index  # 导入SQLAlchemy的列类型和工具
+from sqlalchemy import case, func, literal_column, text  # 导入case、func、literal_column和text，用于定义排序键表达式和默认值
+from sqlalchemy.orm import relationship, deferred  # 导入relationship用于定义模型之间的关系，deferred用于延迟加载大字段
 import enum  # 导入enum模块，用于创建枚举类型
-from datetime import datetime  # 导入datetime，用于处理日期和时间
+import uuid  # 导入uuid模块，用于生成同步时识别任务和分类的全局ID
+from collections import namedtuple  # 导入namedtuple，用于定义任务列表的轻量行类型
+from datetime import date, datetime  # 导入date和datetime，用于处理日期和时间
 
 from models.database import Base  # 从database模块导入Base类，所有模型都将继承这个类
 
@@ -16,6 +19,15 @@ class PriorityEnum(enum.Enum):
     MEDIUM = "medium"  # 中优先级
     HIGH = "high"    # 高优先级
 
+def new_uid():
+    """
+    生成一个全局唯一ID
+
+    返回:
+        32个十六进制字符，与数据库中用lower(hex(randomblob(16)))补全的ID格式相同
+    """
+    return uuid.uuid4().hex
+
 class Category(Base):
     """
     分类模型
@@ -32,12 +44,17 @@ class Category(Base):
     icon = Column(String, nullable=True)
     # 颜色，默认为蓝色
     color = Column(String, default="#3498db")
+    # 全局唯一ID，同步时在不同的数据库之间识别同一个分类(见models.sync)
+    # 其他程序直接插入的行为空，同步之前补全
+    uid = Column(String, nullable=True, default=new_uid)
     
     # 与任务的关系
     # relationship定义了与Task模型的一对多关系
     # back_populates指定了Task模型中的对应属性名
     # cascade="all, delete-orphan"表示删除分类时，也会删除属于该分类的所有任务
-    tasks = relationship("Task", back_populates="category", cascade="all, delete-orphan")
+    # passive_deletes=True：外键声明了ON DELETE CASCADE，由数据库删除任务，
+    # 通过会话删除分类对象时不会先把所有任务加载到内存中
+    tasks = relationship("Task", back_populates="category", cascade="all, delete-orphan", passive_deletes=True)
 
     def __repr__(self):
         """
@@ -54,13 +71,22 @@ class Task(Base):
     表示用户的待办事项任务
     """
     __tablename__ = "tasks"  # 数据库表名
+    
+    # 针对应用实际执行的查询建立的复合索引
+    # (category_id, completed, priority)：按分类统计未完成/已完成任务以及按状态和优先级筛选
+    # (due_date)：按截止日期的范围查询
+    __table_args__ = (
+        Index("ix_tasks_category_completed_priority", "category_id", "completed", "priority"),
+        Index("ix_tasks_due_date", "due_date"),
+    )
 
     # 主键，自动递增的整数ID
     id = Column(Integer, primary_key=True, index=True)
     # 任务标题，创建索引以加快查询
     title = Column(String, index=True)
     # 任务描述，可以为空
-    description = Column(Text, nullable=True)
+    # 描述可能很长而任务列表不显示它，因此延迟加载：查询任务时不读取，第一次访问该属性时才单独查询
+    description = deferred(Column(Text, nullable=True))
     # 完成状态，默认为未完成
     completed = Column(Boolean, default=False)
     # 优先级，默认为中等优先级
@@ -69,13 +95,18 @@ class Task(Base):
     due_date = Column(Date, nullable=True)
     # 创建日期，默认为当前日期
     created_at = Column(Date, default=datetime.now().date)
+    # 完成时间，未完成的任务为空，用于"最近完成"列表
+    completed_at = Column(DateTime, nullable=True)
     
     # 分类的外键
-    # ForeignKey指定了外键关联的表和列
-    category_id = Column(Integer, ForeignKey("categories.id"))
+    # ForeignKey指定了外键关联的表和列，ondelete="CASCADE"表示删除分类时由数据库删除它的所有任务
+    # 创建索引，按分类加载任务时可以直接按ID顺序读取索引，不需要扫描整张表或额外排序
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), index=True)
     # relationship定义了与Category模型的多对一关系
     # back_populates指定了Category模型中的对应属性名
     category = relationship("Category", back_populates="tasks")
+    # 全局唯一ID，同步时在不同的数据库之间识别同一个任务
+    uid = Column(String, nullable=True, default=new_uid)
 
     def __repr__(self):
         """
@@ -83,4 +114,172 @@ class Task(Base):
         
         用于调试和日志记录
         """
-        return f"<Task {self.title}>" 
\ No newline at end of file
+        return f"<Task {self.title}>"
+
+class ArchivedTask(Base):
+    """
+    归档的任务
+
+    很久以前完成的任务从tasks表移动到这里，tasks表及其索引只包含仍然需要经常访问的任务。
+    归档的任务可以搜索，也可以恢复到tasks表
+    """
+    __tablename__ = "archived_tasks"  # 数据库表名
+
+    # 归档记录自己的主键，同一个任务ID在恢复后再次归档时也不会冲突
+    id = Column(Integer, primary_key=True)
+    # 归档前的任务ID，恢复时尽量保留原来的ID
+    task_id = Column(Integer, nullable=False)
+    # 归档前的全局唯一ID，恢复时保留，其他数据库中的同一个任务不会因为恢复而重复
+    # 在加入这一列之前归档的任务为空，恢复时分配新的ID
+    uid = Column(String, nullable=True)
+    # 以下各列与Task相同
+    title = Column(String)
+    description = deferred(Column(Text, nullable=True))
+    completed = Column(Boolean, default=True)
+    priority = Column(String, default=PriorityEnum.MEDIUM.value)
+    due_date = Column(Date, nullable=True)
+    created_at = Column(Date, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    # 分类ID，删除分类时由数据库一起删除归档的任务
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), nullable=True, index=True)
+    # 归档时间
+    archived_at = Column(DateTime, default=datetime.now)
+
+    def __repr__(self):
+        """
+        返回归档任务的字符串表示
+        
+        用于调试和日志记录
+        """
+        return f"<ArchivedTask {self.title}>"
+
+class ChangeLog(Base):
+    """
+    数据修改日志
+
+    每插入、修改或删除一个任务或分类，触发器就在这里追加一行(见models.changes)，
+    无论修改来自哪个窗口、命令行还是其他程序。序号单调递增，
+    其他窗口只需要读取序号大于上次读到的行，就能知道哪些任务和分类被修改了
+    """
+    __tablename__ = "change_log"  # 数据库表名
+    # AUTOINCREMENT保证序号不会重复使用，即使旧的行被清理掉
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    # 单调递增的序号
+    seq = Column(Integer, primary_key=True)
+    # 被修改的表："tasks"或"categories"
+    table_name = Column(String, nullable=False)
+    # 被修改的行的ID
+    row_id = Column(Integer, nullable=False)
+    # 操作："insert"、"update"或"delete"
+    operation = Column(String, nullable=False)
+    # 任务所属的分类ID(删除时为删除前的分类)，不是外键，分类删除后日志依然保留
+    category_id = Column(Integer, nullable=True)
+    # 修改任务时修改前的分类ID，任务被移动到其他分类时两个分类的计数都需要更新
+    previous_category_id = Column(Integer, nullable=True)
+    # 被修改的行的全局唯一ID(删除时为删除前的ID)，同步时据此上传修改和删除标记
+    row_uid = Column(String, nullable=True, index=True)
+    # 修改时间(UTC)，由数据库填写，同步时作为后写入者胜出的版本
+    changed_at = Column(String, nullable=False, server_default=text("(strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))"))
+    # 修改的来源：本地修改为空，应用同步下载的修改时为"sync"，归档和恢复任务时为"archive"，
+    # 这些修改都不会被上传
+    origin = Column(String, nullable=True)
+
+class SyncState(Base):
+    """
+    同步状态
+
+    键值对：本数据库的客户端ID、已上传的修改日志序号和已下载的服务器序号
+    """
+    __tablename__ = "sync_state"  # 数据库表名
+
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=True)
+
+# 任务列表的一行
+# 只包含列表显示和排序需要的列，不包含描述。列表查询直接选择这些列，
+# 不创建ORM对象，也不加入会话的标识映射
+TaskRow = namedtuple(
+    "TaskRow", ["id", "title", "priority", "completed", "due_date", "created_at", "category_id", "completed_at"]
+)
+TASK_ROW_COLUMNS = [getattr(Task, name) for name in TaskRow._fields]
+
+def task_row(task):
+    """
+    从Task对象创建TaskRow
+
+    参数:
+        task: Task对象
+
+    返回:
+        TaskRow元组，不会读取延迟加载的描述
+    """
+    return TaskRow._make(getattr(task, name) for name in TaskRow._fields)
+
+# 任务列表的排序键
+# 可以为空的列用COALESCE替换为不会出现的极值(没有截止日期的任务排在最后)，
+# 键值中没有NULL，键集分页的大小比较总是有效。
+# 常量用literal_column直接写入SQL而不是作为绑定参数，
+# 查询中的表达式与表达式索引中的完全一致，SQLite才会使用这些索引
+PRIORITY_RANK = case(
+    (Task.priority == literal_column("'high'"), literal_column("0")),
+    (Task.priority == literal_column("'medium'"), literal_column("1")),
+    else_=literal_column("2"),
+)
+TASK_SORT_KEYS = {
+    "id": Task.id,
+    "title": Task.title,
+    "priority": PRIORITY_RANK,  # 升序时高优先级在前
+    # 完成状态按整数比较，SQLAlchemy不允许对布尔值使用大于、小于比较
+    "completed": func.coalesce(Task.completed, literal_column("0"), type_=Integer),
+    "due_date": func.coalesce(Task.due_date, literal_column("'9999-12-31'")),
+    "created_at": func.coalesce(Task.created_at, literal_column("'0001-01-01'")),
+    # SQLAlchemy保存和绑定时间时总是带6位微秒，替换值使用相同的格式，
+    # 否则作为键集分页的锚点绑定的datetime(1, 1, 1)会大于所有被替换的值
+    "completed_at": func.coalesce(Task.completed_at, literal_column("'0001-01-01 00:00:00.000000'")),
+}
+
+# COALESCE替换空值时使用的极值，与TASK_SORT_KEYS中的常量相同
+SORT_KEY_DEFAULTS = {
+    "due_date": date(9999, 12, 31),
+    "created_at": date(1, 1, 1),
+    "completed_at": datetime(1, 1, 1),
+}
+
+def sort_key_value(sort, row):
+    """
+    在Python中计算一行的排序键值
+
+    参数:
+        sort: TASK_SORT_KEYS中的名称
+        row: TaskRow元组或Task对象
+
+    返回:
+        与在数据库中查询TASK_SORT_KEYS[sort]得到的值相同，可以直接作为键集分页的锚点键值，
+        不需要再按ID查询锚点任务
+    """
+    if sort == "priority":
+        return {"high": 0, "medium": 1}.get(row.priority, 2)
+    if sort == "completed":
+        return int(bool(row.completed))
+    value = getattr(row, sort)
+    return SORT_KEY_DEFAULTS[sort] if value is None and sort in SORT_KEY_DEFAULTS else value
+
+# 每个排序键一个(category_id, 排序键)索引
+# SQLite的索引项中隐含rowid(即任务ID)，因此同一个索引也满足ORDER BY 排序键, id
+for _name in ("title", "priority", "completed", "due_date", "created_at"):
+    Index(f"ix_tasks_category_sort_{_name}", Task.category_id, TASK_SORT_KEYS[_name])
+
+# 智能列表使用的索引，每个列表的筛选条件和排序都直接对应其中一个索引的顺序
+# (completed, 截止日期)：全部未完成任务、逾期、今天和未来7天
+Index("ix_tasks_completed_due", Task.completed, TASK_SORT_KEYS["due_date"])
+# (priority, completed, 截止日期)：高优先级的未完成任务
+Index("ix_tasks_priority_completed_due", Task.priority, Task.completed, TASK_SORT_KEYS["due_date"])
+# (completed, 完成时间)：最近完成的任务
+Index("ix_tasks_completed_completed_at", Task.completed, TASK_SORT_KEYS["completed_at"])
+
+# 同步时按全局唯一ID查找任务和分类
+Index("ix_tasks_uid", Task.uid, unique=True)
+Index("ix_categories_uid", Category.uid, unique=True)
+# 应用同步下载的修改时按全局唯一ID查找归档的任务
+Index("ix_archived_tasks_uid", ArchivedTask.uid)
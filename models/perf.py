@@ -0,0 +1,221 @@
+import time  # 导入time模块，用于高精度计时
+import json  # 导入json模块，用于导出计时数据
+import datetime  # 导入datetime模块，用于记录导出时间
+import threading  # 导入threading模块，用于保护计时数据的字典
+import statistics  # 导入statistics模块，用于计算中位数
+from collections import deque  # 导入deque，用作固定长度的环形缓冲区
+from contextlib import contextmanager  # 导入contextmanager，用于实现计时上下文管理器
+
+# 进程内的性能计时
+# 本模块不依赖SQLAlchemy和tkinter：SQL语句的耗时由models.database中的引擎事件记录，
+# 界面操作的耗时由主窗口记录，工作线程记录每次提交的耗时。
+# 每个操作只保留最近的若干次耗时，内存占用固定，可以一直开启
+
+# 每个操作保留的最近耗时数
+OPERATION_SAMPLES = 500
+# 保留的最近SQL语句数
+STATEMENT_SAMPLES = 2000
+
+class PerfRecorder:
+    """
+    性能计时记录器
+
+    按操作名称记录耗时(毫秒)，每个操作的最近耗时保存在环形缓冲区中，总次数单独计数。
+    SQL语句的耗时保存在另一个环形缓冲区中，按语句文本汇总后得到最慢的语句。
+    界面线程和数据库工作线程都会写入，汇总时加锁复制
+    """
+    def __init__(self, operation_samples=OPERATION_SAMPLES, statement_samples=STATEMENT_SAMPLES):
+        """
+        初始化空记录器
+
+        参数:
+            operation_samples: 每个操作保留的最近耗时数
+            statement_samples: 保留的最近SQL语句数
+        """
+        self.operation_samples = operation_samples
+        self._lock = threading.Lock()
+        self._operations = {}  # 操作名称 -> deque(耗时)
+        self._counts = {}  # 操作名称 -> 总次数
+        self._statements = deque(maxlen=statement_samples)  # (语句, 耗时)
+        self.started = time.time()  # 开始记录(或上次清空)的时间
+
+    def record(self, name, milliseconds):
+        """
+        记录一次操作的耗时
+
+        参数:
+            name: 操作名称
+            milliseconds: 耗时(毫秒)
+        """
+        with self._lock:
+            samples = self._operations.get(name)
+            if samples is None:
+                samples = self._operations[name] = deque(maxlen=self.operation_samples)
+            samples.append(milliseconds)
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def record_statement(self, statement, milliseconds):
+        """
+        记录一条SQL语句的耗时
+
+        参数:
+            statement: 语句文本，参数以占位符表示，相同的语句可以汇总
+            milliseconds: 耗时(毫秒)
+        """
+        # deque.append是原子操作，不需要加锁
+        self._statements.append((statement, milliseconds))
+        self.record("sql", milliseconds)
+
+    @contextmanager
+    def timed(self, name):
+        """
+        记录with块的耗时
+
+        参数:
+            name: 操作名称
+
+        用法:
+            with perf.timed("load_categories"):
+                ...
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def timer(self, name):
+        """
+        开始一次跨越多个回调的计时
+
+        参数:
+            name: 操作名称
+
+        返回:
+            Timer对象，调用其stop()时记录从现在开始的耗时
+        """
+        return Timer(self, name)
+
+    def clear(self):
+        """清空所有记录"""
+        with self._lock:
+            self._operations.clear()
+            self._counts.clear()
+            self._statements.clear()
+            self.started = time.time()
+
+    def operations(self):
+        """
+        按操作汇总耗时
+
+        返回:
+            列表，每一项是包含name、count、samples、p50_ms、p95_ms、max_ms的字典，按名称排序。
+            count是总次数，百分位数只根据环形缓冲区中的最近耗时计算
+        """
+        with self._lock:
+            snapshot = [(name, list(samples), self._counts[name]) for name, samples in self._operations.items()]
+        result = []
+        for name, samples, count in sorted(snapshot):
+            result.append({"name": name, "count": count, **summarize(samples)})
+        return result
+
+    def slowest_statements(self, limit=20):
+        """
+        汇总最近的SQL语句，找出最慢的语句
+
+        参数:
+            limit: 返回的语句数
+
+        返回:
+            列表，每一项是包含statement、count、samples、p50_ms、p95_ms、max_ms的字典，
+            按最长耗时降序排列
+        """
+        grouped = {}
+        for statement, milliseconds in list(self._statements):
+            grouped.setdefault(statement, []).append(milliseconds)
+        result = []
+        for statement, samples in grouped.items():
+            result.append({"statement": statement, "count": len(samples), **summarize(samples)})
+        result.sort(key=lambda stats: stats["max_ms"], reverse=True)
+        return result[:limit]
+
+    def report(self, statements=20):
+        """
+        生成完整的计时报告
+
+        参数:
+            statements: 包含的最慢语句数
+
+        返回:
+            可以序列化为JSON的字典
+        """
+        return {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "since": datetime.datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "operations": self.operations(),
+            "slowest_statements": self.slowest_statements(statements),
+        }
+
+    def dump(self, path):
+        """
+        把计时报告写入JSON文件
+
+        参数:
+            path: 文件路径
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+            f.write("\n")
+
+class Timer:
+    """
+    一次跨越多个回调的计时
+
+    例如从提交数据库请求到界面显示结果，只有第一次stop()会被记录
+    """
+    def __init__(self, recorder, name):
+        """
+        开始计时
+
+        参数:
+            recorder: PerfRecorder对象
+            name: 操作名称
+        """
+        self.recorder = recorder
+        self.name = name
+        self.start = time.perf_counter()
+        self.stopped = False
+
+    def stop(self, *args):
+        """
+        结束计时并记录耗时
+
+        作用:
+            接受并忽略任意参数，可以直接用作回调。重复调用不会重复记录
+        """
+        if self.stopped:
+            return
+        self.stopped = True
+        self.recorder.record(self.name, (time.perf_counter() - self.start) * 1000)
+
+def summarize(samples):
+    """
+    计算一组耗时的统计量
+
+    参数:
+        samples: 耗时列表(毫秒)，不能为空
+
+    返回:
+        包含samples、p50_ms、p95_ms、max_ms的字典
+    """
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "samples": len(ordered),
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(p95, 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+# 全局记录器，数据库引擎、工作线程和主窗口都写入这里
+perf = PerfRecorder()
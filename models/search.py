@@ -0,0 +1,325 @@
+from sqlalchemy import text  # 导入text，用于执行原生SQL
+
+# 全文搜索使用的FTS5虚拟表
+# content='tasks'表示外部内容表，索引本身不重复保存任务的文本
+# trigram分词器按三个字符切分，中文等没有空格分隔的文本也能按子串搜索
+FTS_TABLE = "tasks_fts"
+# 归档任务的全文索引，与tasks_fts使用相同的结构
+ARCHIVE_FTS_TABLE = "archived_tasks_fts"
+
+# 短词使用的二元组索引
+# trigram分词器不能为少于3个字符的词使用索引，而中文的词大多只有两个字。
+# 这里把标题和描述中每个位置开始的两个字符(最后一个位置是单个字符)用空格连接成一个文档，
+# 由unicode61分词器建立索引：两个字符的词直接匹配一个词元，单个字符用前缀查询匹配(prefix='1'建立前缀索引)。
+# content=''表示不保存文本，detail=none和columnsize=0只保存每个词元出现在哪些任务中，索引很小。
+# 分隔符和标点会被分词器去掉，匹配的结果是候选集合，搜索时再用LIKE确认
+BIGRAM_TABLE = "tasks_bigrams"
+# 归档任务的二元组索引
+ARCHIVE_BIGRAM_TABLE = "archived_tasks_bigrams"
+
+# 搜索结果中高亮匹配内容使用的标记
+HIGHLIGHT_START = "【"
+HIGHLIGHT_END = "】"
+
+# 默认最多返回的搜索结果数量
+SEARCH_LIMIT = 500
+
+def bigrams_sql(column):
+    """
+    生成把一列文本切分为二元组的SQL表达式
+
+    参数:
+        column: 列的SQL表达式，例如new.title
+
+    返回:
+        SQL表达式，值为用空格连接的二元组，列为NULL时为NULL
+
+    作用:
+        触发器中不能使用WITH递归查询，这里用json_each生成0到length-1的位置：
+        hex(zeroblob(n))是n个"00"，替换为"0,"后得到n个元素的JSON数组。
+        只使用SQLite内置的函数，其他程序直接修改任务表时触发器同样可以执行
+    """
+    return (
+        f"(SELECT group_concat(substr({column}, key + 1, 2), ' ') FROM json_each("
+        f"'[' || rtrim(replace(hex(zeroblob(length({column}))), '00', '0,'), ',') || ']'))"
+    )
+
+def bigram_document_sql(row):
+    """
+    生成一个任务在二元组索引中的文档
+
+    参数:
+        row: 触发器中的行，new或old
+
+    返回:
+        SQL表达式，标题和描述的二元组用空格连接。删除时必须提供与插入时相同的文档
+    """
+    return f"coalesce({bigrams_sql(row + '.title')}, '') || ' ' || coalesce({bigrams_sql(row + '.description')}, '')"
+
+# 保持全文索引和二元组索引与tasks表同步的触发器
+# 只有标题或描述变化时才更新索引，切换完成状态等操作不会触碰全文索引
+FTS_TRIGGERS = {
+    "tasks_fts_insert": f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+        INSERT INTO {BIGRAM_TABLE}(rowid, grams) VALUES (new.id, {bigram_document_sql("new")});
+    END
+    """,
+    "tasks_fts_delete": f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {BIGRAM_TABLE}({BIGRAM_TABLE}, rowid, grams) VALUES ('delete', old.id, {bigram_document_sql("old")});
+    END
+    """,
+    "tasks_fts_update": f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+        INSERT INTO {BIGRAM_TABLE}({BIGRAM_TABLE}, rowid, grams) VALUES ('delete', old.id, {bigram_document_sql("old")});
+        INSERT INTO {BIGRAM_TABLE}(rowid, grams) VALUES (new.id, {bigram_document_sql("new")});
+    END
+    """,
+}
+
+# 保持归档任务的全文索引和二元组索引与archived_tasks表同步的触发器
+# 归档的任务只会被插入和删除(恢复)，不会被修改
+ARCHIVE_FTS_TRIGGERS = {
+    "archived_tasks_fts_insert": f"""
+    CREATE TRIGGER IF NOT EXISTS archived_tasks_fts_insert AFTER INSERT ON archived_tasks BEGIN
+        INSERT INTO {ARCHIVE_FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+        INSERT INTO {ARCHIVE_BIGRAM_TABLE}(rowid, grams) VALUES (new.id, {bigram_document_sql("new")});
+    END
+    """,
+    "archived_tasks_fts_delete": f"""
+    CREATE TRIGGER IF NOT EXISTS archived_tasks_fts_delete AFTER DELETE ON archived_tasks BEGIN
+        INSERT INTO {ARCHIVE_FTS_TABLE}({ARCHIVE_FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {ARCHIVE_BIGRAM_TABLE}({ARCHIVE_BIGRAM_TABLE}, rowid, grams)
+        VALUES ('delete', old.id, {bigram_document_sql("old")});
+    END
+    """,
+}
+
+def create_search_index(connection):
+    """
+    创建任务和归档任务的全文索引、二元组索引及其同步触发器
+
+    参数:
+        connection: 数据库连接
+
+    作用:
+        不存在的索引会被创建并从已有的行重建；已存在的索引和触发器不做任何修改
+    """
+    create_fts_table(connection, FTS_TABLE, "tasks")
+    create_fts_table(connection, ARCHIVE_FTS_TABLE, "archived_tasks")
+    create_bigram_table(connection, BIGRAM_TABLE, "tasks")
+    create_bigram_table(connection, ARCHIVE_BIGRAM_TABLE, "archived_tasks")
+    for trigger in list(FTS_TRIGGERS.values()) + list(ARCHIVE_FTS_TRIGGERS.values()):
+        connection.execute(text(trigger))
+
+def drop_search_triggers(connection):
+    """
+    删除全文索引的同步触发器
+
+    参数:
+        connection: 数据库连接
+
+    作用:
+        修改触发器的定义时先删除旧的触发器，再由create_search_index()重新创建
+    """
+    for name in list(FTS_TRIGGERS) + list(ARCHIVE_FTS_TRIGGERS):
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+
+def table_exists(connection, name):
+    """判断数据库中是否存在某个表(包括虚拟表)"""
+    return connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": name},
+    ).first() is not None
+
+def create_fts_table(connection, fts_table, content_table):
+    """
+    为一个表创建全文索引
+
+    参数:
+        connection: 数据库连接
+        fts_table: 全文索引表名
+        content_table: 被索引的表名，索引title和description列
+
+    作用:
+        当前SQLite不支持trigram分词器时退回到unicode61分词器
+    """
+    if table_exists(connection, fts_table):
+        return
+
+    for tokenizer in ("trigram", "unicode61"):
+        try:
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE {fts_table} USING fts5("
+                f"title, description, content='{content_table}', content_rowid='id', tokenize='{tokenizer}')"
+            ))
+            break
+        except Exception:
+            if tokenizer == "unicode61":
+                raise
+
+    # 为已有的行建立索引
+    connection.execute(text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+
+def create_bigram_table(connection, bigram_table, content_table):
+    """
+    为一个表创建二元组索引
+
+    参数:
+        connection: 数据库连接
+        bigram_table: 二元组索引表名
+        content_table: 被索引的表名，索引title和description列
+
+    作用:
+        不保存文本的索引不能rebuild，已有的行用与触发器相同的表达式逐行插入
+    """
+    if table_exists(connection, bigram_table):
+        return
+    connection.execute(text(
+        f"CREATE VIRTUAL TABLE {bigram_table} USING fts5("
+        f"grams, content='', detail=none, columnsize=0, prefix='1', tokenize='unicode61')"
+    ))
+    connection.execute(text(
+        f"INSERT INTO {bigram_table}(rowid, grams) "
+        f"SELECT id, {bigram_document_sql(content_table)} FROM {content_table}"
+    ))
+
+def add_bigram_index(connection):
+    """
+    为已有的数据库添加二元组索引
+
+    参数:
+        connection: 数据库连接
+
+    作用:
+        删除旧的同步触发器，创建并填充二元组索引，再按新的定义创建同时维护两个索引的触发器
+    """
+    drop_search_triggers(connection)
+    create_search_index(connection)
+
+def highlight(value, terms):
+    """
+    在文本中高亮显示搜索词
+
+    参数:
+        value: 要处理的文本
+        terms: 搜索词列表
+
+    返回:
+        用高亮标记包围搜索词后的文本
+    """
+    if not value:
+        return value or ""
+    for term in terms:
+        value = value.replace(term, f"{HIGHLIGHT_START}{term}{HIGHLIGHT_END}")
+    return value
+
+def escape_like(term):
+    """
+    转义LIKE模式中的特殊字符
+
+    参数:
+        term: 搜索词
+
+    返回:
+        用反斜杠转义了\\、%和_的文本，与ESCAPE '\\'一起使用，搜索"_"时只匹配下划线本身
+    """
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def search_tasks(db, query, limit=SEARCH_LIMIT, archived=False):
+    """
+    在所有分类中搜索任务标题和描述
+
+    参数:
+        db: 数据库会话
+        query: 用户输入的搜索文本，多个词用空格分隔，所有词都必须出现
+        limit: 最多返回的结果数量
+        archived: 为True时搜索归档的任务
+
+    返回:
+        按相关度排序的列表，每一项是
+        (任务ID, 高亮后的标题, 描述摘要, 优先级, 是否完成, 分类名称)，
+        搜索归档的任务时第一项是归档记录的ID
+
+    注意:
+        trigram分词器只能为至少3个字符的词使用索引，更短的词在索引匹配的结果中再用LIKE过滤；
+        所有词都少于3个字符时从二元组索引中读取候选任务，再用LIKE确认，最近添加的任务在前。
+        只有由字母、数字或汉字组成的短词可以使用二元组索引，都不能使用时才逐行比较
+    """
+    terms = query.split()
+    if not terms:
+        return []
+    if archived:
+        fts_table, bigram_table, table = ARCHIVE_FTS_TABLE, ARCHIVE_BIGRAM_TABLE, "archived_tasks"
+    else:
+        fts_table, bigram_table, table = FTS_TABLE, BIGRAM_TABLE, "tasks"
+
+    # 至少3个字符的词使用全文索引匹配，双引号转义后作为短语，避免被解析为FTS5语法
+    long_terms = [term for term in terms if len(term) >= 3]
+    short_terms = [term for term in terms if len(term) < 3]
+    # 分词器会去掉标点和空白，包含它们的短词在二元组索引中没有对应的词元
+    bigram_terms = [term for term in short_terms if term.isalnum()]
+
+    conditions = []
+    params = {"limit": limit}
+    for index, term in enumerate(short_terms):
+        conditions.append(
+            f"({table}.title LIKE :short{index} ESCAPE '\\' OR {table}.description LIKE :short{index} ESCAPE '\\')"
+        )
+        params[f"short{index}"] = f"%{escape_like(term)}%"
+
+    if long_terms:
+        # 有全文匹配时使用FTS5生成高亮和摘要，并按bm25相关度排序(标题的权重更高)
+        source = f"{fts_table} JOIN {table} ON {table}.id = {fts_table}.rowid"
+        conditions.insert(0, f"{fts_table} MATCH :match")
+        params["match"] = " AND ".join('"' + term.replace('"', '""') + '"' for term in long_terms)
+        columns = (
+            f"highlight({fts_table}, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}'), "
+            f"snippet({fts_table}, 1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 12)"
+        )
+        order = f"bm25({fts_table}, 10.0, 1.0)"
+    elif bigram_terms:
+        # 两个字符的词匹配一个词元，单个字符匹配以它开头的词元。
+        # FTS5按rowid降序返回匹配的任务，读到足够的结果就停止
+        source = f"{bigram_table} JOIN {table} ON {table}.id = {bigram_table}.rowid"
+        conditions.insert(0, f"{bigram_table} MATCH :match")
+        params["match"] = " AND ".join(
+            f'"{term}"' if len(term) == 2 else f'"{term}"*' for term in bigram_terms
+        )
+        columns = f"{table}.title, {table}.description"
+        order = f"{bigram_table}.rowid DESC"
+    else:
+        source = table
+        columns = f"{table}.title, {table}.description"
+        order = f"{table}.id DESC"
+
+    rows = db.execute(text(
+        f"SELECT {table}.id, {columns}, {table}.priority, {table}.completed, categories.name "
+        f"FROM {source} "
+        f"LEFT JOIN categories ON categories.id = {table}.category_id "
+        f"WHERE {' AND '.join(conditions)} "
+        f"ORDER BY {order} LIMIT :limit"
+    ), params).all()
+
+    results = []
+    for task_id, title, description, priority, completed, category_name in rows:
+        # 短词不经过FTS5的高亮处理，在这里补充高亮
+        title = highlight(title, short_terms)
+        description = highlight(description, short_terms)
+        # 描述中没有匹配内容时不显示摘要
+        position = (description or "").find(HIGHLIGHT_START)
+        if position < 0:
+            description = ""
+        elif not long_terms and len(description) > 60:
+            # 没有FTS5生成的摘要时，截取匹配位置附近的文本
+            start = max(0, position - 20)
+            description = ("…" if start else "") + description[start:start + 60] + "…"
+        results.append((task_id, title, description, priority, bool(completed), category_name))
+    return results
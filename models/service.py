@@ -0,0 +1,695 @@
+import datetime  # 导入datetime模块，用于计算截止日期视图的日期范围
+
+from sqlalchemy import func  # 导入func，用于生成COUNT等SQL函数
+
+from models.models import Category, Task, ArchivedTask, PriorityEnum, TaskRow, TASK_ROW_COLUMNS, TASK_SORT_KEYS  # 导入数据模型、任务列表的行类型和排序键
+from models.smart_lists import SMART_LISTS  # 导入智能列表的定义
+from models import bulk  # 导入批量操作函数
+from models.search import search_tasks  # 导入全文搜索函数
+from models.transfer import read_records, import_records, export_records  # 导入导入/导出函数
+from models import archive  # 导入归档函数
+
+class TaskService:
+    """
+    任务和分类的业务操作
+
+    所有创建、编辑、切换和删除任务与分类的逻辑都在这里，
+    不依赖任何界面库，图形界面、命令行和脚本共用同一套操作。
+    事务由调用者控制，一般通过session_scope()或DbWorker提供会话
+    """
+    def __init__(self, db):
+        """
+        初始化服务
+
+        参数:
+            db: 数据库会话
+        """
+        self.db = db
+
+    # ---------- 分类 ----------
+
+    def list_categories(self):
+        """
+        获取所有分类
+
+        返回:
+            (分类ID, 名称)元组的列表，按ID排序
+        """
+        return self.db.query(Category.id, Category.name).order_by(Category.id).all()
+
+    def list_category_rows(self, category_id=None):
+        """
+        获取分类的全部显示属性
+
+        参数:
+            category_id: 只获取该分类，为None时获取所有分类
+
+        返回:
+            (分类ID, 名称, 图标, 颜色)元组的列表，按ID排序，不创建ORM对象
+        """
+        query = self.db.query(Category.id, Category.name, Category.icon, Category.color)
+        if category_id is not None:
+            query = query.filter(Category.id == category_id)
+        return query.order_by(Category.id).all()
+
+    def get_category(self, category_id):
+        """
+        获取分类
+
+        参数:
+            category_id: 分类ID
+
+        返回:
+            Category对象，不存在时返回None。已在标识映射中时不会再次查询数据库
+        """
+        return self.db.get(Category, category_id)
+
+    def find_category(self, name):
+        """
+        按名称查找分类
+
+        参数:
+            name: 分类名称
+
+        返回:
+            Category对象，不存在时返回None
+        """
+        return self.db.query(Category).filter(Category.name == name).first()
+
+    def category_counts(self, category_ids=None):
+        """
+        统计分类的任务数
+
+        参数:
+            category_ids: 要统计的分类ID，为None时统计所有分类
+
+        返回:
+            字典{分类ID: [未完成任务数, 全部任务数]}，只包含有任务的分类
+
+        作用:
+            用一次分组聚合得到所有分类的计数，使用(category_id, completed, priority)覆盖索引
+        """
+        counts = {}
+        query = self.db.query(Task.category_id, Task.completed, func.count(Task.id))
+        if category_ids is not None:
+            query = query.filter(Task.category_id.in_(list(category_ids)))
+        rows = query.group_by(Task.category_id, Task.completed).all()
+        for category_id, completed, count in rows:
+            category_counts = counts.setdefault(category_id, [0, 0])
+            if not completed:
+                category_counts[0] += count
+            category_counts[1] += count
+        return counts
+
+    def create_category(self, name, icon=None, color="#3498db"):
+        """
+        创建分类
+
+        参数:
+            name: 分类名称
+            icon: 图标
+            color: 颜色
+
+        返回:
+            新分类的ID
+        """
+        category = Category(name=name, icon=icon, color=color)
+        self.db.add(category)
+        # 立即写入以获得分类ID
+        self.db.flush()
+        return category.id
+
+    def update_category(self, category_id, name, icon, color):
+        """
+        更新分类
+
+        参数:
+            category_id: 分类ID
+            name: 新的名称
+            icon: 新的图标
+            color: 新的颜色
+
+        注意:
+            分类不存在(例如已在其他窗口中被删除)时抛出ValueError
+        """
+        category = self.db.get(Category, category_id)
+        if category is None:
+            raise ValueError(f"分类 {category_id} 不存在")
+        category.name = name
+        category.icon = icon
+        category.color = color
+
+    def delete_category(self, category_id):
+        """
+        删除分类及其所有任务
+
+        参数:
+            category_id: 分类ID
+
+        作用:
+            只执行一条DELETE语句，任务和归档的任务由外键的ON DELETE CASCADE在数据库中删除，
+            不会把任务加载到内存中
+        """
+        self.db.query(Category).filter(Category.id == category_id).delete()
+        # 数据库级联删除的任务可能还留在会话的标识映射中，把它们移出会话
+        for instance in list(self.db.identity_map.values()):
+            if isinstance(instance, (Task, ArchivedTask)) and instance.category_id == category_id:
+                self.db.expunge(instance)
+
+    # ---------- 任务 ----------
+
+    def get_task_row(self, task_id):
+        """
+        获取任务列表中的一行
+
+        参数:
+            task_id: 任务ID
+
+        返回:
+            TaskRow元组，不存在时返回None
+        """
+        row = self.db.query(*TASK_ROW_COLUMNS).filter(Task.id == task_id).first()
+        return TaskRow._make(row) if row is not None else None
+
+    def load_changes(self, changes):
+        """
+        读取其他连接修改过的任务的最新状态
+
+        参数:
+            changes: models.changes.Change的列表
+
+        返回:
+            (分类是否被修改, {任务ID: TaskRow，已被删除时为None}, {分类ID: [未完成任务数, 全部任务数]})，
+            计数只包含修改前后涉及的分类
+
+        作用:
+            被修改的任务和分类如果在会话的标识映射中，先让它们过期，之后读取时重新查询数据库。
+            修改数不超过models.changes.MAX_CHANGES，任务ID一次IN查询即可
+        """
+        categories_changed = False
+        task_ids = set()
+        category_ids = set()
+        for change in changes:
+            if change.table_name == "categories":
+                categories_changed = True
+                model = Category
+            else:
+                task_ids.add(change.row_id)
+                category_ids.update(
+                    category_id for category_id in (change.category_id, change.previous_category_id)
+                    if category_id is not None
+                )
+                model = Task
+            instance = self.db.identity_map.get(self.db.identity_key(model, change.row_id))
+            if instance is not None:
+                self.db.expire(instance)
+
+        rows = dict.fromkeys(task_ids)
+        if task_ids:
+            for row in self.db.query(*TASK_ROW_COLUMNS).filter(Task.id.in_(list(task_ids))):
+                rows[row.id] = TaskRow._make(row)
+        counts = {category_id: [0, 0] for category_id in category_ids}
+        if category_ids:
+            counts.update(self.category_counts(category_ids))
+        return categories_changed, rows, counts
+
+    def get_task(self, task_id):
+        """
+        获取任务
+
+        参数:
+            task_id: 任务ID
+
+        返回:
+            Task对象，不存在时返回None。已在标识映射中时不会再次查询数据库
+        """
+        return self.db.get(Task, task_id)
+
+    def require_task(self, task_id):
+        """
+        获取必须存在的任务
+
+        参数:
+            task_id: 任务ID
+
+        返回:
+            Task对象
+
+        注意:
+            其他窗口或程序可能已经删除了这个任务，不存在时抛出ValueError
+        """
+        task = self.db.get(Task, task_id)
+        if task is None:
+            raise ValueError(f"任务 {task_id} 不存在")
+        return task
+
+    def require_tasks(self, task_ids):
+        """
+        检查一组任务都存在
+
+        参数:
+            task_ids: 任务ID列表
+
+        注意:
+            有任务不存在时抛出ValueError，消息中列出所有不存在的ID
+        """
+        wanted = set(task_ids)
+        existing = set()
+        for chunk in bulk.chunked(list(wanted)):
+            existing.update(task_id for task_id, in self.db.query(Task.id).filter(Task.id.in_(chunk)))
+        missing = sorted(wanted - existing)
+        if missing:
+            raise ValueError(f"任务 {', '.join(map(str, missing))} 不存在")
+
+    def count_tasks(self, category_id):
+        """
+        统计分类中的任务数
+
+        参数:
+            category_id: 分类ID
+
+        返回:
+            任务数
+        """
+        return self.db.query(func.count(Task.id)).filter(Task.category_id == category_id).scalar()
+
+    def list_tasks(self, category_id=None, offset=0, limit=None, completed=None,
+                   sort="id", descending=False, after=None, before=None):
+        """
+        按排序键列出任务
+
+        参数:
+            category_id: 分类ID，为None时列出所有分类的任务
+            offset: 跳过的任务数，没有锚点时使用
+            limit: 最多返回的任务数，为None时不限制
+            completed: 按完成状态筛选，为None时不筛选
+            sort: 排序键，TASK_SORT_KEYS中的名称("id"、"title"、"priority"、"completed"、"due_date"、"created_at")
+            descending: 是否降序
+            after: 锚点任务ID，返回排序中紧跟在该任务之后的任务
+            before: 锚点任务ID，返回排序中紧挨在该任务之前的任务(仍按显示顺序排列)
+
+        返回:
+            Task对象的列表，按排序键排序，排序键相同时按ID排序。描述延迟加载，不在这次查询中读取
+
+        作用:
+            给出锚点时使用键集分页，从锚点在索引中的位置直接向后或向前读取，
+            耗时与锚点在列表中的位置无关；没有锚点(或锚点已不存在)时使用OFFSET，
+            适合拖动滚动条等远距离跳转
+        """
+        conditions = self._task_conditions(category_id, completed)
+        return self._select_page(
+            self.db.query(Task), conditions, offset, limit, sort, descending, after, before, None
+        )
+
+    def list_task_rows(self, category_id=None, offset=0, limit=None, completed=None,
+                       sort="id", descending=False, after=None, before=None, anchor_key=None):
+        """
+        按排序键列出任务列表的行
+
+        参数:
+            anchor_key: 锚点任务的排序键值(见models.models.sort_key_value)，
+                给出时直接从(anchor_key, 锚点任务ID)开始键集分页，不查询锚点任务，锚点任务可以已被删除
+            其余参数与list_tasks()相同
+
+        返回:
+            TaskRow元组的列表，顺序与list_tasks()相同
+
+        作用:
+            只查询列表显示的列，每行是一个普通元组，不创建ORM对象、不加入标识映射，
+            也不读取描述。任务列表滚动时使用这个方法
+        """
+        conditions = self._task_conditions(category_id, completed)
+        rows = self._select_page(
+            self.db.query(*TASK_ROW_COLUMNS), conditions, offset, limit, sort, descending, after, before, anchor_key
+        )
+        return [TaskRow._make(row) for row in rows]
+
+    def count_smart_list(self, name, today=None):
+        """
+        统计智能列表中的任务数
+
+        参数:
+            name: SMART_LISTS中的名称
+            today: 当天的日期，为None时使用系统日期
+
+        返回:
+            任务数
+        """
+        conditions = SMART_LISTS[name].conditions(today or datetime.date.today())
+        return self.db.query(func.count(Task.id)).filter(*conditions).scalar()
+
+    def list_smart_rows(self, name, offset=0, limit=None, after=None, before=None, today=None, anchor_key=None):
+        """
+        列出智能列表中的任务
+
+        参数:
+            name: SMART_LISTS中的名称
+            offset、limit、after、before: 与list_tasks()相同
+            anchor_key: 与list_task_rows()相同
+            today: 当天的日期，为None时使用系统日期
+
+        返回:
+            TaskRow元组的列表，按列表定义的排序键排序
+
+        作用:
+            智能列表跨越所有分类，筛选和排序都在列表对应的索引上完成，耗时只与返回的行数有关
+        """
+        smart_list = SMART_LISTS[name]
+        conditions = smart_list.conditions(today or datetime.date.today())
+        rows = self._select_page(
+            self.db.query(*TASK_ROW_COLUMNS), conditions, offset, limit,
+            smart_list.sort, smart_list.descending, after, before, anchor_key,
+        )
+        return [TaskRow._make(row) for row in rows]
+
+    def _task_conditions(self, category_id, completed):
+        """
+        生成按分类和完成状态筛选的条件
+
+        返回:
+            SQL条件的列表，参数为None的筛选不生成条件
+        """
+        conditions = []
+        if category_id is not None:
+            conditions.append(Task.category_id == category_id)
+        if completed is not None:
+            conditions.append(Task.completed == completed)
+        return conditions
+
+    def _select_page(self, query, conditions, offset, limit, sort, descending, after, before, anchor_key):
+        """
+        对查询应用筛选条件、排序和分页
+
+        参数:
+            query: 选择Task对象或若干列的查询
+            conditions: SQL条件的列表
+            anchor_key: 锚点任务的排序键值，为None时按ID查询锚点任务
+            其余参数与list_tasks()相同
+
+        返回:
+            查询结果的列表
+        """
+        key = TASK_SORT_KEYS[sort]
+        query = query.filter(*conditions)
+
+        anchor_id = after if after is not None else before
+        if anchor_id is not None and limit is not None:
+            if anchor_key is None:
+                anchor = self.db.query(key).filter(Task.id == anchor_id).first()
+            else:
+                # 排序键值中没有NULL(见TASK_SORT_KEYS)
+                anchor = (anchor_key,)
+            if anchor is not None:
+                # 显示顺序中的"之后"，在升序时是键更大的方向，在降序时是键更小的方向
+                greater = (after is not None) != descending
+                tasks = self._keyset_page(query, key, anchor[0], anchor_id, limit, greater)
+                # 向前读取得到的任务与显示顺序相反
+                return tasks if after is not None else tasks[::-1]
+
+        # 按ID排序时ID本身就是唯一的，不需要再按ID排序
+        order = [key] if key is Task.id else [key, Task.id]
+        if descending:
+            order = [column.desc() for column in order]
+        query = query.order_by(*order).offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    def _keyset_page(self, query, key, key_value, anchor_id, limit, greater):
+        """
+        从锚点开始沿一个方向读取一页任务
+
+        参数:
+            query: 已应用筛选条件的查询
+            key: 排序键表达式
+            key_value: 锚点任务的排序键值
+            anchor_id: 锚点任务ID
+            limit: 最多返回的任务数
+            greater: 为True时读取(排序键, ID)大于锚点的任务，否则读取小于锚点的任务
+
+        返回:
+            从锚点向外依次排列的查询结果列表
+
+        作用:
+            分成两步读取：先读排序键与锚点相同、ID在锚点之后的任务，不足一页时再读排序键更靠后的任务。
+            每一步都是(category_id, 排序键)索引上的一次范围查找，
+            而SQLite不会把(排序键, id) > (?, ?)这样的行值比较用作表达式索引的范围条件
+        """
+        if key is Task.id:
+            # ID唯一，直接从锚点向后或向前读取
+            condition = Task.id > anchor_id if greater else Task.id < anchor_id
+            return query.filter(condition).order_by(Task.id if greater else Task.id.desc()).limit(limit).all()
+        if greater:
+            same = query.filter(key == key_value, Task.id > anchor_id).order_by(Task.id)
+            rest = query.filter(key > key_value).order_by(key, Task.id)
+        else:
+            same = query.filter(key == key_value, Task.id < anchor_id).order_by(Task.id.desc())
+            rest = query.filter(key < key_value).order_by(key.desc(), Task.id.desc())
+        tasks = same.limit(limit).all()
+        if len(tasks) < limit:
+            tasks += rest.limit(limit - len(tasks)).all()
+        return tasks
+
+    def create_task(self, title, description=None, priority=PriorityEnum.MEDIUM.value, category_id=None, due_date=None):
+        """
+        创建任务
+
+        参数:
+            title: 标题
+            description: 描述
+            priority: 优先级("low"、"medium"或"high")
+            category_id: 分类ID
+            due_date: 截止日期
+
+        返回:
+            新创建的Task对象，已写入数据库并获得ID
+        """
+        task = Task(
+            title=title,
+            description=description,
+            priority=priority,
+            completed=False,
+            category_id=category_id,
+            due_date=due_date,
+        )
+        self.db.add(task)
+        # 立即写入以获得任务ID
+        self.db.flush()
+        return task
+
+    def update_task(self, task_id, **fields):
+        """
+        更新任务
+
+        参数:
+            task_id: 任务ID
+            fields: 要更新的字段，例如title、description、priority
+
+        返回:
+            更新后的Task对象
+
+        注意:
+            修改完成状态时同时设置或清除完成时间；任务不存在时抛出ValueError
+        """
+        task = self.require_task(task_id)
+        for name, value in fields.items():
+            if name == "completed":
+                self._set_completed(task, value)
+            else:
+                setattr(task, name, value)
+        return task
+
+    def toggle_task(self, task_id):
+        """
+        切换任务的完成状态
+
+        参数:
+            task_id: 任务ID
+
+        返回:
+            更新后的Task对象
+
+        注意:
+            任务不存在时抛出ValueError
+        """
+        task = self.require_task(task_id)
+        self._set_completed(task, not task.completed)
+        return task
+
+    def _set_completed(self, task, completed):
+        """
+        设置任务的完成状态和完成时间
+
+        参数:
+            task: Task对象
+            completed: 新的完成状态
+
+        作用:
+            标记为已完成时记录完成时间，标记为未完成时清除完成时间，状态不变时不修改完成时间
+        """
+        if bool(task.completed) == bool(completed):
+            return
+        task.completed = completed
+        task.completed_at = datetime.datetime.now() if completed else None
+
+    def delete_task(self, task_id):
+        """
+        删除任务
+
+        参数:
+            task_id: 任务ID
+
+        注意:
+            任务不存在时抛出ValueError
+        """
+        self.db.delete(self.require_task(task_id))
+
+    # ---------- 批量操作 ----------
+    # 以下操作都返回分类计数的变化列表，每一项是(分类ID, 未完成数变化, 全部任务数变化)
+
+    def set_completed(self, task_ids, completed):
+        """批量设置完成状态"""
+        return bulk.set_completed(self.db, task_ids, completed)
+
+    def toggle_tasks(self, task_ids):
+        """
+        批量切换完成状态
+
+        作用:
+            如果所有任务都已完成，则全部标记为未完成，否则全部标记为已完成
+        """
+        all_completed = all(completed for _, completed, _ in bulk.count_by_category(self.db, task_ids))
+        return bulk.set_completed(self.db, task_ids, not all_completed)
+
+    def set_priority(self, task_ids, priority):
+        """批量设置优先级"""
+        return bulk.set_priority(self.db, task_ids, priority)
+
+    def move_tasks(self, task_ids, category_id):
+        """批量移动到另一个分类"""
+        return bulk.move_to_category(self.db, task_ids, category_id)
+
+    def delete_tasks(self, task_ids):
+        """批量删除"""
+        return bulk.delete_tasks(self.db, task_ids)
+
+    # ---------- 归档 ----------
+
+    def archive_completed(self, days, progress=None):
+        """
+        归档很久以前完成的任务
+
+        参数:
+            days: 完成超过这么多天的任务会被归档
+            progress: 每提交一个批次后调用的函数progress(已归档的任务数)
+
+        返回:
+            归档的任务数
+
+        注意:
+            每个批次单独提交，不能与其他修改放在同一个事务中
+        """
+        return archive.archive_completed(self.db, archive.archive_cutoff(days), progress=progress)
+
+    def count_archived(self):
+        """
+        统计归档的任务数
+
+        返回:
+            任务数
+        """
+        return self.db.query(func.count(ArchivedTask.id)).scalar()
+
+    def list_archived_rows(self, offset=0, limit=None, after=None, before=None):
+        """
+        列出归档的任务，最近归档的在前
+
+        参数:
+            offset、limit、after、before: 与list_tasks()相同，after和before是归档记录的ID
+
+        返回:
+            TaskRow元组的列表，id字段是归档记录的ID
+        """
+        # 归档表的列名与TaskRow的字段相同
+        query = self.db.query(*[getattr(ArchivedTask, name) for name in TaskRow._fields])
+        if after is not None and limit is not None:
+            rows = query.filter(ArchivedTask.id < after).order_by(ArchivedTask.id.desc()).limit(limit).all()
+        elif before is not None and limit is not None:
+            rows = query.filter(ArchivedTask.id > before).order_by(ArchivedTask.id).limit(limit).all()[::-1]
+        else:
+            query = query.order_by(ArchivedTask.id.desc()).offset(offset)
+            rows = (query.limit(limit) if limit is not None else query).all()
+        return [TaskRow._make(row) for row in rows]
+
+    def search_archive(self, query, limit=None):
+        """
+        全文搜索归档的任务
+
+        返回:
+            search_tasks()的结果列表，第一项是归档记录的ID
+        """
+        if limit is None:
+            return search_tasks(self.db, query, archived=True)
+        return search_tasks(self.db, query, limit, archived=True)
+
+    def restore_archived(self, archive_ids):
+        """
+        把归档的任务恢复到任务表
+
+        参数:
+            archive_ids: 归档记录的ID列表
+
+        返回:
+            恢复的任务数
+        """
+        return archive.restore_archived(self.db, archive_ids)
+
+    # ---------- 同步 ----------
+
+    def sync(self, url):
+        """
+        与同步服务器进行一次增量同步
+
+        参数:
+            url: 服务器地址，例如http://127.0.0.1:8765
+
+        返回:
+            统计字典：pushed、pulled(上传和下载的修改数)、sent、received(压缩后的字节数)
+
+        注意:
+            与归档一样会多次提交，不能与其他修改放在同一个事务中。
+            同步模块(以及urllib、gzip)只在第一次同步时导入，不同步的界面、命令行和API不加载它们
+        """
+        from models import sync
+        return sync.sync(self.db, url)
+
+    # ---------- 搜索和导入/导出 ----------
+
+    def search(self, query, limit=None):
+        """
+        在所有分类中全文搜索任务
+
+        返回:
+            search_tasks()的结果列表
+        """
+        if limit is None:
+            return search_tasks(self.db, query)
+        return search_tasks(self.db, query, limit)
+
+    def import_file(self, path, progress=None):
+        """
+        从CSV或JSON Lines文件导入
+
+        返回:
+            导入的任务数
+        """
+        return import_records(self.db, read_records(path), progress=progress)
+
+    def export_file(self, path, progress=None):
+        """
+        导出到CSV或JSON Lines文件
+
+        返回:
+            导出的记录数
+        """
+        return export_records(self.db, path, progress=progress)
@@ -0,0 +1,267 @@
+import datetime  # 导入datetime模块，用于计算与日期有关的列表的范围
+from abc import ABC, abstractmethod  # 导入抽象基类，子类必须实现conditions()和matches()
+
+from models.models import Task, PriorityEnum, TASK_SORT_KEYS  # 导入任务模型和排序键
+
+# 智能列表
+# 智能列表跨越所有分类，固定在分类列表顶部。每个列表由一组SQL条件和一个排序键定义，
+# 条件和排序都直接对应models.models中的一个索引，查询耗时只与返回的行数有关。
+# matches()用Python实现与SQL条件相同的判断，修改任务后据此判断哪些列表的缓存需要失效
+
+# "最近完成"包含的天数
+RECENT_DAYS = 7
+
+# 没有截止日期的任务在截止日期排序键中的值，与TASK_SORT_KEYS["due_date"]一致
+NO_DUE_DATE = datetime.date(9999, 12, 31)
+
+class SmartList(ABC):
+    """
+    一个智能列表的定义
+
+    子类实现conditions()和matches()，两者必须表示同一个集合。
+    两个方法都是抽象方法，缺少其中之一的子类在创建时就会失败，而不是在第一次查询时
+    """
+    def __init__(self, name, label, sort="id", descending=False, fields=()):
+        """
+        初始化智能列表
+
+        参数:
+            name: 列表名称，用于命令行和配置
+            label: 分类列表中显示的文本
+            sort: 排序键，TASK_SORT_KEYS中的名称
+            descending: 是否降序
+            fields: 影响列表成员或顺序的TaskRow字段，这些字段变化时列表需要重新查询
+        """
+        self.name = name
+        self.label = label
+        self.sort = sort
+        self.descending = descending
+        self.fields = frozenset(fields)
+
+    @abstractmethod
+    def conditions(self, today):
+        """
+        生成列表的SQL条件
+
+        参数:
+            today: 当天的日期
+
+        返回:
+            SQL条件的列表
+        """
+
+    @abstractmethod
+    def matches(self, row, today):
+        """
+        判断任务是否属于列表
+
+        参数:
+            row: TaskRow元组
+            today: 当天的日期
+
+        返回:
+            任务属于列表时返回True
+        """
+
+class OpenTasks(SmartList):
+    """未完成的任务，可以再按优先级和截止日期范围筛选，按截止日期排序"""
+    def __init__(self, name, label, priority=None, start=None, end=None):
+        """
+        参数:
+            priority: 只包含该优先级的任务，为None时不筛选
+            start, end: 截止日期在[今天+start, 今天+end)天之内，None表示不限
+        """
+        fields = {"completed", "due_date"} | ({"priority"} if priority else set())
+        super().__init__(name, label, sort="due_date", fields=fields)
+        self.priority = priority
+        self.start = start
+        self.end = end
+
+    def due_range(self, today):
+        """
+        计算截止日期的范围
+
+        返回:
+            (开始日期, 结束日期)，不限时为None
+        """
+        start = today + datetime.timedelta(days=self.start) if self.start is not None else None
+        end = today + datetime.timedelta(days=self.end) if self.end is not None else None
+        return start, end
+
+    def conditions(self, today):
+        """未完成、优先级和截止日期范围的条件"""
+        # 条件使用与排序键相同的截止日期表达式，与索引中的表达式一致
+        key = TASK_SORT_KEYS["due_date"]
+        conditions = [Task.completed == False]
+        if self.priority:
+            conditions.append(Task.priority == self.priority)
+        start, end = self.due_range(today)
+        if start is not None:
+            conditions.append(key >= start)
+        if end is not None:
+            conditions.append(key < end)
+        return conditions
+
+    def matches(self, row, today):
+        """与conditions()相同的判断，完成状态为NULL的任务与SQL中一样不属于列表"""
+        if row.completed is None or row.completed or (self.priority and row.priority != self.priority):
+            return False
+        start, end = self.due_range(today)
+        due = row.due_date or NO_DUE_DATE
+        return (start is None or due >= start) and (end is None or due < end)
+
+class RecentlyCompleted(SmartList):
+    """最近RECENT_DAYS天内完成的任务，最近完成的在前"""
+    def __init__(self, name, label):
+        """按完成时间降序排列"""
+        super().__init__(name, label, sort="completed_at", descending=True, fields={"completed", "completed_at"})
+
+    def since(self, today):
+        """返回列表包含的最早完成时间"""
+        return datetime.datetime.combine(today - datetime.timedelta(days=RECENT_DAYS), datetime.time.min)
+
+    def conditions(self, today):
+        """已完成且完成时间不早于since()的条件"""
+        return [Task.completed == True, TASK_SORT_KEYS["completed_at"] >= self.since(today)]
+
+    def matches(self, row, today):
+        """与conditions()相同的判断"""
+        return bool(row.completed) and row.completed_at is not None and row.completed_at >= self.since(today)
+
+class Uncategorized(SmartList):
+    """不属于任何分类的任务，按ID排序"""
+    def __init__(self, name, label):
+        """按ID排序，只有分类ID影响成员"""
+        super().__init__(name, label, fields={"category_id"})
+
+    def conditions(self, today):
+        """分类ID为空的条件"""
+        return [Task.category_id.is_(None)]
+
+    def matches(self, row, today):
+        """与conditions()相同的判断"""
+        return row.category_id is None
+
+# 所有智能列表，按在分类列表中显示的顺序排列
+SMART_LISTS = {
+    smart_list.name: smart_list
+    for smart_list in [
+        OpenTasks("open", "全部未完成"),
+        OpenTasks("high", "高优先级", priority=PriorityEnum.HIGH.value),
+        RecentlyCompleted("recent", "最近完成"),
+        Uncategorized("uncategorized", "无分类"),
+        OpenTasks("overdue", "逾期", end=0),
+        OpenTasks("today", "今天", start=0, end=1),
+        OpenTasks("week", "未来7天", start=0, end=7),
+    ]
+}
+
+# 按截止日期筛选的列表
+DUE_VIEWS = ("overdue", "today", "week")
+
+class SmartListCache:
+    """
+    智能列表查询结果的缓存
+
+    按列表缓存任务总数和已读取的页。修改任务后只让可能受影响的列表失效：
+    修改前后都不属于某个列表的任务不会影响该列表；只修改了显示内容的任务只丢弃包含它的页。
+    反复在智能列表之间切换时，没有修改就不会重新查询数据库。
+    缓存属于界面线程，不需要加锁。数据库操作按提交顺序执行、按顺序回调，
+    修改之前提交的查询总是先返回，因此不会把修改之前的结果保存到失效之后的缓存中
+    """
+    def __init__(self):
+        """初始化空缓存"""
+        # 列表名称 -> _Entry
+        self._entries = {}
+
+    def entry(self, name, today):
+        """
+        获取列表的缓存项
+
+        参数:
+            name: 列表名称
+            today: 当天的日期，与缓存项的日期不同时(跨过了午夜)缓存项作废
+
+        返回:
+            缓存项，包含count和pages。查询完成时把结果保存到查询开始时获取的缓存项中，
+            缓存项在此期间失效时结果保存在已被丢弃的对象中，不会进入缓存
+        """
+        entry = self._entries.get(name)
+        if entry is None or entry.day != today:
+            entry = self._entries[name] = _Entry(today)
+        return entry
+
+    def invalidate(self, name=None):
+        """
+        让列表的缓存失效
+
+        参数:
+            name: 列表名称，为None时让所有列表失效
+        """
+        names = [name] if name is not None else list(self._entries)
+        for key in names:
+            self._entries.pop(key, None)
+
+    def rows_changed(self, changes):
+        """
+        处理一组任务的修改
+
+        参数:
+            changes: (修改前的TaskRow, 修改后的TaskRow)的列表，新增的任务修改前为None，删除的任务修改后为None
+
+        作用:
+            修改前后都属于列表且没有修改影响成员和顺序的字段时，只丢弃包含该任务的页；
+            任务加入或离开列表时让整个列表失效
+        """
+        for name, entry in list(self._entries.items()):
+            smart_list = SMART_LISTS[name]
+            for before, after in changes:
+                was_member = before is not None and smart_list.matches(before, entry.day)
+                is_member = after is not None and smart_list.matches(after, entry.day)
+                if not was_member and not is_member:
+                    continue
+                if was_member and is_member and all(
+                    getattr(before, field) == getattr(after, field) for field in smart_list.fields
+                ):
+                    entry.drop_pages([after.id])
+                    continue
+                self.invalidate(name)
+                break
+
+    def fields_changed(self, task_ids, fields):
+        """
+        处理批量修改
+
+        参数:
+            task_ids: 被修改的任务ID列表
+            fields: 被修改的TaskRow字段的集合
+
+        作用:
+            批量操作不返回每个任务修改前后的值。修改了影响成员或顺序的字段时让列表失效，
+            否则只丢弃包含这些任务的页
+        """
+        for name, entry in list(self._entries.items()):
+            if SMART_LISTS[name].fields & set(fields):
+                self.invalidate(name)
+            else:
+                entry.drop_pages(task_ids)
+
+class _Entry:
+    """一个智能列表的缓存项"""
+    def __init__(self, day):
+        """
+        参数:
+            day: 查询时使用的日期
+        """
+        self.day = day
+        # 任务总数，尚未查询时为None
+        self.count = None
+        # (offset, limit) -> 行列表
+        self.pages = {}
+
+    def drop_pages(self, task_ids):
+        """丢弃包含任意一个任务的页"""
+        task_ids = set(task_ids)
+        for key, rows in list(self.pages.items()):
+            if any(row[0] in task_ids for row in rows):
+                del self.pages[key]
@@ -0,0 +1,497 @@
+import gzip  # 导入gzip模块，用于压缩上传和下载的数据
+import json  # 导入json模块，用于编码同步数据
+import datetime  # 导入datetime模块，用于解析同步数据中的日期
+import urllib.request  # 导入urllib.request，用于向同步服务器发送HTTP请求
+from urllib.parse import urlencode  # 导入urlencode，用于生成下载请求的查询参数
+
+from sqlalchemy import select, update, insert, delete, text, bindparam  # 导入Core语句的构造函数
+
+from models.models import Category, Task, ArchivedTask, ChangeLog, SyncState, new_uid  # 导入数据模型和ID生成函数
+from models.changes import latest_change  # 导入读取最新修改序号的函数
+
+# 增量同步
+# 每个任务和分类有一个全局唯一ID(uid)。本地的修改由触发器记录在change_log中，
+# 同步时只上传上次上传之后的修改日志涉及的行(已删除的行上传删除标记)，
+# 再从服务器下载上次下载之后其他客户端上传的修改，传输的数据量只与修改的行数有关，与数据库的大小无关。
+# 冲突按"后写入者胜出"处理：比较(修改时间, 客户端ID)，较新的版本胜出。
+# 协议和参考服务器见sync_server.py，请求和响应都是gzip压缩的JSON
+
+# 每个请求上传或下载的最多修改数
+# 一批修改涉及的ID放在一个IN列表中查询，与models.bulk一样不超过SQLite默认的参数个数上限
+SYNC_BATCH = 900
+
+# 同步的任务字段，也是tasks表中的列名
+TASK_FIELDS = ["title", "description", "completed", "priority", "due_date", "created_at", "completed_at", "category_id"]
+
+# 第一次同步时上传已有的行使用的修改时间，服务器上已有的任何版本都比它新
+EPOCH = "1970-01-01T00:00:00.000Z"
+
+# 网络请求的超时时间(秒)
+TIMEOUT = 30
+
+# 同步状态的键
+CLIENT_KEY = "client_id"  # 本数据库的客户端ID
+PUSH_KEY = "push_seq"  # 已上传的最大修改日志序号
+PULL_KEY = "pull_seq"  # 已下载的最大服务器序号
+APPLIED_KEY = "applied_at"  # 上一次应用服务器的修改的时间
+
+# 同步的两种数据
+KINDS = {"category": Category, "task": Task}
+# 修改日志中的表名对应的数据种类
+TABLE_KINDS = {"categories": "category", "tasks": "task"}
+
+def get_state(db, key, default=None):
+    """
+    读取同步状态
+
+    参数:
+        db: 数据库会话
+        key: 键
+        default: 不存在时返回的值
+
+    返回:
+        保存的文本值
+    """
+    value = db.execute(select(SyncState.value).where(SyncState.key == key)).scalar()
+    return default if value is None else value
+
+def set_state(db, key, value):
+    """
+    保存同步状态
+
+    参数:
+        db: 数据库会话
+        key: 键
+        value: 值，保存为文本
+    """
+    db.execute(
+        text("INSERT OR REPLACE INTO sync_state(key, value) VALUES (:key, :value)"),
+        {"key": key, "value": str(value)},
+    )
+
+def client_id(db):
+    """
+    获取本数据库的客户端ID，第一次同步时生成
+
+    参数:
+        db: 数据库会话
+
+    返回:
+        客户端ID，冲突的两个版本修改时间相同时用它决定胜出者
+    """
+    value = get_state(db, CLIENT_KEY)
+    if value is None:
+        value = new_uid()
+        set_state(db, CLIENT_KEY, value)
+    return value
+
+def request(url, payload=None):
+    """
+    向同步服务器发送请求
+
+    参数:
+        url: 请求地址
+        payload: 上传的数据，为None时发送GET请求
+
+    返回:
+        (响应数据, 上传的字节数, 下载的字节数)，字节数是压缩后的大小
+
+    注意:
+        网络错误抛出urllib.error.URLError(OSError的子类)
+    """
+    body = None
+    headers = {"Accept-Encoding": "gzip"}
+    if payload is not None:
+        body = gzip.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        headers["Content-Type"] = "application/json"
+        headers["Content-Encoding"] = "gzip"
+    with urllib.request.urlopen(urllib.request.Request(url, data=body, headers=headers), timeout=TIMEOUT) as response:
+        data = response.read()
+        received = len(data)
+        if response.headers.get("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+    return json.loads(data), len(body or b""), received
+
+def category_entries(db, uids):
+    """
+    读取分类的当前内容
+
+    参数:
+        db: 数据库会话
+        uids: 分类的全局唯一ID
+
+    返回:
+        字典{uid: 分类数据}，已被删除的分类不在其中
+    """
+    rows = db.execute(
+        select(Category.uid, Category.name, Category.icon, Category.color).where(Category.uid.in_(list(uids)))
+    )
+    return {row.uid: {"name": row.name, "icon": row.icon, "color": row.color} for row in rows}
+
+def task_entries(db, uids):
+    """
+    读取任务的当前内容
+
+    参数:
+        db: 数据库会话
+        uids: 任务的全局唯一ID
+
+    返回:
+        字典{uid: 任务数据}，已被删除的任务不在其中。
+        分类同时给出全局唯一ID和名称，接收方找不到该ID时按名称查找
+    """
+    rows = db.execute(
+        select(
+            Task.uid, Task.title, Task.description, Task.completed, Task.priority,
+            Task.due_date, Task.created_at, Task.completed_at, Category.uid.label("category_uid"), Category.name,
+        )
+        .outerjoin(Category, Task.category_id == Category.id)
+        .where(Task.uid.in_(list(uids)))
+    )
+    return {
+        row.uid: {
+            "title": row.title,
+            "description": row.description,
+            "completed": bool(row.completed),
+            "priority": row.priority,
+            "due_date": row.due_date.isoformat() if row.due_date else None,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "completed_at": row.completed_at.isoformat() if row.completed_at else None,
+            "category": row.category_uid,
+            "category_name": row.name,
+        }
+        for row in rows
+    }
+
+def build_entries(db, versions, client):
+    """
+    为一组修改过的行创建上传的数据
+
+    参数:
+        db: 数据库会话
+        versions: 字典{(种类, uid): 修改时间}，分类在任务之前
+        client: 本数据库的客户端ID
+
+    返回:
+        上传的修改列表。行已不存在时上传删除标记
+    """
+    current = {}
+    for kind, read in (("category", category_entries), ("task", task_entries)):
+        uids = [uid for entry_kind, uid in versions if entry_kind == kind]
+        if uids:
+            current[kind] = read(db, uids)
+    entries = []
+    for (kind, uid), modified_at in versions.items():
+        data = current[kind].get(uid)
+        entries.append({
+            "kind": kind,
+            "uid": uid,
+            "deleted": data is None,
+            "modified_at": modified_at,
+            "client": client,
+            "data": data,
+        })
+    return entries
+
+def assign_missing_uids(db):
+    """
+    为其他程序直接插入、没有全局唯一ID的任务和分类补全ID
+
+    作用:
+        补全ID的UPDATE会写入修改日志，这些行随之被上传
+    """
+    for model in (Category, Task):
+        db.execute(
+            update(model.__table__).where(model.uid.is_(None)).values(uid=text("lower(hex(randomblob(16)))"))
+        )
+
+def push(db, url, client, stats, batch_size=SYNC_BATCH):
+    """
+    上传本地的修改
+
+    参数:
+        db: 数据库会话
+        url: 服务器地址
+        client: 本数据库的客户端ID
+        stats: 统计字典，累加pushed、sent、received
+        batch_size: 每个请求上传的最多修改数
+
+    作用:
+        第一次同步时先上传所有已有的行(修改时间为EPOCH)，之后按修改日志的序号逐批上传，
+        每批中同一行只上传最后的状态。应用下载的修改写入的日志标记为"sync"，不会再被上传；
+        归档和恢复写入的日志标记为"archive"，也不上传(见models.archive)。
+        服务器拒绝的修改(服务器上有更新的版本)连同服务器上的版本一起返回，直接应用到本地
+    """
+    assign_missing_uids(db)
+    db.commit()
+    pushed = get_state(db, PUSH_KEY)
+    if pushed is None:
+        # 之后只需要上传现在之后的修改日志，之前的修改已经包含在已有的行中
+        start = latest_change(db.connection())
+        for kind, model in KINDS.items():
+            last_id = 0
+            while True:
+                rows = db.execute(
+                    select(model.id, model.uid).where(model.id > last_id).order_by(model.id).limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+                versions = {(kind, row.uid): EPOCH for row in rows}
+                send_entries(db, url, build_entries(db, versions, client), stats)
+        set_state(db, PUSH_KEY, start)
+        db.commit()
+        pushed = start
+
+    pushed = int(pushed)
+    while True:
+        rows = db.execute(
+            select(ChangeLog.seq, ChangeLog.table_name, ChangeLog.row_uid, ChangeLog.changed_at)
+            .where(ChangeLog.seq > pushed, ChangeLog.origin.is_(None))
+            .order_by(ChangeLog.seq)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        # 同一行在这一批中修改了多次时只上传最后的状态；分类排在任务之前，任务引用的新分类先到达服务器
+        versions = {}
+        for row in sorted(rows, key=lambda row: row.table_name != "categories"):
+            if row.row_uid is not None:
+                versions[(TABLE_KINDS[row.table_name], row.row_uid)] = row.changed_at
+        if versions:
+            send_entries(db, url, build_entries(db, versions, client), stats)
+        pushed = rows[-1].seq
+        set_state(db, PUSH_KEY, pushed)
+        db.commit()
+
+def send_entries(db, url, entries, stats):
+    """
+    上传一批修改，并应用服务器拒绝时返回的版本
+
+    参数:
+        db: 数据库会话
+        url: 服务器地址
+        entries: 修改列表
+        stats: 统计字典
+    """
+    response, sent, received = request(f"{url}/push", {"changes": entries})
+    stats["pushed"] += len(entries)
+    stats["sent"] += sent
+    stats["received"] += received
+    if response["rejected"]:
+        apply_entries(db, response["rejected"], check_local=False)
+
+def pull(db, url, client, stats, batch_size=SYNC_BATCH):
+    """
+    下载并应用其他客户端的修改
+
+    参数:
+        db: 数据库会话
+        url: 服务器地址
+        client: 本数据库的客户端ID，服务器不返回本客户端上传的修改
+        stats: 统计字典，累加pulled、sent、received
+        batch_size: 每个请求下载的最多修改数
+
+    作用:
+        每下载一批就在一个事务中应用并保存新的下载位置，中断后从上次的位置继续
+    """
+    since = int(get_state(db, PULL_KEY, 0))
+    while True:
+        query = urlencode({"since": since, "limit": batch_size, "client": client})
+        response, sent, received = request(f"{url}/pull?{query}")
+        stats["sent"] += sent
+        stats["received"] += received
+        entries = response["changes"]
+        stats["pulled"] += len(entries)
+        since = response["cursor"]
+        set_state(db, PULL_KEY, since)
+        apply_entries(db, entries)
+        db.commit()
+        if not response["more"]:
+            break
+
+def apply_entries(db, entries, check_local=True):
+    """
+    应用从服务器得到的修改
+
+    参数:
+        db: 数据库会话
+        entries: 修改列表
+        check_local: 是否与本地尚未上传的修改比较，本地的修改较新时保留本地的修改
+
+    作用:
+        分类先于任务应用。应用过程中写入的修改日志标记为"sync"，不会被再次上传；
+        用Core语句修改数据库，最后让会话中的所有对象过期
+    """
+    if not entries:
+        return
+    # 先写入同步状态开始写事务，之后其他连接不能写入，大于这个序号的修改日志都是本次应用写入的
+    set_state(db, APPLIED_KEY, datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"))
+    before = latest_change(db.connection())
+
+    client = client_id(db)
+    local_versions = {}
+    if check_local:
+        # 本地尚未上传的修改的最新时间
+        pushed = int(get_state(db, PUSH_KEY, 0))
+        uids = [entry["uid"] for entry in entries]
+        rows = db.execute(
+            select(ChangeLog.row_uid, ChangeLog.changed_at)
+            .where(ChangeLog.row_uid.in_(uids), ChangeLog.seq > pushed, ChangeLog.origin.is_(None))
+        )
+        for uid, changed_at in rows:
+            local_versions[uid] = max(local_versions.get(uid, ""), changed_at)
+
+    categories = {}  # 分类的全局唯一ID和名称 -> 本地ID
+    for category_id, uid, name in db.execute(select(Category.id, Category.uid, Category.name)):
+        categories[("uid", uid)] = category_id
+        categories[("name", name)] = category_id
+
+    tasks = []
+    for entry in entries:
+        local = local_versions.get(entry["uid"])
+        if local is not None and (local, client) > (entry["modified_at"], entry["client"]):
+            continue
+        if entry["kind"] == "category":
+            apply_category(db, entry, categories)
+        else:
+            tasks.append(entry)
+    apply_tasks(db, tasks, categories)
+
+    db.execute(update(ChangeLog.__table__).where(ChangeLog.seq > before).values(origin="sync"))
+    db.expire_all()
+
+def apply_category(db, entry, categories):
+    """
+    应用一个分类的修改
+
+    参数:
+        db: 数据库会话
+        entry: 修改
+        categories: 全局唯一ID和名称到本地分类ID的映射，随之更新
+
+    注意:
+        分类名称必须唯一：下载的分类与本地另一个分类同名时视为同一个分类，任务按名称关联到本地的分类
+    """
+    uid = entry["uid"]
+    table = Category.__table__
+    if entry["deleted"]:
+        # 分类的任务由外键级联删除
+        db.execute(delete(table).where(Category.uid == uid))
+        categories.pop(("uid", uid), None)
+        return
+    data = entry["data"]
+    values = {"name": data["name"], "icon": data["icon"], "color": data["color"]}
+    same_name = categories.get(("name", data["name"]))
+    category_id = categories.get(("uid", uid))
+    if category_id is not None:
+        if same_name is not None and same_name != category_id:
+            # 改名后与本地另一个分类重名，保留原来的名称
+            del values["name"]
+        db.execute(update(table).where(table.c.id == category_id).values(**values))
+    elif same_name is not None:
+        category_id = same_name
+    else:
+        category_id = db.execute(insert(table).values(uid=uid, **values)).inserted_primary_key[0]
+    categories[("uid", uid)] = category_id
+    categories[("name", data["name"])] = category_id
+
+def apply_tasks(db, entries, categories):
+    """
+    应用一批任务的修改
+
+    参数:
+        db: 数据库会话
+        entries: 任务的修改列表，不超过SYNC_BATCH个
+        categories: 全局唯一ID和名称到本地分类ID的映射
+
+    作用:
+        先用一次查询找出本地已有的任务，再分别用一条DELETE、一次executemany的UPDATE和INSERT应用，
+        不为每个任务单独执行语句。
+        本地已归档的任务不在任务表中：其他客户端删除它时同时删除归档的记录；
+        修改它时作为新任务插入并删除归档的记录，任务回到任务列表，本地不会同时存在两份
+    """
+    table = Task.__table__
+    # 同一个任务只应用最后一个修改
+    latest = {entry["uid"]: entry for entry in entries}
+    deleted = [uid for uid, entry in latest.items() if entry["deleted"]]
+    changed = [entry for entry in latest.values() if not entry["deleted"]]
+    if deleted:
+        db.execute(delete(table).where(table.c.uid.in_(deleted)))
+        db.execute(delete(ArchivedTask.__table__).where(ArchivedTask.uid.in_(deleted)))
+    if not changed:
+        return
+
+    uids = [entry["uid"] for entry in changed]
+    existing = set(db.execute(select(table.c.uid).where(table.c.uid.in_(uids))).scalars())
+    updates = []
+    inserts = []
+    for entry in changed:
+        values = task_values(entry["data"], categories)
+        if entry["uid"] in existing:
+            updates.append({"target_uid": entry["uid"], **values})
+        else:
+            inserts.append({"uid": entry["uid"], **values})
+    if updates:
+        db.execute(
+            update(table).where(table.c.uid == bindparam("target_uid")).values(
+                {name: bindparam(name) for name in TASK_FIELDS}
+            ),
+            updates,
+        )
+    if inserts:
+        db.execute(insert(table), inserts)
+        db.execute(delete(ArchivedTask.__table__).where(ArchivedTask.uid.in_([row["uid"] for row in inserts])))
+
+def task_values(data, categories):
+    """
+    把同步数据中的任务转换为tasks表的列值
+
+    参数:
+        data: 任务数据
+        categories: 全局唯一ID和名称到本地分类ID的映射，先按ID查找分类，再按名称查找
+
+    返回:
+        字典{列名: 值}，分类不存在时任务没有分类
+    """
+    category_id = categories.get(("uid", data["category"]))
+    if category_id is None:
+        category_id = categories.get(("name", data["category_name"]))
+    return {
+        "title": data["title"],
+        "description": data["description"],
+        "completed": data["completed"],
+        "priority": data["priority"],
+        "due_date": parse_date(data["due_date"]),
+        "created_at": parse_date(data["created_at"]),
+        "completed_at": datetime.datetime.fromisoformat(data["completed_at"]) if data["completed_at"] else None,
+        "category_id": category_id,
+    }
+
+def parse_date(value):
+    """把ISO格式的日期文本转换为date，值为空时返回None"""
+    return datetime.date.fromisoformat(value) if value else None
+
+def sync(db, url):
+    """
+    与同步服务器进行一次增量同步
+
+    参数:
+        db: 数据库会话，同步过程中会多次提交
+        url: 服务器地址，例如http://127.0.0.1:8765
+
+    返回:
+        统计字典：pushed(上传的修改数)、pulled(下载的修改数)、sent(上传的字节数)、received(下载的字节数)，
+        字节数是压缩后的大小
+
+    作用:
+        先上传本地的修改，再下载其他客户端的修改。下载的修改与本地尚未上传的修改冲突时，
+        修改时间较新的一方胜出
+    """
+    url = url.rstrip("/")
+    stats = {"pushed": 0, "pulled": 0, "sent": 0, "received": 0}
+    client = client_id(db)
+    db.commit()
+    push(db, url, client, stats)
+    pull(db, url, client, stats)
+    return stats
@@ -0,0 +1,243 @@
+import csv  # 导入csv模块，用于读写CSV文件
+import json  # 导入json模块，用于读写JSON Lines文件
+import datetime  # 导入datetime模块，用于解析日期
+
+from sqlalchemy import insert, select  # 导入insert和select，用于生成Core语句
+
+from models.models import Category, Task, ArchivedTask, PriorityEnum  # 导入数据模型
+
+# 导入/导出文件中的字段
+# type为"category"的记录描述一个分类(使用category、icon、color字段)，
+# type为"task"的记录描述一个任务，通过category字段中的分类名称关联分类
+FIELDS = ["type", "category", "title", "description", "completed", "priority", "due_date", "created_at", "icon", "color"]
+
+# 每个批次插入的记录数，每个批次是一个独立的事务
+BATCH_SIZE = 5000
+
+# 插入任务的语句
+# 导入时直接把参数元组交给驱动的executemany，跳过SQLAlchemy对每个参数的类型处理，
+# 日期以ISO格式的文本保存，与SQLAlchemy的SQLite Date类型的存储格式一致。
+# 全局唯一ID不经过SQLAlchemy的默认值，在SQL中逐行生成
+TASK_COLUMNS = ["title", "description", "completed", "priority", "due_date", "created_at", "category_id"]
+INSERT_TASK_SQL = (
+    f"INSERT INTO tasks ({', '.join(TASK_COLUMNS)}, uid) "
+    f"VALUES ({', '.join('?' for _ in TASK_COLUMNS)}, lower(hex(randomblob(16))))"
+)
+
+# 导出时每次从数据库读取的行数
+EXPORT_FETCH_SIZE = 2000
+
+# 视为"已完成"的文本
+TRUE_VALUES = {"1", "true", "yes", "y", "是", "已完成"}
+
+def detect_format(path):
+    """
+    根据文件扩展名判断文件格式
+
+    参数:
+        path: 文件路径
+
+    返回:
+        "csv"或"jsonl"
+    """
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+def read_records(path):
+    """
+    逐条读取导入文件中的记录
+
+    参数:
+        path: CSV或JSON Lines文件路径
+
+    返回:
+        生成器，每次产生一条记录的字典，整个文件不会一次性读入内存
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if detect_format(path) == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+def parse_date(value):
+    """
+    解析ISO格式(YYYY-MM-DD)的日期
+
+    返回:
+        ISO格式的日期文本，值为空时返回None
+    """
+    if not value:
+        return None
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    # 通过解析校验格式，再转换回标准格式
+    return datetime.date.fromisoformat(str(value)[:10]).isoformat()
+
+def parse_bool(value):
+    """
+    解析布尔值
+
+    返回:
+        True或False，支持布尔值、数字以及"true"、"是"等文本
+    """
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+def import_records(db, records, batch_size=BATCH_SIZE, progress=None):
+    """
+    批量导入记录
+
+    参数:
+        db: 数据库会话
+        records: 记录的可迭代对象，一般是read_records()返回的生成器
+        batch_size: 每个批次的记录数
+        progress: 每提交一个批次后调用的函数progress(已导入的任务数)
+
+    返回:
+        导入的任务总数
+
+    作用:
+        按名称解析分类，不存在的分类会自动创建；任务按批次用executemany插入，
+        每个批次单独提交，内存占用只与批次大小有关，与文件大小无关
+    """
+    # 分类名称到ID的映射，分类数量很少，可以全部保存在内存中
+    categories = {name: category_id for category_id, name in db.execute(select(Category.id, Category.name))}
+    today = datetime.date.today().isoformat()
+    valid_priorities = {priority.value for priority in PriorityEnum}
+
+    def resolve_category(name, icon=None, color=None):
+        """按名称查找分类ID，不存在时创建"""
+        if not name:
+            return None
+        if name not in categories:
+            values = {"name": name, "icon": icon or None, "color": color or "#3498db"}
+            result = db.execute(insert(Category.__table__).values(**values))
+            categories[name] = result.inserted_primary_key[0]
+        return categories[name]
+
+    batch = []
+    imported = 0
+    for record in records:
+        if record.get("type") == "category":
+            resolve_category(record.get("category"), record.get("icon"), record.get("color"))
+            continue
+
+        priority = record.get("priority") or PriorityEnum.MEDIUM.value
+        # 参数顺序与TASK_COLUMNS一致
+        batch.append((
+            record.get("title") or "",
+            record.get("description") or None,
+            parse_bool(record.get("completed", False)),
+            priority if priority in valid_priorities else PriorityEnum.MEDIUM.value,
+            parse_date(record.get("due_date")),
+            parse_date(record.get("created_at")) or today,
+            resolve_category(record.get("category")),
+        ))
+
+        # 批次已满，一次executemany插入并提交
+        if len(batch) >= batch_size:
+            db.connection().exec_driver_sql(INSERT_TASK_SQL, batch)
+            db.commit()
+            imported += len(batch)
+            batch = []
+            if progress:
+                progress(imported)
+
+    # 插入最后一个不满的批次
+    if batch:
+        db.connection().exec_driver_sql(INSERT_TASK_SQL, batch)
+        db.commit()
+        imported += len(batch)
+    if progress:
+        progress(imported)
+    return imported
+
+def iter_records(db, fetch_size=EXPORT_FETCH_SIZE):
+    """
+    逐条产生要导出的记录
+
+    参数:
+        db: 数据库会话
+        fetch_size: 每次从数据库读取的行数
+
+    返回:
+        生成器，先产生所有分类记录，再按ID顺序产生所有任务记录，最后产生归档的任务。
+        归档的任务与普通任务的记录格式相同，再次导入时成为普通任务
+    """
+    for name, icon, color in db.execute(select(Category.name, Category.icon, Category.color).order_by(Category.id)):
+        yield {"type": "category", "category": name, "icon": icon, "color": color}
+
+    for model in (Task, ArchivedTask):
+        yield from iter_task_records(db, model, fetch_size)
+
+def iter_task_records(db, model, fetch_size):
+    """
+    逐条产生一个任务表中的任务记录
+
+    参数:
+        db: 数据库会话
+        model: Task或ArchivedTask
+        fetch_size: 每次从数据库读取的行数
+
+    返回:
+        生成器，按ID顺序产生任务记录
+    """
+    # 只查询需要的列，并使用yield_per分批读取，不会一次性加载所有任务
+    statement = (
+        select(
+            Category.name, model.title, model.description, model.completed,
+            model.priority, model.due_date, model.created_at,
+        )
+        .select_from(model)
+        .outerjoin(Category, Category.id == model.category_id)
+        .order_by(model.id)
+        .execution_options(yield_per=fetch_size)
+    )
+    for category, title, description, completed, priority, due_date, created_at in db.execute(statement):
+        yield {
+            "type": "task",
+            "category": category,
+            "title": title,
+            "description": description,
+            "completed": bool(completed),
+            "priority": priority,
+            "due_date": due_date.isoformat() if due_date else None,
+            "created_at": created_at.isoformat() if created_at else None,
+        }
+
+def export_records(db, path, progress=None, progress_every=BATCH_SIZE):
+    """
+    导出所有分类和任务
+
+    参数:
+        db: 数据库会话
+        path: 目标文件路径，扩展名为.csv时导出CSV，否则导出JSON Lines
+        progress: 每导出progress_every条记录后调用的函数progress(已导出的记录数)
+        progress_every: 调用progress的间隔
+
+    返回:
+        导出的记录总数
+
+    作用:
+        记录逐条写入文件，不会在内存中构建完整的结果
+    """
+    exported = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if detect_format(path) == "csv":
+            writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            write = writer.writerow
+        else:
+            write = lambda record: f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        for record in iter_records(db):
+            write(record)
+            exported += 1
+            if progress and exported % progress_every == 0:
+                progress(exported)
+    if progress:
+        progress(exported)
+    return exported
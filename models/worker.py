@@ -0,0 +1,500 @@
+import time  # 导入time模块，用于计算延迟提交的截止时间
+import datetime  # 导入datetime模块，用于记录合并后的修改中的完成时间
+import queue  # 导入queue模块，用于线程间传递请求和结果
+import threading  # 导入threading模块，用于创建后台线程
+from types import SimpleNamespace  # 导入SimpleNamespace，用于创建与会话无关的对象快照
+
+from models.perf import perf  # 导入性能计时记录器，记录每次提交的耗时，该模块不依赖SQLAlchemy
+
+# 数据库模块(以及SQLAlchemy)在工作线程启动后才导入，
+# 创建DbWorker不会让界面线程等待这些模块加载
+
+class DbWorker:
+    """
+    数据库后台工作线程
+
+    所有数据库操作都在一个专用线程中按提交顺序执行，界面线程只负责提交请求和处理结果，
+    因此无论磁盘多慢，界面的事件循环都不会被数据库I/O阻塞。
+    工作线程启动时先加载数据库模块并调用init_db()，之后才开始执行请求。
+
+    延迟写入模式(write_delay不为None)下，标记为deferred的请求执行后不立即提交，
+    修改保留在长期会话中，第一个未提交的修改之后write_delay秒、执行普通请求之前
+    或停止工作线程时，所有未提交的修改在一个事务中提交。
+    每个延迟请求在自己的保存点中执行，请求结束时刷新，失败时只回滚这个请求的修改。
+    单个任务的切换、编辑和删除通过submit_write提交，不执行SQL，按任务ID合并到PendingWrites中：
+    切换两次互相抵消，之后的修改合并到之前的修改中，删除代替之前的所有修改。
+    合并后的修改在执行其他请求或提交之前才写入，每个任务一条UPDATE或DELETE。
+    提交失败时回滚所有未提交的修改，并通过on_discard通知界面
+    """
+    def __init__(self, write_delay=None, on_discard=None):
+        """
+        初始化并启动工作线程
+
+        参数:
+            write_delay: 延迟提交的时间(秒)，为None时每个请求都立即提交
+            on_discard: 未提交的修改被回滚时在界面线程中调用的函数on_discard(count, exc)，
+                count是被撤销的请求数
+        """
+        self._requests = queue.Queue()  # 待执行的请求
+        self._results = queue.Queue()  # 已完成的请求，等待界面线程处理回调
+        self._notifications = queue.Queue()  # 操作执行过程中发给界面线程的通知，例如进度
+        self.pending = 0  # 已提交但回调尚未处理的请求数，只在界面线程中修改
+        self.session = None  # 工作线程独占的长期会话，在工作线程中创建
+        # 延迟提交的时间，界面线程可以随时修改，工作线程在下一次等待请求时使用新值
+        self.write_delay = write_delay
+        self.on_discard = on_discard
+        self.unsaved = 0  # 已执行但尚未提交的延迟请求数，只在工作线程中修改
+        self.commits = 0  # 工作线程提交的写事务数，只读的工作单元不计入
+        self.connection = None  # 长期会话绑定的数据库连接，在工作线程中建立
+        self._deadline = None  # 未提交的修改必须提交的时间(time.monotonic())
+        self._writes = PendingWrites()  # 已合并但尚未写入数据库的任务修改，只在工作线程中使用
+
+        # 创建守护线程，主程序退出时不会被它阻塞
+        self._thread = threading.Thread(target=self._run, name="db-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, callback=None, errback=None, deferred=False):
+        """
+        提交一个数据库操作
+
+        参数:
+            fn: 在工作线程中执行的函数fn(db)，db是当前工作单元的会话，
+                返回值会传给callback，不应返回绑定到会话的对象
+            callback: 操作成功后在界面线程中调用的函数callback(result)
+            errback: 操作失败后在界面线程中调用的函数errback(exc)
+            deferred: 操作是否可以延迟提交，只在延迟写入模式下有效。
+                只读的查询也应标记为deferred，否则会提前提交之前未提交的修改
+
+        注意:
+            只能在界面线程中调用
+        """
+        self.pending += 1
+        self._requests.put((fn, callback, errback, deferred))
+
+    def submit_write(self, task_id, op, fields=None, callback=None, errback=None):
+        """
+        提交对单个任务的修改
+
+        参数:
+            task_id: 任务ID
+            op: "toggle"(切换完成状态)、"update"(修改字段)或"delete"(删除)
+            fields: op为"update"时要修改的字段，例如title、priority
+            callback: 操作成功后在界面线程中调用的函数callback((修改前的TaskRow, 修改后的TaskRow))，
+                删除时修改后的TaskRow为None
+            errback: 操作失败后在界面线程中调用的函数errback(exc)
+
+        作用:
+            延迟写入模式下修改只与同一任务之前未写入的修改合并，回调立即返回给界面；
+            否则作为普通请求立即写入并提交
+
+        注意:
+            只能在界面线程中调用
+        """
+        self.pending += 1
+        self._requests.put(((task_id, op, fields), callback, errback, "write"))
+
+    def notify(self, callback, *args):
+        """
+        从工作线程向界面线程发送通知
+
+        参数:
+            callback: 在界面线程中调用的函数
+            args: 传给callback的参数
+
+        作用:
+            长时间运行的操作可以用它报告进度，通知会在下一次process_results时处理
+        """
+        self._notifications.put((callback, args))
+
+    def process_results(self):
+        """
+        处理已完成请求的回调
+
+        返回:
+            本次处理的请求数
+
+        注意:
+            只能在界面线程中调用，一般通过root.after定时调用
+        """
+        # 先处理进度等通知
+        while True:
+            try:
+                callback, args = self._notifications.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+
+        processed = 0
+        while True:
+            try:
+                callback, errback, result, error = self._results.get_nowait()
+            except queue.Empty:
+                return processed
+            self.pending -= 1
+            processed += 1
+            if error is not None:
+                if errback:
+                    errback(error)
+                else:
+                    raise error
+            elif callback:
+                callback(result)
+
+    def stop(self, timeout=5):
+        """
+        停止工作线程
+
+        参数:
+            timeout: 等待已提交的请求执行完毕的最长时间(秒)
+
+        作用:
+            已提交的请求会先执行完，提交延迟写入的修改，然后关闭工作线程的会话
+        """
+        self._requests.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        """
+        工作线程的主循环
+
+        作用:
+            先初始化数据库，然后按顺序取出请求，在工作单元中执行，并把结果放入结果队列。
+            初始化失败时，之后的每个请求都以初始化时的异常结束
+        """
+        from models.database import engine, SessionLocal, session_scope, init_db
+        
+        startup_error = None
+        try:
+            init_db()
+            # 会话始终使用同一个连接，PRAGMA data_version在这个连接上只反映其他连接的提交，
+            # 界面据此检测其他窗口或程序的修改(见models.changes)
+            self.connection = engine.connect()
+        except Exception as exc:
+            startup_error = exc
+        
+        # 会话及其中的标识映射在整个生命周期内保留，每个请求是一个独立的工作单元
+        # 延迟写入模式下查询需要看到尚未提交的修改，因此查询前自动刷新
+        self.session = SessionLocal(bind=self.connection or engine, expire_on_commit=False, autoflush=True)
+        
+        while True:
+            try:
+                request = self._requests.get(timeout=self._wait_time())
+            except queue.Empty:
+                # 到达截止时间，提交延迟的修改
+                self._commit_deferred()
+                continue
+            # None表示停止
+            if request is None:
+                break
+            fn, callback, errback, deferred = request
+            if startup_error is not None:
+                self._results.put((callback, errback, None, startup_error))
+                continue
+            if deferred == "write":
+                if self.write_delay is not None:
+                    self._run_write(fn, callback, errback)
+                    continue
+                # 延迟写入已关闭，修改作为普通请求立即写入
+                fn = self._writes.write_now(*fn)
+            elif deferred and self.write_delay is not None:
+                self._flush_writes()
+                self._run_deferred(fn, callback, errback)
+                continue
+            # 普通请求执行前先提交之前未提交的修改，普通请求失败回滚时不会撤销它们
+            self._commit_deferred()
+            try:
+                with session_scope(self.session) as db:
+                    result = fn(db)
+                    wrote = self._has_changes()
+                    # 工作单元结束时提交，单独记录提交的耗时
+                    commit_start = time.perf_counter()
+                # 只读的工作单元提交时没有写入任何数据，不计入提交的耗时
+                if wrote:
+                    perf.record("commit", (time.perf_counter() - commit_start) * 1000)
+            except Exception as exc:
+                self._results.put((callback, errback, None, exc))
+            else:
+                self._committed(wrote)
+                self._results.put((callback, errback, result, None))
+        self._commit_deferred()
+        self.session.close()
+        if self.connection is not None:
+            self.connection.close()
+
+    def _wait_time(self):
+        """
+        计算等待下一个请求的最长时间
+
+        返回:
+            距离延迟提交截止时间的秒数，没有未提交的修改时返回None(一直等待)
+        """
+        if self._deadline is None:
+            return None
+        if self.write_delay is None:
+            # 延迟写入已关闭，立即提交剩余的修改
+            return 0
+        return max(0, self._deadline - time.monotonic())
+
+    def _run_deferred(self, fn, callback, errback):
+        """
+        执行一个延迟提交的请求
+
+        作用:
+            请求在保存点中执行，结束时刷新并释放保存点。请求写入了数据时只计数并设置截止时间，
+            回调立即返回给界面；没有写入(只读查询)且没有之前未提交的修改时提交，结束读事务。
+            执行失败时只回滚到保存点，之前未提交的修改保留，只有这个请求以异常结束
+        """
+        dbapi_connection = self._begin()
+        # total_changes包含触发器的修改，回滚的修改也会计入，只用来判断请求是否执行过写语句
+        changes = dbapi_connection.total_changes
+        try:
+            with self.session.begin_nested():
+                result = fn(self.session)
+        except Exception as exc:
+            self._results.put((callback, errback, None, exc))
+            wrote = False
+        else:
+            self._results.put((callback, errback, result, None))
+            wrote = dbapi_connection.total_changes != changes
+        if wrote:
+            self.unsaved += 1
+            if self._deadline is None:
+                self._deadline = time.monotonic() + self.write_delay
+        elif not self.unsaved:
+            self.session.commit()
+
+    def _run_write(self, write, callback, errback):
+        """
+        执行一个延迟写入的任务修改
+
+        参数:
+            write: (任务ID, op, fields)
+
+        作用:
+            只把修改合并到PendingWrites中，不执行写语句。任务不存在时只有这个请求以异常结束
+        """
+        try:
+            result = self._writes.add(self.session, *write)
+        except Exception as exc:
+            self._results.put((callback, errback, None, exc))
+            return
+        self._results.put((callback, errback, result, None))
+        self.unsaved += 1
+        if self._deadline is None:
+            self._deadline = time.monotonic() + self.write_delay
+
+    def _begin(self):
+        """
+        确保长期会话的连接在事务中
+
+        返回:
+            sqlite3连接
+
+        注意:
+            sqlite3只在写语句之前开始事务，在事务之外执行的SAVEPOINT会被SQLite当作事务的开始，
+            释放保存点就会提交。因此没有进行中的事务时先显式执行BEGIN
+        """
+        dbapi_connection = self.session.connection().connection.dbapi_connection
+        if not dbapi_connection.in_transaction:
+            self.session.connection().exec_driver_sql("BEGIN")
+        return dbapi_connection
+
+    def _flush_writes(self):
+        """
+        把合并后的任务修改写入数据库，但不提交
+
+        作用:
+            每个任务的修改在自己的保存点中写入，失败时只回滚这个任务的修改，并通过on_discard通知界面
+        """
+        if not self._writes:
+            return
+        self._begin()
+        self._writes.flush(self.session, lambda exc: self._discarded(1, exc, reset=False))
+
+    def _has_changes(self):
+        """
+        判断会话中是否有尚未提交的修改
+
+        返回:
+            有尚未刷新的对象修改，或者已经执行过尚未提交的写语句时返回True
+        """
+        session = self.session
+        if session.new or session.dirty or session.deleted:
+            return True
+        # sqlite3只在写语句之前开始事务，只执行过查询的连接不在事务中
+        return session.connection().connection.dbapi_connection.in_transaction
+
+    def _commit_deferred(self):
+        """提交所有延迟的修改，失败时回滚并通知界面"""
+        if self._deadline is None:
+            return
+        self._flush_writes()
+        try:
+            with perf.timed("commit"):
+                self.session.commit()
+        except Exception as exc:
+            self.session.rollback()
+            self._discarded(self.unsaved, exc)
+        else:
+            self._committed()
+
+    def _committed(self, wrote=True):
+        """
+        记录一次成功的提交
+
+        参数:
+            wrote: 提交的事务中是否有修改
+        """
+        if wrote:
+            self.commits += 1
+        self.unsaved = 0
+        self._deadline = None
+
+    def _discarded(self, count, exc, reset=True):
+        """
+        记录一次回滚
+
+        参数:
+            count: 被撤销的延迟请求数，为0时不通知界面
+            exc: 导致回滚的异常
+            reset: 是否清除未提交的计数，只回滚了一个任务的修改时为False
+        """
+        if reset:
+            self.unsaved = 0
+            self._deadline = None
+        if count and self.on_discard:
+            self.notify(self.on_discard, count, exc)
+
+class PendingWrites:
+    """
+    按任务ID合并尚未写入数据库的修改
+
+    每个任务最多保留一项：要修改的字段及其最终的值，或者DELETE。
+    会话中的Task对象保持数据库中的状态，界面看到的状态是Task对象加上未写入的字段。
+    与数据库中相同的字段被丢弃，没有字段时这个任务不需要写入，因此切换两次完成状态不产生任何语句
+    """
+    DELETE = "delete"  # 表示任务将被删除
+
+    def __init__(self):
+        """初始化空的修改表"""
+        self._pending = {}  # 任务ID -> 字段字典或DELETE，按第一次修改的顺序写入
+
+    def __bool__(self):
+        """是否有尚未写入的修改"""
+        return bool(self._pending)
+
+    def add(self, db, task_id, op, fields=None):
+        """
+        合并一个任务修改
+
+        参数:
+            db: 工作线程的会话，只用来读取任务
+            task_id: 任务ID
+            op: "toggle"、"update"或"delete"
+            fields: op为"update"时要修改的字段
+
+        返回:
+            (修改前的TaskRow, 修改后的TaskRow)，删除时修改后的TaskRow为None
+
+        注意:
+            任务不存在或已有未写入的删除时抛出ValueError，之前合并的修改不受影响
+        """
+        from models.models import Task, TaskRow
+
+        pending = self._pending.get(task_id, {})
+        task = db.get(Task, task_id)
+        if task is None or pending == self.DELETE:
+            raise ValueError(f"任务 {task_id} 不存在")
+        before = TaskRow._make(pending.get(name, getattr(task, name)) for name in TaskRow._fields)
+        if op == self.DELETE:
+            # 删除代替这个任务之前的所有修改
+            self._pending[task_id] = self.DELETE
+            return before, None
+
+        changes = {"completed": not before.completed} if op == "toggle" else dict(fields or {})
+        if "completed" in changes:
+            if bool(changes["completed"]) == bool(before.completed):
+                del changes["completed"]
+            elif bool(changes["completed"]) == bool(task.completed):
+                # 回到数据库中的完成状态时也恢复原来的完成时间，两次切换互相抵消
+                changes["completed_at"] = task.completed_at
+            else:
+                changes["completed_at"] = datetime.datetime.now() if changes["completed"] else None
+        merged = dict(pending, **changes)
+        after = TaskRow._make(merged.get(name, getattr(task, name)) for name in TaskRow._fields)
+        # 与数据库中相同的字段不需要写入
+        merged = {name: value for name, value in merged.items() if getattr(task, name) != value}
+        if merged:
+            self._pending[task_id] = merged
+        else:
+            self._pending.pop(task_id, None)
+        return before, after
+
+    def flush(self, db, on_error=None):
+        """
+        把合并后的修改写入数据库，每个任务一条UPDATE或DELETE
+
+        参数:
+            db: 工作线程的会话，调用前必须已在事务中
+            on_error: 写入一个任务失败时调用的函数on_error(exc)，为None时异常直接抛出
+
+        作用:
+            on_error不为None时每个任务在自己的保存点中写入，失败只回滚这个任务的修改。
+            无论成功与否，修改表都会被清空
+        """
+        from models.models import Task
+
+        pending, self._pending = self._pending, {}
+        for task_id, fields in pending.items():
+            try:
+                if on_error is None:
+                    self._apply(db, Task, task_id, fields)
+                    continue
+                with db.begin_nested():
+                    self._apply(db, Task, task_id, fields)
+            except Exception as exc:
+                if on_error is None:
+                    raise
+                on_error(exc)
+
+    def _apply(self, db, Task, task_id, fields):
+        """在会话中修改或删除一个任务并刷新"""
+        task = db.get(Task, task_id)
+        if task is None:
+            raise ValueError(f"任务 {task_id} 不存在")
+        if fields == self.DELETE:
+            db.delete(task)
+        else:
+            for name, value in fields.items():
+                setattr(task, name, value)
+        db.flush()
+
+    def write_now(self, task_id, op, fields=None):
+        """
+        创建立即写入一个任务修改的请求
+
+        返回:
+            在普通工作单元中执行的函数fn(db)，返回值与add()相同
+        """
+        def write(db):
+            result = self.add(db, task_id, op, fields)
+            self.flush(db)
+            return result
+        return write
+
+def snapshot(instance):
+    """
+    创建ORM对象的快照
+
+    参数:
+        instance: ORM对象
+
+    返回:
+        包含所有列属性的SimpleNamespace对象
+
+    作用:
+        快照不属于任何会话，可以安全地传给界面线程读取，而不会触发延迟加载。
+        创建快照时会读取所有列，包括延迟加载的任务描述
+    """
+    columns = instance.__table__.columns
+    return SimpleNamespace(**{column.key: getattr(instance, column.key) for column in columns})
@@ -0,0 +1,262 @@
+import sys  # 导入系统模块，用于设置退出码
+import gzip  # 导入gzip模块，用于压缩响应和解压请求
+import json  # 导入json模块，用于编码同步数据
+import sqlite3  # 导入sqlite3模块，服务器直接使用标准库访问数据库
+import argparse  # 导入argparse模块，用于解析命令行参数
+import threading  # 导入threading模块，用于保护共享的数据库连接
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler  # 导入标准库的HTTP服务器
+from urllib.parse import urlparse, parse_qs  # 导入URL解析函数
+
+# 增量同步的参考服务器
+# 只依赖标准库，可以在本地运行用于测试：
+#   python -m sync_server --db data/sync.db --port 8765
+#
+# 服务器为每个任务和分类只保存最新的版本(包括删除标记)，每次接受一个修改就为它分配新的序号，
+# 客户端从上次下载的序号之后继续下载，下载的数据量只与这段时间内修改的行数有关。
+#
+# 协议(请求和响应都是JSON，可以用gzip压缩)：
+#   POST /push  {"changes": [修改, ...]}
+#       -> {"accepted": 接受数, "rejected": [服务器上更新的版本, ...], "cursor": 最新序号}
+#   GET  /pull?since=序号&limit=数量&client=客户端ID
+#       -> {"changes": [修改, ...], "cursor": 本次读到的最大序号, "more": 是否还有}
+# 修改的格式：{"kind": "task"或"category", "uid": 全局唯一ID, "deleted": 是否删除,
+#             "modified_at": 修改时间(UTC), "client": 客户端ID, "data": 内容}
+# 冲突按(modified_at, client)比较，较新的版本胜出
+
+# 默认监听的地址和端口
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# 一次下载最多返回的修改数
+MAX_PULL = 5000
+
+# 响应体超过这个字节数时才压缩
+COMPRESS_MIN_SIZE = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    uid TEXT NOT NULL,
+    deleted INTEGER NOT NULL,
+    modified_at TEXT NOT NULL,
+    client TEXT NOT NULL,
+    data TEXT,
+    UNIQUE (kind, uid)
+)
+"""
+
+class SyncStore:
+    """
+    同步服务器的存储
+
+    一个SQLite连接由所有请求线程共享，用锁串行化访问。
+    每个(kind, uid)只有一行，接受新的版本时用INSERT OR REPLACE替换旧行并分配新的序号
+    """
+    def __init__(self, path):
+        """
+        打开或创建数据库
+
+        参数:
+            path: 数据库文件路径
+        """
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(SCHEMA)
+        self.connection.commit()
+        self.lock = threading.Lock()
+
+    def push(self, changes):
+        """
+        接受客户端上传的修改
+
+        参数:
+            changes: 修改列表
+
+        返回:
+            (接受的修改数, 服务器上版本更新而被拒绝的修改对应的服务器版本列表, 最新序号)
+        """
+        accepted = 0
+        rejected = []
+        with self.lock, self.connection:
+            for change in changes:
+                row = self.connection.execute(
+                    "SELECT kind, uid, deleted, modified_at, client, data FROM entries WHERE kind = ? AND uid = ?",
+                    (change["kind"], change["uid"]),
+                ).fetchone()
+                if row is not None and (row[3], row[4]) >= (change["modified_at"], change["client"]):
+                    rejected.append(entry_from_row(row))
+                    continue
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO entries (kind, uid, deleted, modified_at, client, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        change["kind"], change["uid"], int(bool(change["deleted"])), change["modified_at"],
+                        change["client"], json.dumps(change["data"], ensure_ascii=False),
+                    ),
+                )
+                accepted += 1
+            cursor = self.connection.execute("SELECT COALESCE(MAX(seq), 0) FROM entries").fetchone()[0]
+        return accepted, rejected, cursor
+
+    def pull(self, since, limit, client=None):
+        """
+        读取某个序号之后的修改
+
+        参数:
+            since: 客户端上次读到的序号
+            limit: 最多读取的修改数
+            client: 客户端ID，不返回该客户端自己上传的修改
+
+        返回:
+            (修改列表, 本次读到的最大序号, 是否还有更多修改)
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT seq, kind, uid, deleted, modified_at, client, data FROM entries "
+                "WHERE seq > ? ORDER BY seq LIMIT ?",
+                (since, limit),
+            ).fetchall()
+        changes = [entry_from_row(row[1:]) for row in rows if row[5] != client]
+        cursor = rows[-1][0] if rows else since
+        return changes, cursor, len(rows) == limit
+
+    def close(self):
+        """关闭数据库连接"""
+        self.connection.close()
+
+def entry_from_row(row):
+    """
+    把entries表中的一行转换为修改
+
+    参数:
+        row: (kind, uid, deleted, modified_at, client, data)
+
+    返回:
+        修改字典
+    """
+    kind, uid, deleted, modified_at, client, data = row
+    return {
+        "kind": kind,
+        "uid": uid,
+        "deleted": bool(deleted),
+        "modified_at": modified_at,
+        "client": client,
+        "data": json.loads(data) if data else None,
+    }
+
+class SyncHandler(BaseHTTPRequestHandler):
+    """
+    同步协议的HTTP请求处理器
+
+    存储对象保存在服务器的store属性中
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        """处理下载请求"""
+        url = urlparse(self.path)
+        if url.path != "/pull":
+            self.send_json(404, {"error": "not found"})
+            return
+        query = parse_qs(url.query)
+        try:
+            since = int(query.get("since", ["0"])[0])
+            limit = min(int(query.get("limit", [str(MAX_PULL)])[0]), MAX_PULL)
+        except ValueError:
+            self.send_json(400, {"error": "invalid since or limit"})
+            return
+        client = query.get("client", [None])[0]
+        changes, cursor, more = self.server.store.pull(since, limit, client)
+        self.send_json(200, {"changes": changes, "cursor": cursor, "more": more})
+
+    def do_POST(self):
+        """处理上传请求"""
+        if urlparse(self.path).path != "/push":
+            self.send_json(404, {"error": "not found"})
+            return
+        try:
+            payload = self.read_json()
+            changes = payload["changes"]
+        except (ValueError, KeyError, OSError) as error:
+            self.send_json(400, {"error": str(error)})
+            return
+        accepted, rejected, cursor = self.server.store.push(changes)
+        self.send_json(200, {"accepted": accepted, "rejected": rejected, "cursor": cursor})
+
+    def read_json(self):
+        """读取请求体，按Content-Encoding解压"""
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return json.loads(body)
+
+    def send_json(self, status, payload):
+        """
+        发送JSON响应
+
+        参数:
+            status: HTTP状态码
+            payload: 响应数据
+
+        作用:
+            客户端接受gzip且响应体较大时压缩
+        """
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        if len(body) >= COMPRESS_MIN_SIZE and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """不输出每个请求的日志"""
+
+def make_server(path, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    创建同步服务器
+
+    参数:
+        path: 数据库文件路径
+        host: 监听的地址
+        port: 监听的端口，为0时由系统分配
+
+    返回:
+        ThreadingHTTPServer对象，调用serve_forever()开始处理请求，server_address中是实际的地址和端口
+    """
+    server = ThreadingHTTPServer((host, port), SyncHandler)
+    server.store = SyncStore(path)
+    return server
+
+def main(argv=None):
+    """
+    同步服务器的入口点
+
+    参数:
+        argv: 命令行参数列表，为None时使用sys.argv
+
+    返回:
+        退出码
+    """
+    parser = argparse.ArgumentParser(prog="sync_server", description="待办事项增量同步的参考服务器")
+    parser.add_argument("--db", default="data/sync.db", help="服务器数据库文件，默认为data/sync.db")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"监听的地址，默认为{DEFAULT_HOST}")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"监听的端口，默认为{DEFAULT_PORT}")
+    args = parser.parse_args(argv)
+    server = make_server(args.db, args.host, args.port)
+    print(f"同步服务器运行在 http://{server.server_address[0]}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
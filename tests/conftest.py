@@ -0,0 +1,7 @@
+import os  # 导入os模块，用于设置环境变量
+import tempfile  # 导入tempfile模块，用于创建测试用的临时目录
+
+# 测试使用临时目录中的数据库文件
+# models.database在导入时根据TODO_DATABASE_URL创建引擎，因此必须在任何测试模块导入models之前设置
+TEST_DIR = tempfile.mkdtemp(prefix="todo-tests-")
+os.environ["TODO_DATABASE_URL"] = "sqlite:///" + os.path.join(TEST_DIR, "test.db")
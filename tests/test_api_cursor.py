@@ -0,0 +1,92 @@
+import asyncio  # 导入asyncio模块，用于调用API的协程
+import datetime  # 导入datetime模块，用于设置截止日期和完成时间
+
+import pytest  # 导入pytest，用于创建测试夹具和参数化测试
+
+from models.database import init_db, session_scope  # 导入初始化函数和工作单元
+from models.models import Category, Task  # 导入数据模型
+from api_server import ApiServer, DbPool  # 导入API和数据库线程池
+
+# API分页游标的测试
+# 游标包含上一页最后一个任务的排序键值和ID，该任务在翻页之前被删除时下一页照常继续
+
+@pytest.fixture(scope="module")
+def api():
+    """
+    创建不使用响应缓存的API和一个有8个任务的分类
+
+    返回:
+        (调用API的函数get(target)，分类ID)
+    """
+    init_db()
+    with session_scope() as db:
+        category = Category(name="分页游标")
+        db.add(category)
+        db.flush()
+        now = datetime.datetime.now()
+        db.add_all(
+            Task(title=f"游标{i}", category_id=category.id, priority=["low", "medium", "high"][i % 3],
+                 due_date=datetime.date(2030, 1, 1 + i // 2) if i % 4 else None,
+                 completed=True, completed_at=now - datetime.timedelta(hours=i // 2))
+            for i in range(8)
+        )
+        db.flush()
+        category_id = category.id
+    pool = DbPool(workers=1)
+    server = ApiServer(pool)
+
+    def get(target):
+        return asyncio.run(server.dispatch("GET", target, None))
+
+    yield get, category_id
+    pool.close()
+
+def read_pages(get, target, delete_last=False):
+    """
+    逐页读取所有任务
+
+    参数:
+        get: 调用API的函数
+        target: 不含cursor参数的请求地址
+        delete_last: 读取下一页之前是否删除每一页的最后一个任务
+
+    返回:
+        按顺序读到的任务ID列表
+    """
+    ids = []
+    cursor = None
+    while True:
+        status, body = get(target + (f"&cursor={cursor}" if cursor else ""))
+        assert status == 200, body
+        ids.extend(task["id"] for task in body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids
+        if delete_last:
+            with session_scope() as db:
+                db.query(Task).filter(Task.id == ids[-1]).delete()
+
+@pytest.mark.parametrize("sort", ["id", "title", "priority", "due_date", "created_at"])
+@pytest.mark.parametrize("desc", ["false", "true"])
+def test_cursor_pages(api, sort, desc):
+    """逐页读取的结果与一次读取相同"""
+    get, category_id = api
+    target = f"/tasks?category_id={category_id}&sort={sort}&desc={desc}"
+    status, body = get(target + "&limit=100")
+    assert read_pages(get, target + "&limit=3") == [task["id"] for task in body["items"]]
+
+def test_cursor_after_deleted_task(api):
+    """上一页的最后一个任务被删除后，下一页从它的位置继续，不会重复或跳过任务"""
+    get, category_id = api
+    status, body = get("/tasks?view=recent&limit=100")
+    expected = [task["id"] for task in body["items"] if task["category_id"] == category_id]
+    ids = [task_id for task_id in read_pages(get, "/tasks?view=recent&limit=2", delete_last=True)
+           if task_id in expected]
+    assert ids == expected
+
+def test_invalid_cursor(api):
+    """无效的游标返回400"""
+    get, category_id = api
+    for cursor in ("abc", "WzEsMl0", "WyJ4IiwxXQ"):
+        status, body = get(f"/tasks?sort=due_date&cursor={cursor}")
+        assert status == 400, (cursor, body)
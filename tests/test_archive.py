@@ -0,0 +1,42 @@
+import datetime  # 导入datetime模块，用于设置完成时间
+
+from models.database import init_db, session_scope  # 导入初始化函数和工作单元
+from models.models import Task, ArchivedTask  # 导入数据模型
+from models.archive import archive_completed, restore_archived  # 导入归档和恢复
+
+# 归档和恢复的测试
+
+def archive_new_task(title):
+    """
+    添加一个很久以前完成的任务并归档
+
+    返回:
+        任务ID
+    """
+    long_ago = datetime.datetime(2000, 1, 1)
+    with session_scope() as db:
+        task = Task(title=title, completed=True, completed_at=long_ago)
+        db.add(task)
+        db.flush()
+        task_id = task.id
+    with session_scope() as db:
+        archive_completed(db, long_ago + datetime.timedelta(days=1))
+    return task_id
+
+def test_restore_reused_task_id():
+    """两条归档记录的task_id相同时都能恢复，只有一个任务保留原来的ID"""
+    init_db()
+    # 归档删除了最大ID的任务，下一个任务得到相同的ID
+    first = archive_new_task("第一次")
+    assert archive_new_task("第二次") == first
+
+    with session_scope() as db:
+        archive_ids = db.query(ArchivedTask.id).filter(ArchivedTask.task_id == first).order_by(ArchivedTask.id)
+        archive_ids = [archive_id for archive_id, in archive_ids]
+        assert len(archive_ids) == 2
+        assert restore_archived(db, archive_ids) == 2
+
+    with session_scope() as db:
+        titles = {task.title: task.id for task in db.query(Task).filter(Task.title.in_(["第一次", "第二次"]))}
+    assert titles["第一次"] == first
+    assert titles["第二次"] != first
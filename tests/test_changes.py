@@ -0,0 +1,89 @@
+import pytest  # 导入pytest，用于创建测试夹具
+from sqlalchemy import event, text  # 导入event和text，用于统计SQL语句和执行原生SQL
+from sqlalchemy.orm import Session  # 导入Session，创建绑定到固定连接的会话
+
+from models.database import engine, init_db, session_scope  # 导入数据库引擎、初始化函数和工作单元
+from models.changes import ChangeWatcher, latest_change, prune_change_log  # 导入修改检测和修改日志的清理
+from models.models import Task  # 导入数据模型
+from models.service import TaskService  # 导入业务操作
+
+# 修改检测的测试
+# 检测器与DbWorker一样使用绑定在固定连接上的会话，外部修改通过session_scope()在另一个连接上提交
+
+@pytest.fixture
+def watched(request):
+    """
+    创建绑定在固定连接上的会话和一个以测试名称命名的分类，并完成检测器的第一次检查
+
+    返回:
+        (会话, 检测器, 分类ID)
+    """
+    init_db()
+    with session_scope() as db:
+        category_id = TaskService(db).create_category(request.node.name)
+    connection = engine.connect()
+    db = Session(bind=connection)
+    watcher = ChangeWatcher()
+    assert watcher.poll(db, 0) == []
+    yield db, watcher, category_id
+    db.close()
+    connection.close()
+
+@pytest.fixture
+def statements():
+    """记录执行的SQL语句"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
+
+def test_poll_reports_external_changes(watched):
+    """另一个连接提交的添加、修改和删除都被报告，而且只报告这些任务"""
+    db, watcher, category_id = watched
+    with session_scope() as other:
+        service = TaskService(other)
+        kept = service.create_task("修改", category_id=category_id).id
+        removed = service.create_task("删除", category_id=category_id).id
+    assert {change.row_id for change in watcher.poll(db, 0)} == {kept, removed}
+
+    with session_scope() as other:
+        service = TaskService(other)
+        added = service.create_task("新增", category_id=category_id).id
+        service.toggle_task(kept)
+        service.delete_task(removed)
+    changes = watcher.poll(db, 0)
+    assert {change.table_name for change in changes} == {"tasks"}
+    assert [(change.row_id, change.operation) for change in changes] == [
+        (added, "insert"), (kept, "update"), (removed, "delete")
+    ]
+    assert watcher.poll(db, 0) == []
+
+def test_idle_poll_reads_only_data_version(watched, statements):
+    """没有外部修改时只执行一条PRAGMA data_version，不读取change_log"""
+    db, watcher, category_id = watched
+    assert watcher.poll(db, 0) == []
+    assert statements == ["PRAGMA data_version"]
+
+def test_prune_keeps_unpushed_rows(watched):
+    """清理修改日志时保留尚未上传的行，即使超过了保留的行数"""
+    db, watcher, category_id = watched
+    with session_scope() as other:
+        for i in range(5):
+            TaskService(other).create_task(f"清理{i}", category_id=category_id)
+    # 在回滚的事务中修改上传进度，不影响其他测试使用的同步状态
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        latest = latest_change(connection)
+        pushed = latest - 3
+        connection.execute(text("DELETE FROM sync_state WHERE key = 'push_seq'"))
+        connection.execute(
+            text("INSERT INTO sync_state (key, value) VALUES ('push_seq', :seq)"), {"seq": str(pushed)}
+        )
+        prune_change_log(connection, keep=0)
+        seqs = [seq for seq, in connection.execute(text("SELECT seq FROM change_log ORDER BY seq"))]
+        transaction.rollback()
+    assert seqs == list(range(pushed + 1, latest + 1))
@@ -0,0 +1,88 @@
+import sqlite3  # 导入sqlite3模块，用第一个版本的建表语句创建旧数据库
+
+import pytest  # 导入pytest，用于创建测试夹具
+from sqlalchemy import create_engine, event  # 导入create_engine和event，为旧数据库创建单独的引擎并统计SQL语句
+from sqlalchemy.orm import Session  # 导入Session，创建绑定到旧数据库的会话
+
+from models import database  # 导入数据库模块，init_db()使用其中的引擎
+from models.migrations import SCHEMA_VERSION  # 导入当前的数据库结构版本
+from models.models import Task  # 导入数据模型
+from models.service import TaskService  # 导入业务操作
+
+# 数据库升级的测试
+# 从第一个版本的表结构升级，版本6重建任务表时删除孤立的任务，分类外键带有ON DELETE CASCADE
+
+# 第一个版本由create_all创建的表，分类外键没有ON DELETE CASCADE，没有记录版本号
+BASELINE_SCHEMA = """
+CREATE TABLE categories (
+    id INTEGER NOT NULL PRIMARY KEY,
+    name VARCHAR,
+    icon VARCHAR,
+    color VARCHAR
+);
+CREATE UNIQUE INDEX ix_categories_name ON categories (name);
+CREATE INDEX ix_categories_id ON categories (id);
+CREATE TABLE tasks (
+    id INTEGER NOT NULL PRIMARY KEY,
+    title VARCHAR,
+    description TEXT,
+    completed BOOLEAN,
+    priority VARCHAR,
+    due_date DATE,
+    created_at DATE,
+    category_id INTEGER,
+    FOREIGN KEY(category_id) REFERENCES categories (id)
+);
+CREATE INDEX ix_tasks_id ON tasks (id);
+CREATE INDEX ix_tasks_title ON tasks (title);
+INSERT INTO categories (id, name, color) VALUES (1, '工作', '#3498db'), (2, '个人', '#3498db');
+INSERT INTO tasks (id, title, completed, priority, created_at, category_id) VALUES
+    (1, '工作1', 0, 'high', '2024-03-01', 1),
+    (2, '工作2', 1, 'low', '2024-03-01', 1),
+    (3, '个人', 0, 'medium', '2024-03-02', 2),
+    (4, '孤立1', 0, 'medium', '2024-03-02', 3),
+    (5, '孤立2', 1, 'medium', '2024-03-03', 9),
+    (6, '无分类', 0, 'low', '2024-03-03', NULL);
+"""
+
+@pytest.fixture
+def legacy_engine(tmp_path, monkeypatch):
+    """
+    创建第一个版本的数据库，其中有分类已被删除的孤立任务，并让init_db()使用它的引擎
+
+    返回:
+        绑定到旧数据库的引擎，连接时与应用的引擎一样应用性能配置(包括外键约束)
+    """
+    path = tmp_path / "legacy.db"
+    connection = sqlite3.connect(path)
+    connection.executescript(BASELINE_SCHEMA)
+    connection.close()
+    legacy = create_engine(f"sqlite:///{path}")
+    event.listen(legacy, "connect", database.apply_db_profile)
+    monkeypatch.setattr(database, "engine", legacy)
+    yield legacy
+    legacy.dispose()
+
+def test_upgrade_from_baseline(legacy_engine):
+    """升级后孤立的任务被删除，外键检查没有错误，版本号是当前版本，删除分类只需一条语句"""
+    database.init_db()
+    with legacy_engine.connect() as connection:
+        ids = [task_id for task_id, in connection.exec_driver_sql("SELECT id FROM tasks ORDER BY id")]
+        assert ids == [1, 2, 3, 6]
+        assert connection.exec_driver_sql("PRAGMA foreign_key_check").fetchall() == []
+        assert connection.exec_driver_sql("PRAGMA user_version").scalar() == SCHEMA_VERSION
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(legacy_engine, "before_cursor_execute", record)
+    with Session(bind=legacy_engine) as db:
+        TaskService(db).delete_category(1)
+        db.commit()
+    event.remove(legacy_engine, "before_cursor_execute", record)
+    assert [statement.split()[0] for statement in statements] == ["DELETE"]
+
+    with Session(bind=legacy_engine) as db:
+        assert sorted(task.title for task in db.query(Task)) == ["个人", "无分类"]
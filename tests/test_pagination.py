@@ -0,0 +1,80 @@
+import datetime  # 导入datetime模块，用于生成日期和时间
+
+import pytest  # 导入pytest，用于创建测试夹具和参数化测试
+
+from models.database import init_db, session_scope  # 导入初始化函数和工作单元
+from models.models import Category, Task, TASK_SORT_KEYS, sort_key_value  # 导入数据模型、排序键和键值函数
+from models.service import TaskService  # 导入业务操作
+
+# 键集分页的测试
+# 从头向后或从尾向前逐页读取，结果必须与一次读取全部任务相同。
+# 排序键中有大量重复的值，可以为空的列有一部分为NULL(由COALESCE替换为极值)
+
+PAGE_SIZE = 3
+
+@pytest.fixture(scope="module")
+def category_id():
+    """
+    添加一个分类和20个任务
+
+    返回:
+        分类ID
+    """
+    init_db()
+    with session_scope() as db:
+        category = Category(name="键集分页")
+        db.add(category)
+        db.flush()
+        base = datetime.datetime(2030, 1, 1)
+        db.add_all(
+            Task(
+                title=f"分页{i % 4}",
+                category_id=category.id,
+                priority=["low", "medium", "high"][i % 3],
+                completed=i % 2 == 0,
+                due_date=(base + datetime.timedelta(days=i % 3)).date() if i % 5 else None,
+                created_at=(base + datetime.timedelta(days=i % 2)).date() if i % 7 else None,
+                completed_at=base + datetime.timedelta(hours=i % 4) if i % 2 == 0 and i % 3 else None,
+            )
+            for i in range(20)
+        )
+        db.flush()
+        return category.id
+
+def read_forward(service, category_id, sort, descending, use_key):
+    """从第一页开始用after逐页向后读取，返回任务ID列表"""
+    rows = service.list_task_rows(category_id, 0, PAGE_SIZE, sort=sort, descending=descending)
+    ids = [row.id for row in rows]
+    while len(rows) == PAGE_SIZE:
+        anchor_key = sort_key_value(sort, rows[-1]) if use_key else None
+        rows = service.list_task_rows(
+            category_id, 0, PAGE_SIZE, sort=sort, descending=descending, after=rows[-1].id, anchor_key=anchor_key
+        )
+        ids.extend(row.id for row in rows)
+    return ids
+
+def read_backward(service, category_id, sort, descending, total, use_key):
+    """从最后一页开始用before逐页向前读取，返回按显示顺序排列的任务ID列表"""
+    rows = service.list_task_rows(
+        category_id, max(0, total - PAGE_SIZE), PAGE_SIZE, sort=sort, descending=descending
+    )
+    ids = [row.id for row in rows]
+    while len(rows) == PAGE_SIZE:
+        anchor_key = sort_key_value(sort, rows[0]) if use_key else None
+        rows = service.list_task_rows(
+            category_id, 0, PAGE_SIZE, sort=sort, descending=descending, before=rows[0].id, anchor_key=anchor_key
+        )
+        ids[:0] = [row.id for row in rows]
+    return ids
+
+@pytest.mark.parametrize("sort", list(TASK_SORT_KEYS))
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("use_key", [False, True])
+def test_keyset_pages_match_full_read(category_id, sort, descending, use_key):
+    """向后和向前逐页读取的结果都与一次读取相同，锚点按ID查询或直接给出排序键值时都一样"""
+    with session_scope() as db:
+        service = TaskService(db)
+        full = [row.id for row in service.list_task_rows(category_id, sort=sort, descending=descending)]
+        assert len(full) == 20
+        assert read_forward(service, category_id, sort, descending, use_key) == full
+        assert read_backward(service, category_id, sort, descending, len(full), use_key) == full
@@ -0,0 +1,120 @@
+import re  # 导入re模块，用于匹配查询计划中的全表扫描
+import datetime  # 导入datetime模块，用于生成截止日期
+
+import pytest  # 导入pytest，用于参数化测试
+from sqlalchemy import event  # 导入event，用于记录服务执行的SQL语句
+
+from models.database import engine, init_db, session_scope  # 导入数据库引擎、初始化函数和工作单元
+from models.models import Category, Task, TASK_SORT_KEYS  # 导入数据模型和排序键
+from models.service import TaskService  # 导入业务操作，测试界面和命令行实际执行的查询
+from models.smart_lists import SMART_LISTS  # 导入智能列表的定义
+
+# 热点查询的查询计划测试
+# 对TaskService的每个热点查询执行EXPLAIN QUERY PLAN，不允许出现不使用索引的"SCAN tasks"。
+# "SCAN tasks USING (COVERING) INDEX"按索引顺序读取，可以接受(例如不筛选分类时按排序键列出任务)
+
+# 全表扫描：SCAN tasks后面没有USING ... INDEX
+FULL_SCAN = re.compile(r"\bSCAN tasks\b(?! USING (COVERING )?INDEX)")
+# 全文索引的全表扫描：FTS5虚拟表的idxStr中没有MATCH条件(M)，例如用LIKE逐行比较时的"INDEX 0:L0"
+FULL_FTS_SCAN = re.compile(r"VIRTUAL TABLE INDEX \d+:[^M]*$")
+
+# 列表排序键，不包括只用于智能列表的completed_at
+SORT_KEYS = [name for name in TASK_SORT_KEYS if name != "completed_at"]
+
+@pytest.fixture(scope="module")
+def ids():
+    """
+    初始化数据库并添加一个分类和几个任务
+
+    返回:
+        (分类ID, 锚点任务ID)
+    """
+    init_db()
+    with session_scope() as db:
+        category = Category(name="查询计划")
+        db.add(category)
+        db.flush()
+        today = datetime.date.today()
+        tasks = [
+            Task(title=f"任务{i}", category_id=category.id, priority=["low", "medium", "high"][i % 3],
+                 completed=i % 2 == 0, due_date=today + datetime.timedelta(days=i))
+            for i in range(10)
+        ]
+        db.add_all(tasks)
+        db.flush()
+        return category.id, tasks[5].id
+
+def explain(call):
+    """
+    执行一个服务调用，返回其中每条语句的查询计划
+
+    参数:
+        call: 函数call(service)
+
+    返回:
+        (SQL语句, 查询计划各行的描述列表)的列表
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    with session_scope() as db:
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            call(TaskService(db))
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        connection = db.connection()
+        plans = []
+        for statement, parameters in statements:
+            rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+            plans.append((statement, [row[-1] for row in rows]))
+    assert plans, "服务调用没有执行任何查询"
+    return plans
+
+def assert_no_full_scan(call):
+    """断言服务调用中的每条语句都不扫描整张任务表或整个全文索引"""
+    for statement, details in explain(call):
+        scans = [detail for detail in details if FULL_SCAN.search(detail) or FULL_FTS_SCAN.search(detail)]
+        assert not scans, f"全表扫描 {scans}:\n{statement}"
+
+def test_count_tasks(ids):
+    category_id, _ = ids
+    assert_no_full_scan(lambda service: service.count_tasks(category_id))
+
+def test_category_counts(ids):
+    category_id, _ = ids
+    assert_no_full_scan(lambda service: service.category_counts())
+    assert_no_full_scan(lambda service: service.category_counts([category_id]))
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("sort", SORT_KEYS)
+def test_category_pages(ids, sort, descending):
+    category_id, anchor_id = ids
+    options = dict(category_id=category_id, limit=3, sort=sort, descending=descending)
+    # 第一页和拖动滚动条时的OFFSET查询
+    assert_no_full_scan(lambda service: service.list_task_rows(offset=4, **options))
+    # 从锚点向后和向前的键集分页
+    assert_no_full_scan(lambda service: service.list_task_rows(after=anchor_id, **options))
+    assert_no_full_scan(lambda service: service.list_task_rows(before=anchor_id, **options))
+
+@pytest.mark.parametrize("completed", [False, True])
+def test_completed_filter(ids, completed):
+    category_id, anchor_id = ids
+    options = dict(category_id=category_id, completed=completed, limit=3)
+    assert_no_full_scan(lambda service: service.list_task_rows(**options))
+    assert_no_full_scan(lambda service: service.list_task_rows(after=anchor_id, **options))
+
+@pytest.mark.parametrize("name", list(SMART_LISTS))
+def test_smart_lists(ids, name):
+    # 逾期、今天和未来7天是截止日期的范围查询
+    _, anchor_id = ids
+    assert_no_full_scan(lambda service: service.count_smart_list(name))
+    assert_no_full_scan(lambda service: service.list_smart_rows(name, limit=3))
+    assert_no_full_scan(lambda service: service.list_smart_rows(name, limit=3, after=anchor_id))
+
+@pytest.mark.parametrize("query", ["任务", "务", "任务 5", "任务10"])
+def test_search(ids, query):
+    # 少于3个字符的词使用二元组索引，不逐行比较
+    assert_no_full_scan(lambda service: service.search(query))
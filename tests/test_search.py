@@ -0,0 +1,37 @@
+import pytest  # 导入pytest，用于创建测试夹具和参数化测试
+
+from models.database import init_db, session_scope  # 导入初始化函数和工作单元
+from models.models import Task  # 导入数据模型
+from models.search import search_tasks  # 导入全文搜索
+
+# 搜索的测试
+# 短词用LIKE确认，%和_必须按字面匹配，不能作为通配符
+
+TITLES = ["下划线 a_b", "字母 axb", "百分比 100%", "普通 100"]
+
+@pytest.fixture(scope="module")
+def ids():
+    """
+    添加标题中包含LIKE特殊字符的任务
+
+    返回:
+        字典{标题: 任务ID}
+    """
+    init_db()
+    with session_scope() as db:
+        tasks = [Task(title=title) for title in TITLES]
+        db.add_all(tasks)
+        db.flush()
+        return {task.title: task.id for task in tasks}
+
+@pytest.mark.parametrize("query, expected", [
+    ("_", ["下划线 a_b"]),
+    ("%", ["百分比 100%"]),
+    ("a_b", ["下划线 a_b"]),
+    ("0%", ["百分比 100%"]),
+])
+def test_like_special_characters(ids, query, expected):
+    """搜索%和_只匹配包含这些字符的任务"""
+    with session_scope() as db:
+        found = {row[0] for row in search_tasks(db, query)}
+    assert sorted(title for title, task_id in ids.items() if task_id in found) == expected
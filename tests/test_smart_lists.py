@@ -0,0 +1,130 @@
+import datetime  # 导入datetime模块，用于生成相对于今天的日期
+
+import pytest  # 导入pytest，用于创建测试夹具和参数化测试
+from sqlalchemy import event  # 导入event，用于统计执行的SQL语句
+
+from models.database import engine, init_db, session_scope  # 导入数据库引擎、初始化函数和工作单元
+from models.models import Category, Task, TaskRow, TASK_ROW_COLUMNS  # 导入数据模型和任务列表的行类型
+from models.service import TaskService  # 导入业务操作
+from models.smart_lists import SMART_LISTS, SmartListCache  # 导入智能列表的定义和缓存
+
+# 智能列表的测试
+# matches()必须与conditions()表示同一个集合，缓存只在受影响时失效
+
+TODAY = datetime.date(2030, 6, 15)
+
+@pytest.fixture(scope="module")
+def category_id():
+    """
+    添加覆盖各个列表边界的任务：各种完成状态、优先级、截止日期、完成时间，有分类和没有分类
+
+    返回:
+        分类ID
+    """
+    init_db()
+    with session_scope() as db:
+        category = Category(name="智能列表")
+        db.add(category)
+        db.flush()
+        now = datetime.datetime.combine(TODAY, datetime.time(12))
+        tasks = []
+        for i, offset in enumerate([None, -3, -1, 0, 1, 6, 7, 8]):
+            for completed in (False, True):
+                tasks.append(Task(
+                    title=f"智能{i}",
+                    category_id=category.id if i % 2 else None,
+                    priority=["low", "medium", "high"][i % 3],
+                    completed=completed,
+                    due_date=TODAY + datetime.timedelta(days=offset) if offset is not None else None,
+                    completed_at=now - datetime.timedelta(days=i * 2) if completed and i % 4 else None,
+                ))
+        db.add_all(tasks)
+        db.flush()
+        return category.id
+
+@pytest.fixture
+def statements():
+    """记录执行的SQL语句"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
+
+def page(service, cache, name, offset, limit):
+    """
+    与主窗口显示智能列表时相同：先查找缓存，没有时查询并保存到缓存
+
+    返回:
+        (任务ID, TaskRow)的列表
+    """
+    entry = cache.entry(name, TODAY)
+    rows = entry.pages.get((offset, limit))
+    if rows is None:
+        rows = [(row.id, row) for row in service.list_smart_rows(name, offset, limit, today=TODAY)]
+        entry.pages[(offset, limit)] = rows
+    return rows
+
+def all_rows(db):
+    """读取所有任务的TaskRow"""
+    return [TaskRow._make(row) for row in db.query(*TASK_ROW_COLUMNS)]
+
+@pytest.mark.parametrize("name", list(SMART_LISTS))
+def test_matches_agrees_with_conditions(category_id, name):
+    """对每一个任务，matches()的判断与conditions()的查询结果相同"""
+    smart_list = SMART_LISTS[name]
+    with session_scope() as db:
+        selected = {task_id for task_id, in db.query(Task.id).filter(*smart_list.conditions(TODAY))}
+        matched = {row.id for row in all_rows(db) if smart_list.matches(row, TODAY)}
+    assert selected
+    assert matched == selected
+
+def test_cached_page_without_query(category_id, statements):
+    """再次读取已缓存的页不执行任何查询"""
+    cache = SmartListCache()
+    with session_scope() as db:
+        service = TaskService(db)
+        first = page(service, cache, "open", 0, 5)
+        assert statements
+        del statements[:]
+        assert page(service, cache, "open", 0, 5) == first
+        assert statements == []
+
+def fill(cache):
+    """为所有列表建立缓存项，返回{列表名称: 缓存项}"""
+    entries = {}
+    for name in SMART_LISTS:
+        entry = cache.entry(name, TODAY)
+        entry.count = 0
+        entries[name] = entry
+    return entries
+
+def invalidated(cache, entries):
+    """返回缓存项已被丢弃的列表名称"""
+    return {name for name, entry in entries.items() if cache.entry(name, TODAY) is not entry}
+
+def test_toggle_invalidates_affected_lists(category_id):
+    """完成一个今天到期的高优先级任务只让包含它修改前或修改后状态的列表失效"""
+    before = TaskRow(1, "切换", "high", False, TODAY, TODAY, category_id, None)
+    after = before._replace(completed=True, completed_at=datetime.datetime.combine(TODAY, datetime.time(9)))
+    cache = SmartListCache()
+    entries = fill(cache)
+    cache.rows_changed([(before, after)])
+    assert invalidated(cache, entries) == {"open", "high", "today", "week", "recent"}
+
+def test_edit_keeps_lists_and_drops_pages(category_id):
+    """只修改标题时列表不失效，只丢弃包含该任务的页；修改截止日期时只让成员变化的列表失效"""
+    before = TaskRow(2, "编辑", "low", False, TODAY, TODAY, category_id, None)
+    cache = SmartListCache()
+    entries = fill(cache)
+    entries["open"].pages = {(0, 2): [(2, before), (3, None)], (2, 2): [(4, None), (5, None)]}
+    cache.rows_changed([(before, before._replace(title="编辑后"))])
+    assert invalidated(cache, entries) == set()
+    assert list(entries["open"].pages) == [(2, 2)]
+
+    cache.rows_changed([(before, before._replace(due_date=TODAY + datetime.timedelta(days=3)))])
+    # 仍在"全部未完成"和"未来7天"中，但截止日期影响顺序；离开了"今天"
+    assert invalidated(cache, entries) == {"open", "today", "week"}
@@ -0,0 +1,111 @@
+import os  # 导入os模块，用于拼接数据库文件路径
+import datetime  # 导入datetime模块，用于设置完成时间
+import tempfile  # 导入tempfile模块，用于创建服务器和第二个客户端的数据库目录
+import threading  # 导入threading模块，用于在后台运行同步服务器
+
+import pytest  # 导入pytest，用于创建测试夹具
+from sqlalchemy import create_engine, select  # 导入引擎的创建函数和查询构造函数
+from sqlalchemy.orm import Session  # 导入会话，用于第二个客户端
+
+from models.database import init_db, session_scope  # 导入初始化函数和工作单元
+from models.models import Task, ArchivedTask  # 导入数据模型
+from models.migrations import migrate  # 导入结构升级，创建第二个客户端的数据库
+from models.archive import archive_completed, restore_archived  # 导入归档和恢复
+from models.sync import sync  # 导入增量同步
+from sync_server import make_server  # 导入参考服务器
+
+# 归档与同步的测试
+# 本地的客户端使用测试数据库，另一台电脑的客户端使用临时目录中的另一个数据库文件
+
+LONG_AGO = datetime.datetime(2000, 1, 1)
+
+@pytest.fixture(scope="module")
+def server():
+    """
+    在后台启动同步服务器
+
+    返回:
+        服务器地址。本地的测试数据库记录了下载位置，所有测试必须使用同一个服务器
+    """
+    directory = tempfile.mkdtemp(prefix="todo-sync-")
+    server = make_server(os.path.join(directory, "server.db"), port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield "http://%s:%d" % server.server_address
+    server.shutdown()
+    server.server_close()
+    server.store.close()
+
+@pytest.fixture
+def remote(server):
+    """
+    创建另一台电脑上的客户端，每个测试使用一个新的数据库
+
+    返回:
+        (服务器地址, 另一个客户端的会话)
+    """
+    engine = create_engine("sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="todo-remote-"), "remote.db"))
+    with engine.begin() as connection:
+        migrate(connection)
+    session = Session(bind=engine)
+    yield server, session
+    session.close()
+    engine.dispose()
+
+def titles(db, uid):
+    """返回数据库中某个全局唯一ID的(任务标题列表, 归档记录数)"""
+    tasks = db.execute(select(Task.title).where(Task.uid == uid)).scalars().all()
+    archived = db.execute(select(ArchivedTask.id).where(ArchivedTask.uid == uid)).scalars().all()
+    return tasks, len(archived)
+
+def test_archive_and_restore_are_not_synced(remote):
+    """本地归档和恢复不会删除或复制另一台电脑上的任务，恢复的任务保留原来的全局唯一ID"""
+    url, other = remote
+    init_db()
+    with session_scope() as db:
+        task = Task(title="归档后同步", completed=True, completed_at=LONG_AGO)
+        db.add(task)
+        db.flush()
+        uid = task.uid
+    with session_scope() as db:
+        sync(db, url)
+    sync(other, url)
+    assert titles(other, uid) == (["归档后同步"], 0)
+
+    # 归档不上传删除标记
+    with session_scope() as db:
+        archive_completed(db, LONG_AGO + datetime.timedelta(days=1))
+        assert titles(db, uid) == ([], 1)
+        assert sync(db, url)["pushed"] == 0
+    sync(other, url)
+    assert titles(other, uid) == (["归档后同步"], 0)
+
+    # 恢复保留原来的ID，也不上传
+    with session_scope() as db:
+        archive_id = db.execute(select(ArchivedTask.id).where(ArchivedTask.uid == uid)).scalar()
+        restore_archived(db, [archive_id])
+    with session_scope() as db:
+        assert titles(db, uid) == (["归档后同步"], 0)
+        assert sync(db, url)["pushed"] == 0
+
+def test_remote_edit_of_archived_task(remote):
+    """另一台电脑修改了本地已归档的任务时，任务回到任务表，归档的记录被删除"""
+    url, other = remote
+    init_db()
+    with session_scope() as db:
+        task = Task(title="远程修改", completed=True, completed_at=LONG_AGO)
+        db.add(task)
+        db.flush()
+        uid = task.uid
+    with session_scope() as db:
+        sync(db, url)
+    sync(other, url)
+    with session_scope() as db:
+        archive_completed(db, LONG_AGO + datetime.timedelta(days=1))
+
+    other.execute(Task.__table__.update().where(Task.uid == uid).values(title="远程修改后"))
+    other.commit()
+    sync(other, url)
+    with session_scope() as db:
+        sync(db, url)
+    with session_scope() as db:
+        assert titles(db, uid) == (["远程修改后"], 0)
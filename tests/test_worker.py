@@ -0,0 +1,136 @@
+import time  # 导入time模块，用于等待工作线程执行完请求
+
+import pytest  # 导入pytest，用于创建测试夹具
+from sqlalchemy import event  # 导入event，用于统计写入任务表的SQL语句
+
+from models.database import engine, session_scope  # 导入数据库引擎和工作单元，用另一个会话检查已提交的数据
+from models.models import Category, Task  # 导入数据模型
+from models.service import TaskService  # 导入业务操作，在工作线程中执行
+from models.worker import DbWorker  # 导入数据库后台工作线程
+
+# 延迟写入模式的测试
+# write_delay取一个很长的时间，修改只在执行普通请求或停止工作线程时提交
+
+@pytest.fixture
+def worker(request):
+    """
+    创建延迟写入模式的工作线程和一个以测试名称命名的分类
+
+    返回:
+        (工作线程, 分类ID, 被回滚的请求数列表)
+    """
+    discarded = []
+    worker = DbWorker(write_delay=60, on_discard=lambda count, exc: discarded.append(count))
+    category_id = run(worker, lambda db: TaskService(db).create_category(request.node.name))
+    yield worker, category_id, discarded
+    worker.stop()
+
+def run(worker, fn, deferred=False):
+    """
+    提交一个请求并等待它执行完毕
+
+    参数:
+        worker: 工作线程
+        fn: 在工作线程中执行的函数fn(db)
+        deferred: 是否延迟提交
+
+    返回:
+        fn的返回值，失败时返回fn抛出的异常
+    """
+    outcome = []
+    worker.submit(fn, outcome.append, outcome.append, deferred=deferred)
+    while worker.pending:
+        worker.process_results()
+        time.sleep(0.001)
+    return outcome[0]
+
+def write(worker, task_id, op, fields=None):
+    """提交一个任务修改并等待它执行完毕，返回回调的结果或异常"""
+    outcome = []
+    worker.submit_write(task_id, op, fields, outcome.append, outcome.append)
+    while worker.pending:
+        worker.process_results()
+        time.sleep(0.001)
+    return outcome[0]
+
+@pytest.fixture
+def task_writes():
+    """记录写入任务表的UPDATE和DELETE语句"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith(("UPDATE tasks", "DELETE FROM tasks")):
+            executed.append(statement.split()[0])
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
+
+def committed_titles(category_id):
+    """从另一个会话读取分类中已提交的任务标题"""
+    with session_scope() as db:
+        return sorted(task.title for task in db.query(Task).filter(Task.category_id == category_id))
+
+def test_failed_deferred_request_keeps_earlier_edits(worker):
+    """一个延迟请求失败只回滚它自己的修改，之前未提交的修改在下一次提交时写入"""
+    worker, category_id, discarded = worker
+    run(worker, lambda db: TaskService(db).create_task("保留", category_id=category_id).id, deferred=True)
+
+    def fail(db):
+        TaskService(db).create_task("回滚", category_id=category_id)
+        db.add(Category(name=db.get(Category, category_id).name))  # 分类名称重复，刷新时违反唯一约束
+        db.flush()
+
+    error = run(worker, fail, deferred=True)
+    assert isinstance(error, Exception)
+    assert worker.unsaved == 1
+    # 延迟的修改还没有提交
+    assert committed_titles(category_id) == []
+
+    run(worker, lambda db: None)
+    assert committed_titles(category_id) == ["保留"]
+    assert discarded == []
+
+def test_release_does_not_commit(worker):
+    """释放第一个保存点不会提交，延迟的修改在一个事务中提交"""
+    worker, category_id, discarded = worker
+    task_id = run(worker, lambda db: TaskService(db).create_task("切换", category_id=category_id).id)
+    commits = worker.commits
+    for _ in range(2):
+        run(worker, lambda db: TaskService(db).toggle_task(task_id) and None, deferred=True)
+    assert worker.commits == commits
+
+    run(worker, lambda db: None)
+    assert worker.commits == commits + 1
+    with session_scope() as db:
+        assert db.get(Task, task_id).completed is False
+
+def test_toggle_twice_writes_nothing(worker, task_writes):
+    """连续切换两次完成状态互相抵消，提交时不执行UPDATE"""
+    worker, category_id, discarded = worker
+    task_id = run(worker, lambda db: TaskService(db).create_task("抵消", category_id=category_id).id)
+    before, after = write(worker, task_id, "toggle")
+    assert after.completed is True and after.completed_at is not None
+    before, after = write(worker, task_id, "toggle")
+    assert after.completed is False and after.completed_at is None
+
+    run(worker, lambda db: None)
+    assert task_writes == []
+
+def test_edit_then_delete_writes_one_delete(worker, task_writes):
+    """编辑后删除只执行一条DELETE；多次编辑合并为一条UPDATE"""
+    worker, category_id, discarded = worker
+    ids = [run(worker, lambda db: TaskService(db).create_task(title, category_id=category_id).id)
+           for title in ("删除", "编辑")]
+    write(worker, ids[0], "update", {"title": "删除前", "priority": "high"})
+    assert write(worker, ids[0], "delete")[1] is None
+    assert isinstance(write(worker, ids[0], "toggle"), ValueError)
+    write(worker, ids[1], "update", {"title": "第一次"})
+    _, after = write(worker, ids[1], "update", {"priority": "high"})
+    assert (after.title, after.priority) == ("第一次", "high")
+    assert committed_titles(category_id) == ["删除", "编辑"]
+
+    run(worker, lambda db: None)
+    assert sorted(task_writes) == ["DELETE", "UPDATE"]
+    assert committed_titles(category_id) == ["第一次"]
+    assert discarded == []
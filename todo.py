@@ -0,0 +1,280 @@
+import sys  # 导入系统模块，用于设置退出码和输出错误信息
+import argparse  # 导入argparse模块，用于解析命令行参数
+import datetime  # 导入datetime模块，用于解析截止日期
+
+# 只导入models包，不导入tkinter和views包，可以在没有图形界面的环境中运行
+from models import init_db, session_scope, TaskService, PriorityEnum
+from models.database import API_DEFAULT_WORKERS, API_MAX_WORKERS  # 导入API服务器的默认和最多线程数，不需要导入api_server
+from models.models import TASK_SORT_KEYS  # 导入任务列表的排序键
+from models.smart_lists import SMART_LISTS  # 导入智能列表的定义
+from models.archive import DEFAULT_ARCHIVE_DAYS  # 导入默认的归档天数
+from models.config import config_store  # 导入配置缓存，归档天数与图形界面共用配置
+
+# 待办事项命令行工具
+# 与图形界面共用同一个数据库和TaskService，适合在脚本和定时任务中使用
+#
+# 用法示例:
+#   python -m todo add "写周报" -c 工作 -p high --due 2024-03-15
+#   python -m todo list -c 工作 --open
+#   python -m todo done 12 15 18
+#   python -m todo view overdue
+#   python -m todo rm 20
+#   python -m todo archive --days 180
+#   python -m todo archived -q 周报
+#   python -m todo restore 3 4
+#   python -m todo import tasks.jsonl
+#   python -m todo export backup.csv
+#   python -m todo sync --url http://127.0.0.1:8765
+#   python -m todo serve --port 8080
+
+def find_category_id(service, name):
+    """
+    按名称查找分类ID
+
+    参数:
+        service: TaskService对象
+        name: 分类名称，为None时返回None
+
+    返回:
+        分类ID
+
+    注意:
+        分类不存在时抛出ValueError
+    """
+    if name is None:
+        return None
+    category = service.find_category(name)
+    if category is None:
+        raise ValueError(f"分类 '{name}' 不存在")
+    return category.id
+
+def cmd_add(service, args):
+    """添加任务并输出新任务的ID"""
+    task = service.create_task(
+        args.title,
+        description=args.description,
+        priority=args.priority,
+        category_id=find_category_id(service, args.category),
+        due_date=args.due,
+    )
+    print(task.id)
+
+def cmd_list(service, args):
+    """按排序键输出任务，每行一个，各列用制表符分隔"""
+    completed = None
+    if args.open:
+        completed = False
+    elif args.completed:
+        completed = True
+    category_id = find_category_id(service, args.category)
+    names = dict(service.list_categories())
+    for task in service.list_task_rows(
+        category_id, limit=args.limit, completed=completed, sort=args.sort, descending=args.desc
+    ):
+        print_task(task, names)
+
+def cmd_view(service, args):
+    """输出智能列表中的任务，例如逾期的任务或最近完成的任务"""
+    names = dict(service.list_categories())
+    for task in service.list_smart_rows(args.name, limit=args.limit):
+        print_task(task, names)
+
+def print_task(task, names):
+    """
+    输出一个任务，各列用制表符分隔
+
+    参数:
+        task: Task对象或TaskRow元组
+        names: 分类ID到分类名称的字典
+    """
+    status = "x" if task.completed else " "
+    due = task.due_date.isoformat() if task.due_date else ""
+    print(f"{task.id}\t[{status}]\t{task.priority}\t{due}\t{task.title}\t{names.get(task.category_id, '')}")
+
+def cmd_done(service, args):
+    """把任务标记为已完成(使用--undo时标记为未完成)，有任务不存在时不修改任何任务"""
+    service.require_tasks(args.ids)
+    service.set_completed(args.ids, not args.undo)
+
+def cmd_rm(service, args):
+    """删除任务，有任务不存在时不删除任何任务"""
+    service.require_tasks(args.ids)
+    service.delete_tasks(args.ids)
+
+def cmd_archive(service, args):
+    """归档很久以前完成的任务"""
+    days = args.days if args.days is not None else config_store.get("archive_days", DEFAULT_ARCHIVE_DAYS)
+    count = service.archive_completed(days)
+    print(f"已归档 {count} 个任务")
+
+def cmd_archived(service, args):
+    """输出归档的任务，第一列是归档记录的ID，用于restore命令"""
+    if args.query:
+        for archive_id, title, _, priority, completed, category_name in service.search_archive(args.query, args.limit):
+            print(f"{archive_id}\t[{'x' if completed else ' '}]\t{priority}\t\t{title}\t{category_name or ''}")
+        return
+    names = dict(service.list_categories())
+    for task in service.list_archived_rows(limit=args.limit):
+        print_task(task, names)
+
+def cmd_restore(service, args):
+    """把归档的任务恢复到任务列表"""
+    count = service.restore_archived(args.ids)
+    print(f"已恢复 {count} 个任务")
+
+def cmd_import(service, args):
+    """从CSV或JSON Lines文件导入"""
+    count = service.import_file(args.path)
+    print(f"已导入 {count} 个任务")
+
+def cmd_export(service, args):
+    """导出到CSV或JSON Lines文件"""
+    count = service.export_file(args.path)
+    print(f"已导出 {count} 条记录")
+
+def cmd_sync(service, args):
+    """与同步服务器进行一次增量同步"""
+    url = args.url or config_store.get("sync_url")
+    if not url:
+        raise ValueError("未配置同步服务器，请使用--url指定")
+    if args.url:
+        config_store.set("sync_url", args.url)
+    stats = service.sync(url)
+    print(
+        f"已上传 {stats['pushed']} 个修改，下载 {stats['pulled']} 个修改"
+        f"(发送 {stats['sent']:,} 字节，接收 {stats['received']:,} 字节)"
+    )
+
+def cmd_serve(args):
+    """
+    运行HTTP/JSON API服务器，按Ctrl+C停止
+
+    注意:
+        服务器在线程池中为每个请求创建自己的工作单元，不使用命令的会话
+    """
+    # 只有serve命令需要asyncio和服务器模块
+    import api_server
+    api_server.run(args.host, args.port, args.workers, cache=not args.no_cache)
+
+def workers_argument(value):
+    """解析数据库线程数，不能超过引擎连接池的容量(API_MAX_WORKERS)"""
+    workers = int(value)
+    if not 1 <= workers <= API_MAX_WORKERS:
+        raise argparse.ArgumentTypeError(f"线程数必须在1到{API_MAX_WORKERS}之间")
+    return workers
+
+def build_parser():
+    """
+    创建命令行参数解析器
+
+    返回:
+        argparse.ArgumentParser对象，每个子命令通过handler默认值关联处理函数
+    """
+    parser = argparse.ArgumentParser(prog="todo", description="待办事项命令行工具")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="添加任务")
+    add.add_argument("title", help="任务标题")
+    add.add_argument("-d", "--description", help="任务描述")
+    add.add_argument("-c", "--category", help="分类名称")
+    add.add_argument(
+        "-p", "--priority",
+        choices=[priority.value for priority in PriorityEnum],
+        default=PriorityEnum.MEDIUM.value,
+        help="优先级，默认为medium",
+    )
+    add.add_argument("--due", type=datetime.date.fromisoformat, help="截止日期，格式为YYYY-MM-DD")
+    add.set_defaults(handler=cmd_add)
+
+    list_ = commands.add_parser("list", help="列出任务")
+    list_.add_argument("-c", "--category", help="只列出该分类的任务")
+    status = list_.add_mutually_exclusive_group()
+    status.add_argument("--open", action="store_true", help="只列出未完成的任务")
+    status.add_argument("--completed", action="store_true", help="只列出已完成的任务")
+    list_.add_argument("-n", "--limit", type=int, help="最多列出的任务数")
+    list_.add_argument("-s", "--sort", choices=list(TASK_SORT_KEYS), default="id", help="排序键，默认按ID排序")
+    list_.add_argument("--desc", action="store_true", help="降序排列")
+    list_.set_defaults(handler=cmd_list)
+
+    view = commands.add_parser("view", help="列出智能列表中的任务")
+    view.add_argument(
+        "name", choices=list(SMART_LISTS),
+        help="、".join(f"{name}({smart_list.label})" for name, smart_list in SMART_LISTS.items()),
+    )
+    view.add_argument("-n", "--limit", type=int, help="最多列出的任务数")
+    view.set_defaults(handler=cmd_view)
+
+    done = commands.add_parser("done", help="把任务标记为已完成")
+    done.add_argument("ids", nargs="+", type=int, help="任务ID，可以有多个")
+    done.add_argument("--undo", action="store_true", help="标记为未完成")
+    done.set_defaults(handler=cmd_done)
+
+    rm = commands.add_parser("rm", help="删除任务")
+    rm.add_argument("ids", nargs="+", type=int, help="任务ID，可以有多个")
+    rm.set_defaults(handler=cmd_rm)
+
+    archive = commands.add_parser("archive", help="归档很久以前完成的任务")
+    archive.add_argument("--days", type=int, help="归档完成超过这么多天的任务，默认使用配置中的archive_days或90天")
+    archive.set_defaults(handler=cmd_archive)
+
+    archived = commands.add_parser("archived", help="列出或搜索归档的任务")
+    archived.add_argument("-q", "--query", help="全文搜索归档的任务")
+    archived.add_argument("-n", "--limit", type=int, help="最多列出的任务数")
+    archived.set_defaults(handler=cmd_archived)
+
+    restore = commands.add_parser("restore", help="恢复归档的任务")
+    restore.add_argument("ids", nargs="+", type=int, help="归档记录的ID(archived命令输出的第一列)，可以有多个")
+    restore.set_defaults(handler=cmd_restore)
+
+    import_ = commands.add_parser("import", help="从CSV或JSON Lines文件导入")
+    import_.add_argument("path", help="文件路径")
+    import_.set_defaults(handler=cmd_import)
+
+    export = commands.add_parser("export", help="导出到CSV或JSON Lines文件")
+    export.add_argument("path", help="文件路径，扩展名为.csv时导出CSV，否则导出JSON Lines")
+    export.set_defaults(handler=cmd_export)
+
+    sync_ = commands.add_parser("sync", help="与同步服务器进行一次增量同步")
+    sync_.add_argument("--url", help="服务器地址，指定后保存到配置中的sync_url，默认使用配置中的地址")
+    sync_.set_defaults(handler=cmd_sync)
+
+    # 地址和端口的默认值与api_server中的常量一致，线程数的默认值和上限来自models.database，
+    # 只有执行serve命令时才导入api_server
+    serve = commands.add_parser("serve", help="运行HTTP/JSON API服务器")
+    serve.add_argument("--host", default="127.0.0.1", help="监听的地址，默认为127.0.0.1")
+    serve.add_argument("--port", type=int, default=8080, help="监听的端口，默认为8080")
+    serve.add_argument(
+        "--workers", type=workers_argument, default=API_DEFAULT_WORKERS,
+        help=f"执行数据库操作的线程数(1~{API_MAX_WORKERS})，默认为{API_DEFAULT_WORKERS}"
+    )
+    serve.add_argument("--no-cache", action="store_true", help="不缓存GET请求的响应，每个请求都查询数据库")
+    serve.set_defaults(handler=cmd_serve, session=False)
+
+    return parser
+
+def main(argv=None):
+    """
+    命令行工具的入口点
+
+    参数:
+        argv: 命令行参数列表，为None时使用sys.argv
+
+    返回:
+        退出码，成功时为0
+    """
+    args = build_parser().parse_args(argv)
+    init_db()
+    if not getattr(args, "session", True):
+        # 长时间运行的命令自己管理工作单元
+        return args.handler(args) or 0
+    try:
+        # 整个命令是一个工作单元，成功时提交，出错时回滚
+        with session_scope() as db:
+            args.handler(TaskService(db), args)
+    except (ValueError, OSError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
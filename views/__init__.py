@@ -1,5 +1,27 @@
-from views.main_window import MainWindow
-from views.task_dialog import TaskDialog
-from views.category_dialog import CategoryDialog
+import importlib  # 导入importlib模块，用于在第一次访问时导入子模块
 
-__all__ = ['MainWindow', 'TaskDialog', 'CategoryDialog'] 
\ No newline at end of file
+# 包中公开的名称及其所在的模块
+# 对话框及其依赖(颜色选择器、日期控件和数据模型)在第一次访问时才导入
+_EXPORTS = {
+    'MainWindow': 'views.main_window',
+    'TaskDialog': 'views.task_dialog',
+    'CategoryDialog': 'views.category_dialog',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    """
+    按需导入包中公开的名称
+
+    参数:
+        name: 名称
+
+    返回:
+        对应模块中的对象
+    """
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'views' has no attribute '{name}'")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,145 @@
+import tkinter as tk  # 导入tkinter库，Python的标准GUI库
+from tkinter import ttk  # 导入ttk模块，提供主题化的小部件
+
+from views.task_list import VirtualTaskList  # 导入虚拟化任务列表，归档的任务可能很多
+
+class ArchiveWindow:
+    """
+    归档任务窗口
+
+    列出或全文搜索归档的任务，把选中的任务恢复到任务列表。
+    窗口不是模态的，所有数据库操作都通过主窗口的后台工作线程执行
+    """
+    def __init__(self, parent, run_db, format_task, format_search_result, on_restored):
+        """
+        创建并显示窗口
+
+        参数:
+            parent: 父窗口
+            run_db: 主窗口的run_db(fn, callback)，在后台执行数据库操作
+            format_task: 把TaskRow格式化为任务列表的列值的函数
+            format_search_result: 把搜索结果格式化为任务列表的列值的函数
+            on_restored: 恢复任务后调用的函数on_restored(count)
+        """
+        self.run_db = run_db
+        self.format_task = format_task
+        self.format_search_result = format_search_result
+        self.on_restored = on_restored
+
+        # 创建窗口
+        self.window = tk.Toplevel(parent)
+        self.window.title("已归档的任务")
+        self.window.geometry("700x480")
+        self.window.transient(parent)
+
+        # 标题和搜索框
+        header = ttk.Frame(self.window)
+        header.pack(fill=tk.X, padx=10, pady=10)
+        self.header_label = ttk.Label(header, text="已归档的任务", font=("TkDefaultFont", 12, "bold"))
+        self.header_label.pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(header, textvariable=self.search_var, width=25)
+        self.search_entry.pack(side=tk.RIGHT)
+        ttk.Label(header, text="搜索:").pack(side=tk.RIGHT, padx=(0, 5))
+        # 按回车键搜索，按Esc键清除搜索
+        self.search_entry.bind("<Return>", lambda event: self.search())
+        self.search_entry.bind("<Escape>", lambda event: self.clear_search())
+
+        # 任务列表，列与主窗口的任务列表相同，ID列是归档记录的ID
+        frame = ttk.Frame(self.window)
+        frame.pack(fill=tk.BOTH, expand=True, padx=10)
+        self.task_list = VirtualTaskList(
+            frame, columns=("id", "title", "priority", "completed", "due_date", "created_at")
+        )
+        headings = {"title": "任务名称", "priority": "优先级", "completed": "状态", "due_date": "截止日期", "created_at": "创建日期"}
+        for column, text in headings.items():
+            self.task_list.tree.heading(column, text=text)
+        self.task_list.tree.column("id", width=0, stretch=tk.NO)
+        self.task_list.tree.column("title", width=250, stretch=tk.YES)
+        self.task_list.tree.column("priority", width=60, stretch=tk.NO)
+        self.task_list.tree.column("completed", width=60, stretch=tk.NO)
+        self.task_list.tree.column("due_date", width=90, stretch=tk.NO)
+        self.task_list.tree.column("created_at", width=90, stretch=tk.NO)
+
+        # 按钮
+        buttons = ttk.Frame(self.window)
+        buttons.pack(fill=tk.X, padx=10, pady=10)
+        ttk.Button(buttons, text="恢复", command=self.restore).pack(side=tk.LEFT, padx=2)
+        self.status_label = ttk.Label(buttons, text="")
+        self.status_label.pack(side=tk.LEFT, padx=10)
+        ttk.Button(buttons, text="关闭", command=self.window.destroy).pack(side=tk.RIGHT, padx=2)
+
+        self.show_all()
+
+    def is_open(self):
+        """窗口是否仍然存在"""
+        return bool(self.window.winfo_exists())
+
+    def lift(self):
+        """把已打开的窗口显示到最前面"""
+        self.window.deiconify()
+        self.window.lift()
+
+    def show_all(self):
+        """按归档时间倒序列出所有归档的任务，滚动时按锚点键集分页"""
+        self.header_label.config(text="已归档的任务")
+
+        def count_tasks(callback):
+            """在后台统计归档的任务数"""
+            def done(count):
+                self.status_label.config(text=f"共 {count:,} 个任务")
+                callback(count)
+            self.run_db(lambda service: service.count_archived(), done)
+
+        def fetch_tasks(offset, limit, callback, after=None, before=None):
+            """在后台获取一页归档的任务"""
+            def fetch(service):
+                rows = service.list_archived_rows(offset, limit, after=after, before=before)
+                return [(row.id, self.format_task(row)) for row in rows]
+            self.run_db(fetch, callback)
+
+        self.task_list.set_source(count_tasks, fetch_tasks)
+
+    def search(self):
+        """全文搜索归档的任务，结果按相关度排序"""
+        query = self.search_var.get().strip()
+        if not query:
+            self.clear_search()
+            return
+        self.header_label.config(text=f"搜索结果 - {query}")
+        results = []
+
+        def count_results(callback):
+            """在后台执行搜索，完成后返回结果数量"""
+            def done(rows):
+                results[:] = [(row[0], self.format_search_result(row)) for row in rows]
+                self.status_label.config(text=f"找到 {len(results):,} 个任务")
+                callback(len(results))
+            self.run_db(lambda service: service.search_archive(query), done)
+
+        def fetch_results(offset, limit, callback, after=None, before=None):
+            """从已保存的搜索结果中读取一页"""
+            callback(results[offset:offset + limit])
+
+        self.task_list.set_source(count_results, fetch_results)
+
+    def clear_search(self):
+        """清除搜索，重新列出所有归档的任务"""
+        self.search_var.set("")
+        self.show_all()
+
+    def restore(self):
+        """在后台恢复选中的任务，完成后从列表中移除它们"""
+        archive_ids = self.task_list.selection()
+        if not archive_ids:
+            self.status_label.config(text="未选择任务")
+            return
+
+        def done(count):
+            """恢复完成后更新列表并通知主窗口"""
+            for archive_id in archive_ids:
+                self.task_list.remove_row(archive_id)
+            self.status_label.config(text=f"已恢复 {count:,} 个任务")
+            self.on_restored(count)
+
+        self.run_db(lambda service: service.restore_archived(archive_ids), done)
@@ -1,11 +1,30 @@
 import tkinter as tk  # 导入tkinter库，Python的标准GUI库
-from tkinter import ttk, messagebox  # 导入ttk模块(提供主题化的小部件)和messagebox模块(用于显示消息对话框)
+from tkinter import ttk, messagebox, filedialog  # 导入ttk模块(提供主题化的小部件)、messagebox模块(用于显示消息对话框)和filedialog模块(用于选择文件)
 import datetime  # 导入datetime模块，用于处理日期和时间
 
-from views.task_dialog import TaskDialog  # 导入任务对话框类，用于添加和编辑任务
-from views.category_dialog import CategoryDialog  # 导入分类对话框类，用于添加和编辑分类
-from models import Category, Task, get_db  # 导入数据模型和获取数据库会话的函数
-from models.database import save_config, load_config  # 导入保存和加载配置的函数
+from views.task_list import VirtualTaskList  # 导入虚拟化任务列表，只渲染可见的行
+from models.worker import DbWorker, snapshot  # 导入数据库后台工作线程和对象快照函数
+from models.config import config_store  # 导入进程内的配置缓存
+from models.perf import perf  # 导入性能计时记录器，记录界面操作从开始到显示结果的耗时
+
+# 本模块在导入时不加载SQLAlchemy：
+# 任务和分类对话框在第一次打开时导入，TaskService在工作线程中导入，
+# 主窗口因此可以在数据库模块加载之前完成第一次绘制
+
+# 可以点击排序的列及其标题文本，列名与TaskService.list_tasks的排序键一致
+SORT_COLUMNS = {
+    "title": "任务名称",
+    "priority": "优先级",
+    "completed": "状态",
+    "due_date": "截止日期",
+    "created_at": "创建日期",
+}
+
+# 延迟写入模式下修改的提交间隔(毫秒)，保存在配置项write_behind_ms中，为0时关闭延迟写入
+WRITE_BEHIND_MS = 500
+
+# 检查其他窗口或程序修改数据库的间隔(毫秒)
+CHANGE_POLL_MS = 1000
 
 class MainWindow:
     """
@@ -13,12 +32,16 @@ class MainWindow:
     
     负责创建和管理用户界面，处理用户交互，并与数据库交互
     """
-    def __init__(self, root):
+    def __init__(self, root, on_ready=None):
         """
         初始化主窗口
         
         参数:
             root: tkinter的根窗口对象
+            on_ready: 数据库初始化完成、分类列表第一次加载完成后调用的无参数函数
+            
+        注意:
+            这里只创建界面部件，数据库工作线程在窗口第一次绘制后的空闲时刻才启动
         """
         self.root = root  # 保存根窗口引用
         self.root.title("待办事项")  # 设置窗口标题
@@ -33,6 +56,31 @@ class MainWindow:
         # 配置Treeview标题的字体为粗体
         style.configure("Treeview.Heading", font=("TkDefaultFont", 9, "bold"))
         
+        # 菜单栏
+        # 创建菜单栏，提供导入、导出和退出功能
+        self.menu_bar = tk.Menu(self.root)
+        self.file_menu = tk.Menu(self.menu_bar, tearoff=False)
+        self.file_menu.add_command(label="导入任务...", command=self.import_tasks)
+        self.file_menu.add_command(label="导出任务...", command=self.export_tasks)
+        self.file_menu.add_separator()
+        # 归档：很久以前完成的任务移动到归档表，可以在单独的窗口中搜索和恢复
+        self.file_menu.add_command(label="归档已完成任务...", command=self.archive_tasks)
+        self.file_menu.add_command(label="已归档的任务...", command=self.show_archive)
+        self.file_menu.add_separator()
+        # 同步：与同步服务器交换上次同步之后的修改，服务器地址保存在配置项sync_url中
+        self.file_menu.add_command(label="立即同步", command=self.sync_now)
+        self.file_menu.add_command(label="同步服务器...", command=self.ask_sync_url)
+        self.file_menu.add_separator()
+        # 延迟写入：切换完成状态、编辑和删除任务先更新界面，修改每隔一段时间合并提交一次
+        self.write_behind_var = tk.BooleanVar(value=bool(config_store.get("write_behind_ms")))
+        self.file_menu.add_checkbutton(
+            label="延迟写入", variable=self.write_behind_var, command=self.toggle_write_behind
+        )
+        self.file_menu.add_separator()
+        self.file_menu.add_command(label="退出", command=self.on_closing, accelerator="Ctrl+Q")
+        self.menu_bar.add_cascade(label="文件", menu=self.file_menu)
+        self.root.config(menu=self.menu_bar)
+        
         # 设置主框架
         # 创建一个Frame作为主容器
         self.main_frame = ttk.Frame(self.root)
@@ -77,6 +125,8 @@ class MainWindow:
         self.category_scrollbar.pack(fill=tk.Y, side=tk.RIGHT)
         # 配置分类列表，使其与滚动条同步
         self.category_list.configure(yscrollcommand=self.category_scrollbar.set)
+        # 智能列表显示为红色，与分类区分开
+        self.category_list.tag_configure("smart_list", foreground="#c0392b")
         
         # 分类按钮
         # 创建一个Frame作为分类按钮的容器
@@ -105,11 +155,24 @@ class MainWindow:
         # 将右侧面板添加到PanedWindow，权重为3(比左侧面板大)
         self.paned_window.add(self.right_panel, weight=3)
         
-        # 任务标题
+        # 任务标题和搜索框
+        # 创建一个Frame作为标题和搜索框的容器
+        self.task_header_frame = ttk.Frame(self.right_panel)
+        self.task_header_frame.pack(fill=tk.X, pady=(0, 10))
         # 创建一个Label作为任务列表的标题
-        self.task_header = ttk.Label(self.right_panel, text="任务", font=("TkDefaultFont", 12, "bold"))
-        # 将标题放置在右侧面板顶部，左对齐
-        self.task_header.pack(pady=(0, 10), anchor=tk.W)
+        self.task_header = ttk.Label(self.task_header_frame, text="任务", font=("TkDefaultFont", 12, "bold"))
+        # 将标题放置在容器左侧
+        self.task_header.pack(side=tk.LEFT)
+        
+        # 创建搜索框，在所有分类中搜索任务标题和描述
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(self.task_header_frame, textvariable=self.search_var, width=30)
+        # 将搜索框放置在容器右侧
+        self.search_entry.pack(side=tk.RIGHT)
+        ttk.Label(self.task_header_frame, text="搜索:").pack(side=tk.RIGHT, padx=(0, 5))
+        # 按回车键搜索，按Esc键清除搜索
+        self.search_entry.bind("<Return>", lambda event: self.search())
+        self.search_entry.bind("<Escape>", lambda event: self.clear_search())
         
         # 任务列表
         # 创建一个Frame作为任务列表的容器
@@ -117,42 +180,36 @@ class MainWindow:
         # 将任务列表容器放置在右侧面板中，填充剩余空间
         self.task_frame.pack(fill=tk.BOTH, expand=True)
         
-        # 创建一个Treeview作为任务列表
+        # 创建虚拟化任务列表
         # columns定义了列名
-        # show="headings"表示只显示列标题和数据，不显示树状结构
-        self.task_list = ttk.Treeview(
-            self.task_frame, 
-            columns=("id", "title", "priority", "completed"),
-            show="headings"
+        # 虚拟列表只为视口内可见的行创建Treeview项，滚动时按需从数据库获取数据
+        self.task_list = VirtualTaskList(
+            self.task_frame, columns=("id", "title", "priority", "completed", "due_date", "created_at")
         )
-        # 将任务列表放置在容器中，填充剩余空间，靠左对齐
-        self.task_list.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
         
         # 配置列
-        # 设置各列的标题文本
-        self.task_list.heading("id", text="ID")
-        self.task_list.heading("title", text="任务名称")
-        self.task_list.heading("priority", text="优先级")
-        self.task_list.heading("completed", text="状态")
+        # 设置各列的标题文本，点击标题按该列排序，再次点击切换升序/降序
+        self.task_list.tree.heading("id", text="ID")
+        for column, text in SORT_COLUMNS.items():
+            self.task_list.tree.heading(column, text=text, command=lambda column=column: self.sort_by(column))
         
         # 隐藏ID列并调整其他列宽度
         # width=0使ID列不可见
         # stretch=tk.NO表示列宽不会随窗口大小变化
-        self.task_list.column("id", width=0, stretch=tk.NO)
+        self.task_list.tree.column("id", width=0, stretch=tk.NO)
         # 设置任务名称列宽度为250像素，并允许拉伸
-        self.task_list.column("title", width=250, stretch=tk.YES)
+        self.task_list.tree.column("title", width=250, stretch=tk.YES)
         # 设置优先级列宽度为60像素，不允许拉伸
-        self.task_list.column("priority", width=60, stretch=tk.NO)
+        self.task_list.tree.column("priority", width=60, stretch=tk.NO)
         # 设置状态列宽度为60像素，不允许拉伸
-        self.task_list.column("completed", width=60, stretch=tk.NO)
+        self.task_list.tree.column("completed", width=60, stretch=tk.NO)
+        # 设置日期列宽度为90像素，不允许拉伸
+        self.task_list.tree.column("due_date", width=90, stretch=tk.NO)
+        self.task_list.tree.column("created_at", width=90, stretch=tk.NO)
         
-        # 为任务列表添加滚动条
-        # 创建一个垂直滚动条，绑定到任务列表的yview方法
-        self.task_scrollbar = ttk.Scrollbar(self.task_frame, orient=tk.VERTICAL, command=self.task_list.yview)
-        # 将滚动条放置在容器右侧，填充垂直方向
-        self.task_scrollbar.pack(fill=tk.Y, side=tk.RIGHT)
-        # 配置任务列表，使其与滚动条同步
-        self.task_list.configure(yscrollcommand=self.task_scrollbar.set)
+        # 配置样式标签 - 所有文字都设置为黑色黑体字
+        # 定义"task_item"标签的样式：黑色粗体字
+        self.task_list.tree.tag_configure("task_item", font=("TkDefaultFont", 9, "bold"), foreground="black")
         
         # 任务按钮
         # 创建一个Frame作为任务按钮的容器
@@ -172,13 +229,39 @@ class MainWindow:
         self.delete_task_button = ttk.Button(self.task_buttons_frame, text="删除", command=self.delete_task)
         self.delete_task_button.pack(side=tk.LEFT, padx=2)
         
+        # 批量操作菜单，对所有选中的任务执行一条集合语句
+        self.bulk_button = ttk.Menubutton(self.task_buttons_frame, text="批量操作")
+        self.bulk_button.pack(side=tk.LEFT, padx=2)
+        self.bulk_menu = tk.Menu(self.bulk_button, tearoff=False)
+        self.bulk_button["menu"] = self.bulk_menu
+        self.bulk_menu.add_command(label="标记为已完成", command=lambda: self.bulk_set_completed(True))
+        self.bulk_menu.add_command(label="标记为未完成", command=lambda: self.bulk_set_completed(False))
+        # 设置优先级子菜单
+        self.bulk_priority_menu = tk.Menu(self.bulk_menu, tearoff=False)
+        self.bulk_priority_menu.add_command(label="高", command=lambda: self.bulk_set_priority("high"))
+        self.bulk_priority_menu.add_command(label="中", command=lambda: self.bulk_set_priority("medium"))
+        self.bulk_priority_menu.add_command(label="低", command=lambda: self.bulk_set_priority("low"))
+        self.bulk_menu.add_cascade(label="设置优先级", menu=self.bulk_priority_menu)
+        # 移动到分类子菜单，每次打开时根据当前的分类重新生成
+        self.bulk_move_menu = tk.Menu(self.bulk_menu, tearoff=False, postcommand=self.build_move_menu)
+        self.bulk_menu.add_cascade(label="移动到分类", menu=self.bulk_move_menu)
+        self.bulk_menu.add_separator()
+        self.bulk_menu.add_command(label="删除", command=self.bulk_delete)
+        
         # 状态栏
         # 创建一个Label作为状态栏，显示应用程序状态信息
         # relief=tk.SUNKEN使其看起来像是嵌入窗口
         # anchor=tk.W使文本左对齐
-        self.status_bar = ttk.Label(self.root, text="就绪", relief=tk.SUNKEN, anchor=tk.W)
-        # 将状态栏放置在窗口底部，填充水平方向
-        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        # 创建一个Frame作为状态栏的容器，放置在窗口底部
+        self.status_frame = ttk.Frame(self.root)
+        self.status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        self.status_bar = ttk.Label(self.status_frame, text="就绪", relief=tk.SUNKEN, anchor=tk.W)
+        # 将状态栏放置在容器左侧，填充水平方向
+        self.status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        # 创建一个Label显示后台正在进行的数据库操作数量
+        self.activity_label = ttk.Label(self.status_frame, text="", relief=tk.SUNKEN, anchor=tk.E, width=16)
+        # 将活动标签放置在容器右侧
+        self.activity_label.pack(side=tk.RIGHT)
         
         # 设置键盘快捷键
         # 绑定Ctrl+N快捷键到添加任务功能
@@ -189,8 +272,12 @@ class MainWindow:
         self.root.bind("<Control-d>", lambda event: self.delete_task())
         # 绑定Ctrl+Space快捷键到切换任务完成状态功能
         self.root.bind("<Control-space>", lambda event: self.toggle_task_completion())
+        # 绑定Ctrl+F快捷键到搜索框
+        self.root.bind("<Control-f>", lambda event: self.search_entry.focus_set())
         # 绑定Ctrl+Q快捷键到退出应用程序功能
-        self.root.bind("<Control-q>", lambda event: self.root.destroy())
+        self.root.bind("<Control-q>", lambda event: self.on_closing())
+        # 绑定Ctrl+Shift+P快捷键到隐藏的性能调试面板
+        self.root.bind("<Control-Shift-P>", lambda event: self.show_perf_panel())
         
         # 设置分类选择事件
         # 当用户在分类列表中选择一项时，调用category_selected方法
@@ -203,12 +290,61 @@ class MainWindow:
         # 初始化数据
         # 当前选中的分类ID，初始为None
         self.current_category = None
-        # 加载分类列表
-        self.load_categories()
+        # 当前显示的智能列表名称，显示分类或搜索结果时为None
+        self.current_view = None
+        # 智能列表查询结果的缓存，分类列表第一次加载时创建
+        self.smart_cache = None
+        # 分类名称和任务计数，由load_categories填充
+        self.category_names = {}
+        self.category_counts = {}
+        # 任务列表的排序，保存在配置中，下次启动时恢复
+        self.sort_key = "id"
+        self.sort_descending = False
+        sort = config_store.get("task_sort")
+        if sort and sort.get("key") in SORT_COLUMNS:
+            self.sort_key = sort["key"]
+            self.sort_descending = bool(sort.get("descending"))
+        self.update_sort_headings()
+        # 数据库后台工作线程，由start_database创建
+        self.worker = None
+        # 性能调试面板，第一次打开时创建
+        self.perf_panel = None
+        # 归档任务窗口，第一次打开时创建
+        self.archive_window = None
+        # 检测其他连接修改的models.changes.ChangeWatcher，在工作线程中创建和使用
+        self.change_watcher = None
+        self.on_ready = on_ready
+        
+        # 窗口绘制完成后再启动数据库
+        # after_idle的回调排在部件布局和绘制之后执行
+        self.status_bar.config(text="正在加载...")
+        self.root.after_idle(self.start_database)
+    
+    def start_database(self):
+        """
+        启动数据库后台工作线程并加载分类列表
+        
+        作用:
+            工作线程在后台导入数据库模块、检查数据库结构，然后执行提交的请求。
+            所有查询和提交都在工作线程中执行，结果通过poll_worker在界面线程中处理，
+            工作线程持有长期会话，每个请求是一个独立的工作单元，
+            重复读取同一个任务或分类时直接命中标识映射，只在切换分类时显式调用expire_all()
+        """
+        self.worker = DbWorker(self.write_delay(), on_discard=self.on_writes_discarded)
+        # 开始定时处理工作线程返回的结果
+        self.poll_worker()
+        # 开始定时检查其他窗口或程序的修改，第一次检查排在加载分类之前，记录加载前的修改序号
+        self.check_changes()
+        
+        def ready():
+            """分类列表加载完成后恢复上次选择的分类"""
+            self.status_bar.config(text="就绪")
+            self.restore_last_category()
+            if self.on_ready:
+                self.on_ready()
         
-        # 加载上次选择的分类
-        # 从配置文件中恢复上次选择的分类
-        self.restore_last_category()
+        # 加载分类列表
+        self.load_categories(callback=ready)
     
     def show_status(self, message, timeout=3000):
         """
@@ -226,78 +362,666 @@ class MainWindow:
         # 设置定时器，在timeout毫秒后将状态栏文本恢复为"就绪"
         self.root.after(timeout, lambda: self.status_bar.config(text="就绪"))
     
-    def load_categories(self):
+    def run_db(self, fn, callback=None, deferred=False, errback=None):
+        """
+        在后台工作线程中执行数据库操作
+        
+        参数:
+            fn: 在工作线程中执行的函数fn(service)，service是绑定到当前工作单元的TaskService，
+                返回值传给callback
+            callback: 操作成功后在界面线程中调用的函数callback(result)
+            deferred: 延迟写入模式下操作是否可以延迟提交，任务列表的查询和单个任务的修改使用
+            errback: 操作失败后在界面线程中调用的函数errback(error)，为None时使用on_db_error
+            
+        作用:
+            提交操作后立即返回，不阻塞界面；操作失败时显示错误消息
+        """
+        def run(db):
+            """在工作线程中用当前工作单元的会话创建TaskService"""
+            from models.service import TaskService
+            return fn(TaskService(db))
+        
+        self.worker.submit(run, callback, errback or self.on_db_error, deferred=deferred)
+        self.update_activity()
+    
+    def run_write(self, task_id, op, callback, fields=None):
+        """
+        在后台工作线程中修改单个任务
+        
+        参数:
+            task_id: 任务ID
+            op: "toggle"、"update"或"delete"
+            callback: 操作成功后在界面线程中调用的函数callback((修改前的TaskRow, 修改后的TaskRow))
+            fields: op为"update"时要修改的字段
+            
+        作用:
+            延迟写入模式下修改与同一任务之前未提交的修改合并，例如切换两次完成状态不写入任何数据；
+            操作失败时由on_task_error处理
+        """
+        self.worker.submit_write(task_id, op, fields, callback, self.on_task_error)
+        self.update_activity()
+    
+    def write_delay(self):
+        """
+        获取延迟写入的提交间隔
+        
+        返回:
+            间隔秒数，延迟写入关闭时返回None
+        """
+        milliseconds = config_store.get("write_behind_ms")
+        return milliseconds / 1000 if milliseconds else None
+    
+    def toggle_write_behind(self):
+        """
+        打开或关闭延迟写入
+        
+        作用:
+            保存到配置中，并立即应用到工作线程。关闭时尚未提交的修改在工作线程下一次等待请求时提交
+        """
+        config_store.set("write_behind_ms", WRITE_BEHIND_MS if self.write_behind_var.get() else 0)
+        if self.worker:
+            self.worker.write_delay = self.write_delay()
+    
+    def on_writes_discarded(self, count, error):
+        """
+        处理延迟写入的提交失败
+        
+        参数:
+            count: 被撤销的操作数
+            error: 导致回滚的异常
+            
+        作用:
+            界面已经显示了这些修改，因此提示用户修改已被撤销，
+            然后重新加载分类计数和当前的任务列表，让界面与数据库一致
+        """
+        messagebox.showerror("保存失败", f"{count} 项修改未能保存，已撤销:\n{error}")
+        self.tasks_bulk_changed((), None)
+        self.load_categories(callback=self.reload_current_view)
+    
+    def reload_current_view(self):
+        """
+        重新加载分类列表之后恢复当前显示的列表
+        
+        作用:
+            重新选中当前的智能列表或分类，选择事件会重新加载任务列表；显示搜索结果时重新获取可见的行
+        """
+        if self.current_view:
+            item = f"view-{self.current_view}"
+        elif self.current_category in self.category_names:
+            item = f"category-{self.current_category}"
+        else:
+            self.task_list.refresh()
+            return
+        self.category_list.selection_set(item)
+        self.category_list.see(item)
+    
+    def on_db_error(self, error):
+        """
+        处理后台数据库操作的错误
+        
+        参数:
+            error: 操作抛出的异常
+        """
+        messagebox.showerror("数据库错误", str(error))
+    
+    def on_task_error(self, error):
+        """
+        处理单个任务操作的错误
+        
+        参数:
+            error: 操作抛出的异常
+            
+        作用:
+            任务不存在(TaskService抛出ValueError，一般是已在其他窗口或程序中被删除)时
+            只在状态栏提示并重新获取可见的行，分类计数由修改检测更新；其他错误显示错误消息
+        """
+        if isinstance(error, ValueError):
+            self.show_status(f"{error}，可能已在其他窗口中被删除")
+            self.task_list.refresh()
+            return
+        self.on_db_error(error)
+    
+    def poll_worker(self):
+        """
+        定时处理后台工作线程返回的结果
+        
+        作用:
+            在界面线程中执行已完成操作的回调，并更新状态栏中的活动提示。
+            有操作进行中时每20毫秒检查一次，空闲时每100毫秒检查一次
+        """
+        # 先安排下一次检查，回调中打开模态对话框时依然可以继续处理结果
+        self.root.after(20 if self.worker.pending else 100, self.poll_worker)
+        self.worker.process_results()
+        self.update_activity()
+    
+    def check_changes(self):
+        """
+        定时检查其他窗口或程序对数据库的修改
+        
+        作用:
+            每CHANGE_POLL_MS毫秒在工作线程中检查一次。没有外部修改时只执行一条PRAGMA data_version；
+            有外部修改时只读取被修改的任务和涉及的分类计数，由apply_changes更新界面。
+            有后台操作进行中或有尚未提交的修改时跳过这次检查，检查请求不会在队列中堆积
+        """
+        self.root.after(CHANGE_POLL_MS, self.check_changes)
+        if self.worker.pending or self.worker.unsaved:
+            return
+        
+        def poll(db):
+            """在工作线程中读取上次检查之后的外部修改"""
+            from models.service import TaskService
+            if self.change_watcher is None:
+                from models.changes import ChangeWatcher
+                self.change_watcher = ChangeWatcher()
+            changes = self.change_watcher.poll(db, self.worker.commits)
+            if changes is None:
+                # 修改太多，会话中所有对象都可能已经过期
+                db.expire_all()
+                return None
+            if not changes:
+                return ()
+            return TaskService(db).load_changes(changes)
+        
+        def done(result):
+            """在界面线程中应用外部修改"""
+            if result is None:
+                self.tasks_bulk_changed((), None)
+                self.load_categories(callback=self.categories_changed_externally)
+                self.show_status("数据已被其他程序修改，已重新加载")
+            elif result:
+                self.apply_changes(*result)
+        
+        # 直接提交给工作线程，不更新状态栏中的活动提示；检查失败时等待下一次检查
+        self.worker.submit(poll, done, lambda error: None, deferred=True)
+    
+    def apply_changes(self, categories_changed, rows, counts):
+        """
+        应用其他窗口或程序的修改
+        
+        参数:
+            categories_changed: 是否有分类被添加、修改或删除
+            rows: 字典{任务ID: 最新的TaskRow，已被删除时为None}
+            counts: 字典{分类ID: [未完成任务数, 全部任务数]}，修改涉及的分类的最新计数
+            
+        作用:
+            只更新涉及的分类计数；当前分类中被修改的任务原地更新，
+            有任务加入或离开当前分类时重新获取任务列表中可见的行
+        """
+        if rows:
+            # 无法知道修改前的任务，让所有智能列表的缓存失效
+            self.tasks_bulk_changed((), None)
+        if categories_changed:
+            # 分类很少，直接重新加载分类列表和所有计数，之后重新选中当前分类时会重新加载任务列表
+            self.load_categories(callback=self.categories_changed_externally)
+            return
+        
+        # 当前分类的任务总数变化说明有任务加入或离开，被删除的任务可能不在缓存中
+        current = self.current_category
+        total = self.category_counts[current][1] if current in self.category_counts else None
+        for category_id, category_counts in counts.items():
+            if category_id in self.category_counts:
+                self.category_counts[category_id] = category_counts
+                self.category_list.item(f"category-{category_id}", text=self.format_category(category_id))
+        if not rows:
+            return
+        
+        if self.current_view:
+            # 任务可能加入或离开智能列表
+            self.task_list.refresh()
+        elif current is not None:
+            refresh = current in counts and counts[current][1] != total
+            # 当前排序键在列值中的位置，排序键的值变化时任务在列表中的位置可能变化
+            column = self.task_list.tree["columns"].index(self.sort_key)
+            for task_id, row in rows.items():
+                if row is not None and row.category_id == current:
+                    cached = self.task_list.row_values(task_id)
+                    values = self.format_task(row)
+                    if cached is not None and cached[column] == values[column]:
+                        self.task_list.update_row(task_id, values)
+                    else:
+                        # 新任务、移入当前分类的任务、排序键被修改的任务，或者不在缓存中无法确定位置的任务
+                        refresh = True
+                elif self.task_list.contains(task_id):
+                    # 被删除或移出当前分类的任务
+                    refresh = True
+            if refresh:
+                self.task_list.refresh()
+    
+    def categories_changed_externally(self):
+        """
+        分类列表被重新加载之后恢复当前显示的列表
+        
+        作用:
+            当前分类已被其他程序删除时清空任务列表，否则重新选中当前分类或智能列表
+        """
+        if self.current_category is not None and self.current_category not in self.category_names:
+            self.current_category = None
+            self.task_list.clear()
+            self.task_header.config(text="任务")
+            return
+        self.reload_current_view()
+    
+    def update_activity(self):
+        """
+        在状态栏中显示正在进行的后台操作数量
+        """
+        pending = self.worker.pending
+        # 延迟写入模式下同时显示尚未提交的修改数
+        unsaved = self.worker.unsaved
+        if unsaved:
+            self.activity_label.config(text=f"未保存: {unsaved}")
+        else:
+            self.activity_label.config(text=f"后台操作: {pending}" if pending else "")
+    
+    def load_categories(self, callback=None):
         """
         从数据库加载分类
         
+        参数:
+            callback: 分类列表加载完成后调用的无参数函数
+        
         作用:
-            清空当前分类列表，然后从数据库加载所有分类并显示在界面上
+            在后台查询所有分类，以及用一次分组聚合统计每个分类的未完成/全部任务数，
+            完成后清空当前分类列表并显示查询结果。之后任务的增删和状态切换只增量更新计数
         """
-        # 清除现有项目
-        # 获取所有分类项的ID
-        for item in self.category_list.get_children():
-            # 删除每一项
-            self.category_list.delete(item)
+        # 记录从提交查询到显示分类列表的耗时
+        timer = perf.timer("load_categories")
         
-        # 从数据库获取分类
-        # 获取数据库会话
-        db = get_db()
-        # 查询所有分类
-        categories = db.query(Category).all()
+        def query_categories(service):
+            """查询所有分类的ID和名称，以及每个分类的任务计数"""
+            return service.list_categories(), service.category_counts()
         
-        # 将分类添加到列表
-        for category in categories:
-            # 插入一个新项，text显示分类名称，values存储分类ID
-            self.category_list.insert("", tk.END, text=category.name, values=(category.id,))
+        def show_categories(result):
+            """用查询结果替换分类列表"""
+            categories, counts = result
+            
+            # 清除现有项目
+            # 获取所有分类项的ID
+            for item in self.category_list.get_children():
+                # 删除每一项
+                self.category_list.delete(item)
+            
+            # 智能列表固定在分类列表顶部
+            # 工作线程已经导入了智能列表模块，这里导入不会在界面线程中加载SQLAlchemy
+            from models.smart_lists import SMART_LISTS, SmartListCache
+            if self.smart_cache is None:
+                self.smart_cache = SmartListCache()
+            for name, smart_list in SMART_LISTS.items():
+                self.category_list.insert(
+                    "", tk.END, iid=f"view-{name}", text=smart_list.label, values=("",), tags=("smart_list",)
+                )
+            
+            # 保存分类名称和计数，计数为[未完成任务数, 全部任务数]
+            self.category_names = dict(categories)
+            self.category_counts = {
+                category_id: counts.get(category_id, [0, 0]) for category_id, _ in categories
+            }
+            
+            # 将分类添加到列表
+            for category_id, name in categories:
+                # 插入一个新项，text显示分类名称和计数，values存储分类ID
+                self.category_list.insert(
+                    "", tk.END, iid=f"category-{category_id}",
+                    text=self.format_category(category_id), values=(category_id,)
+                )
+            timer.stop()
+            
+            if callback:
+                callback()
+        
+        self.run_db(query_categories, show_categories)
+    
+    def format_category(self, category_id):
+        """
+        格式化分类列表中显示的文本
+        
+        参数:
+            category_id: 分类ID
+            
+        返回:
+            形如"工作 (132/1,240)"的文本，括号中是未完成任务数和全部任务数
+        """
+        open_count, total = self.category_counts[category_id]
+        return f"{self.category_names[category_id]} ({open_count:,}/{total:,})"
+    
+    def update_category_count(self, category_id, open_delta, total_delta):
+        """
+        增量更新分类的任务计数
+        
+        参数:
+            category_id: 分类ID
+            open_delta: 未完成任务数的变化量
+            total_delta: 全部任务数的变化量
+            
+        作用:
+            只修改这一个分类项的文本，不需要重新查询数据库或重建分类列表
+        """
+        if category_id not in self.category_counts:
+            return
+        counts = self.category_counts[category_id]
+        counts[0] += open_delta
+        counts[1] += total_delta
+        self.category_list.item(f"category-{category_id}", text=self.format_category(category_id))
     
     def load_tasks(self):
         """
         加载选定分类的任务
         
         作用:
-            清空当前任务列表，然后从数据库加载选定分类的所有任务并显示在界面上
+            将任务列表的数据源切换为选定分类，
+            任务列表只会在后台按当前排序查询视口内可见的任务
         """
         # 如果没有选择分类，则不加载任务
         if not self.current_category:
             return
+        
+        self.current_view = None
+        category_id = self.current_category
+        sort_key = self.sort_key
+        descending = self.sort_descending
+        # 记录从切换分类到第一页任务返回的耗时
+        timer = perf.timer("load_tasks")
+        
+        def count_tasks(callback):
+            """
+            获取当前分类的任务总数
+
+            分类列表维护的计数中有这个分类时直接使用，打开分类不需要统计任务数，
+            耗时与分类的大小无关；计数中没有这个分类时才在后台统计
+            """
+            if category_id in self.category_counts:
+                callback(self.category_counts[category_id][1])
+                return
+            self.run_db(lambda service: service.count_tasks(category_id), callback, deferred=True)
+        
+        def fetch_tasks(offset, limit, callback, after=None, before=None):
+            """
+            在后台按当前排序获取当前分类中的一页任务
             
-        # 清除现有项目
-        # 获取所有任务项的ID
-        for item in self.task_list.get_children():
-            # 删除每一项
-            self.task_list.delete(item)
-        
-        # 从数据库获取任务
-        # 获取数据库会话
-        db = get_db()
-        # 查询属于当前选定分类的所有任务
-        tasks = db.query(Task).filter(Task.category_id == self.current_category).all()
-        
-        # 将任务添加到列表
-        for task in tasks:
-            # 格式化状态
-            # 如果任务已完成，显示"已完成"，否则显示"进行中"
-            status = "已完成" if task.completed else "进行中"
-            
-            # 格式化优先级
-            # 将英文优先级转换为中文显示
-            priority_text = "低" if task.priority == "low" else "中" if task.priority == "medium" else "高"
-            
-            # 添加到列表
-            # 插入一个新项，values包含任务ID、标题、优先级和状态
-            item_id = self.task_list.insert(
-                "", 
-                tk.END, 
-                values=(task.id, task.title, priority_text, status)
-            )
+            滚动到相邻的页时从锚点任务开始键集分页，远距离跳转时从offset开始
+            """
+            def fetch(service):
+                if after is None and before is None:
+                    # 不从锚点读取时是切换分类或重新加载，显式让已加载的对象过期，之后的读取会获取最新数据
+                    service.db.expire_all()
+                # 只查询列表显示的列，不创建Task对象，也不读取描述
+                rows = service.list_task_rows(
+                    category_id, offset, limit,
+                    sort=sort_key, descending=descending, after=after, before=before,
+                )
+                return [(row.id, self.format_task(row)) for row in rows]
+            
+            def done(rows):
+                """第一页返回时结束计时"""
+                timer.stop()
+                callback(rows)
             
-            # 为所有任务设置相同的黑色字体样式
-            # 使用"task_item"标签来应用样式
-            self.task_list.item(item_id, tags=("task_item",))
+            self.run_db(fetch, done, deferred=True)
         
-        # 配置样式标签 - 所有文字都设置为黑色黑体字
-        # 定义"task_item"标签的样式：黑色粗体字
-        self.task_list.tag_configure("task_item", font=("TkDefaultFont", 9, "bold"), foreground="black")
+        # 设置任务列表的数据源
+        self.task_list.set_source(count_tasks, fetch_tasks)
+    
+    def show_smart_list(self, name):
+        """
+        显示智能列表
+        
+        参数:
+            name: 智能列表的名称，SMART_LISTS中的一项
+            
+        作用:
+            任务列表显示所有分类中符合条件的任务，例如全部未完成的任务或逾期的任务。
+            每个列表由一个索引上的查询完成，滚动时同样按锚点键集分页。
+            任务总数和已读取的页保存在缓存中，没有相关的修改时再次切换到该列表不会查询数据库
+        """
+        from models.smart_lists import SMART_LISTS
+        # 智能列表跨越所有分类
+        self.current_category = None
+        self.current_view = name
+        self.task_header.config(text=f"任务 - {SMART_LISTS[name].label}")
+        cache = self.smart_cache
+        # 记录从切换列表到第一页任务返回的耗时，包括缓存命中
+        timer = perf.timer("load_smart_list")
+        
+        def count_tasks(callback):
+            """统计列表中的任务数，缓存中没有时在后台查询"""
+            entry = cache.entry(name, datetime.date.today())
+            if entry.count is not None:
+                # 缓存命中时也在之后的空闲时刻回调，与从数据库获取时的顺序一致
+                self.root.after_idle(callback, entry.count)
+                return
+            
+            def done(count):
+                """保存查询结果"""
+                entry.count = count
+                callback(count)
+            
+            self.run_db(lambda service: service.count_smart_list(name, entry.day), done, deferred=True)
+        
+        def fetch_tasks(offset, limit, callback, after=None, before=None):
+            """获取列表中的一页任务，缓存中没有时在后台查询"""
+            entry = cache.entry(name, datetime.date.today())
+            rows = entry.pages.get((offset, limit))
+            if rows is not None:
+                timer.stop()
+                self.root.after_idle(callback, rows)
+                return
+            
+            def fetch(service):
+                """在后台按列表的排序键获取一页任务"""
+                rows = service.list_smart_rows(name, offset, limit, after=after, before=before, today=entry.day)
+                return [(row.id, self.format_task(row)) for row in rows]
+            
+            def done(rows):
+                """保存查询结果"""
+                entry.pages[(offset, limit)] = rows
+                timer.stop()
+                callback(rows)
+            
+            self.run_db(fetch, done, deferred=True)
+        
+        # 设置任务列表的数据源
+        self.task_list.set_source(count_tasks, fetch_tasks)
+    
+    def tasks_changed(self, changes):
+        """
+        通知智能列表任务已被修改
+        
+        参数:
+            changes: (修改前的TaskRow, 修改后的TaskRow)的列表，新增的任务修改前为None，删除的任务修改后为None
+            
+        作用:
+            只让可能受影响的智能列表的缓存失效。当前显示智能列表时重新获取视口内的任务，
+            任务可能加入或离开该列表
+        """
+        if self.smart_cache is not None:
+            self.smart_cache.rows_changed(changes)
+        if self.current_view:
+            self.task_list.refresh()
+    
+    def update_task_row(self, task_id, values, before, after):
+        """
+        在任务列表中更新修改后的任务
+        
+        参数:
+            task_id: 任务ID
+            values: 格式化后的列值
+            before: 修改前的TaskRow
+            after: 修改后的TaskRow
+            
+        作用:
+            显示分类的任务时，修改改变了当前排序键的值，任务在排序中的位置可能变化，
+            重新获取视口内的任务；否则只原地更新这一行
+        """
+        if self.current_category is not None and getattr(before, self.sort_key) != getattr(after, self.sort_key):
+            self.task_list.refresh()
+        else:
+            self.task_list.update_row(task_id, values)
+    
+    def tasks_bulk_changed(self, task_ids, fields):
+        """
+        通知智能列表任务已被批量修改
+        
+        参数:
+            task_ids: 被修改的任务ID列表
+            fields: 被修改的TaskRow字段的集合，为None时表示任务被删除或无法确定修改了哪些字段
+        """
+        if self.smart_cache is None:
+            return
+        if fields is None:
+            self.smart_cache.invalidate()
+        else:
+            self.smart_cache.fields_changed(task_ids, fields)
+    
+    def format_task(self, task):
+        """
+        格式化任务的显示列
+        
+        参数:
+            task: Task对象或TaskRow元组，两者的属性名相同
+            
+        返回:
+            包含任务ID、标题、优先级、状态、截止日期和创建日期的元组
+        """
+        return self.format_row(
+            task.id, task.title, task.priority, task.completed, task.due_date, task.created_at
+        )
+    
+    def format_row(self, task_id, title, priority, completed, due_date=None, created_at=None):
+        """
+        格式化任务列表中的一行
+        
+        参数:
+            task_id: 任务ID
+            title: 标题列显示的文本
+            priority: 优先级("low"、"medium"或"high")
+            completed: 是否已完成
+            due_date: 截止日期，可以为None
+            created_at: 创建日期，可以为None
+            
+        返回:
+            包含任务ID、标题、优先级、状态、截止日期和创建日期的元组
+        """
+        # 格式化状态
+        # 如果任务已完成，显示"已完成"，否则显示"进行中"
+        status = "已完成" if completed else "进行中"
+        
+        # 格式化优先级
+        # 将英文优先级转换为中文显示
+        priority_text = "低" if priority == "low" else "中" if priority == "medium" else "高"
+        
+        # 格式化日期，没有日期时显示为空
+        due_text = due_date.isoformat() if due_date else ""
+        created_text = created_at.isoformat() if created_at else ""
+        
+        return (task_id, title, priority_text, status, due_text, created_text)
+    
+    def sort_by(self, column):
+        """
+        按列排序任务列表
+        
+        参数:
+            column: 列名，SORT_COLUMNS中的一项
+            
+        作用:
+            点击当前排序列时切换升序/降序，点击其他列时按该列升序排序。
+            排序由数据库的ORDER BY完成，每个排序键都有对应的索引，只重新获取第一屏的任务
+        """
+        if column == self.sort_key:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_key = column
+            self.sort_descending = False
+        self.update_sort_headings()
+        config_store.set("task_sort", {"key": self.sort_key, "descending": self.sort_descending})
+        # 搜索结果按相关度排序，只重新加载分类的任务
+        if self.current_category:
+            self.load_tasks()
+    
+    def update_sort_headings(self):
+        """
+        在当前排序列的标题上显示排序方向
+        """
+        for column, text in SORT_COLUMNS.items():
+            if column == self.sort_key:
+                text += " ▼" if self.sort_descending else " ▲"
+            self.task_list.tree.heading(column, text=text)
+    
+    def search(self):
+        """
+        在所有分类中搜索任务
+        
+        作用:
+            使用全文索引在后台搜索任务标题和描述，
+            按相关度把结果显示在任务列表中，匹配的内容用【】标出
+        """
+        query = self.search_var.get().strip()
+        # 搜索文本为空时清除搜索
+        if not query:
+            self.clear_search()
+            return
+        
+        # 搜索结果跨越所有分类，因此取消当前分类和视图的选择
+        self.current_category = None
+        self.current_view = None
+        self.category_list.selection_remove(*self.category_list.selection())
+        # 更新任务列表标题
+        self.task_header.config(text=f"搜索结果 - {query}")
+        
+        # 搜索结果的数量有上限，查询一次后保存在内存中供任务列表分页读取
+        results = []
+        # 记录从提交搜索到返回结果的耗时
+        timer = perf.timer("search")
+        
+        def count_results(callback):
+            """在后台执行搜索，完成后返回结果数量"""
+            def done(rows):
+                timer.stop()
+                results[:] = [(row[0], self.format_search_result(row)) for row in rows]
+                callback(len(results))
+                self.show_status(f"找到 {len(results)} 个任务")
+            
+            def run(service):
+                # 全文搜索是文本SQL，不会自动刷新，先刷新延迟写入模式下尚未刷新的修改
+                service.db.flush()
+                return service.search(query)
+            
+            self.run_db(run, done, deferred=True)
+        
+        def fetch_results(offset, limit, callback, after=None, before=None):
+            """从已保存的搜索结果中读取一页，结果在内存中，不需要锚点"""
+            callback(results[offset:offset + limit])
+        
+        # 设置任务列表的数据源
+        self.task_list.set_source(count_results, fetch_results)
+    
+    def format_search_result(self, row):
+        """
+        格式化一条搜索结果
+        
+        参数:
+            row: search_tasks返回的一项
+            
+        返回:
+            任务列表中一行的列值，标题列包含高亮后的标题、分类名称和描述摘要
+        """
+        task_id, title, snippet, priority, completed, category_name = row
+        text = f"{title}  [{category_name or '无分类'}]"
+        if snippet:
+            text += f"  {snippet}"
+        return self.format_row(task_id, text, priority, completed)
+    
+    def clear_search(self):
+        """
+        清除搜索
+        
+        作用:
+            清空搜索框和搜索结果
+        """
+        self.search_var.set("")
+        # 如果正在显示搜索结果，清空任务列表
+        if self.current_category is None and self.current_view is None:
+            self.task_list.clear()
+            self.task_header.config(text="任务")
     
     def category_selected(self, event):
         """
@@ -318,13 +1042,17 @@ class MainWindow:
             
         # 获取选中项的第一个（通常只有一个）
         item = selected_items[0]
+        # 选中的是智能列表
+        if item.startswith("view-"):
+            self.show_smart_list(item[len("view-"):])
+            return
         # 从选中项的values中获取分类ID
         category_id = self.category_list.item(item, "values")[0]
-        # 从选中项的text中获取分类名称
-        category_name = self.category_list.item(item, "text")
+        # 获取分类名称（分类项的文本中还包含计数）
+        category_name = self.category_names[int(category_id)]
         
         # 更新当前选中的分类ID
-        self.current_category = category_id
+        self.current_category = int(category_id)
         # 更新任务列表标题，显示当前分类名称
         self.task_header.config(text=f"任务 - {category_name}")
         # 加载该分类下的所有任务
@@ -338,30 +1066,25 @@ class MainWindow:
         保存最后选择的分类ID
         
         作用:
-            将当前选中的分类ID保存到配置文件中，
-            以便下次启动应用程序时可以恢复选择
+            将当前选中的分类ID保存到配置中，以便下次启动应用程序时可以恢复选择。
+            只修改内存中的配置，文件在停止切换分类一段时间后由后台定时器写入，
+            用方向键快速浏览分类时不会同步读写文件
         """
         # 如果有选中的分类
         if self.current_category:
-            # 加载当前配置
-            config = load_config()
             # 更新配置中的last_category_id
-            config['last_category_id'] = self.current_category
-            # 保存配置到文件
-            save_config(config)
+            config_store.set('last_category_id', self.current_category)
     
     def restore_last_category(self):
         """
         恢复上次选择的分类
         
         作用:
-            从配置文件中读取上次选择的分类ID，
+            从配置中读取上次选择的分类ID，
             如果存在，则自动选择该分类
         """
-        # 加载配置
-        config = load_config()
         # 获取上次选择的分类ID
-        last_category_id = config.get('last_category_id')
+        last_category_id = config_store.get('last_category_id')
         
         # 如果存在上次选择的分类ID
         if last_category_id:
@@ -380,25 +1103,42 @@ class MainWindow:
                     
                     # 手动触发选择事件
                     # 更新当前选中的分类ID
-                    self.current_category = last_category_id
+                    self.current_category = int(last_category_id)
                     # 获取分类名称
-                    category_name = self.category_list.item(item, "text")
+                    category_name = self.category_names[self.current_category]
                     # 更新任务列表标题
                     self.task_header.config(text=f"任务 - {category_name}")
                     # 加载该分类下的所有任务
                     self.load_tasks()
                     break
     
+    def show_perf_panel(self):
+        """
+        打开性能调试面板
+        
+        作用:
+            显示各个操作和SQL语句的耗时统计，面板已经打开时把它显示到最前面
+        """
+        if self.perf_panel is not None and self.perf_panel.is_open():
+            self.perf_panel.lift()
+            return
+        from views.perf_panel import PerfPanel
+        self.perf_panel = PerfPanel(self.root, perf)
+    
     def on_closing(self):
         """
         窗口关闭时的处理
         
         作用:
             当用户关闭应用程序窗口时，保存当前选择的分类，
-            然后销毁窗口
+            等待后台数据库操作完成，然后销毁窗口
         """
-        # 保存当前选择的分类
+        # 保存当前选择的分类，并立即写入尚未保存的配置
         self.save_last_category()
+        config_store.flush()
+        # 停止后台工作线程，已提交的操作会先执行完
+        if self.worker:
+            self.worker.stop()
         # 关闭窗口
         self.root.destroy()
     
@@ -408,28 +1148,32 @@ class MainWindow:
         
         作用:
             打开分类对话框，让用户输入新分类的信息，
-            然后将新分类添加到数据库并更新界面
+            然后在后台将新分类添加到数据库并更新界面
         """
-        # 创建分类对话框
+        # 创建分类对话框，第一次打开时才导入对话框模块
+        from views.category_dialog import CategoryDialog
         dialog = CategoryDialog(self.root)
         # 如果用户点击了保存按钮（对话框返回结果）
         if dialog.result:
             # 解包对话框返回的结果
             name, icon, color = dialog.result
             
-            # 获取数据库会话
-            db = get_db()
-            # 创建新的分类对象
-            new_category = Category(name=name, icon=icon, color=color)
-            # 将新分类添加到数据库
-            db.add(new_category)
-            # 提交事务
-            db.commit()
-            
-            # 重新加载分类列表
-            self.load_categories()
-            # 在状态栏显示成功消息
-            self.show_status(f"分类 '{name}' 已添加")
+            def create(service):
+                """在工作单元中添加分类并返回分类ID，结束时自动提交事务"""
+                return service.create_category(name, icon, color)
+            
+            def done(category_id):
+                """添加完成后在分类列表末尾插入新分类并显示成功消息"""
+                # 新分类还没有任务，计数为0
+                self.category_names[category_id] = name
+                self.category_counts[category_id] = [0, 0]
+                self.category_list.insert(
+                    "", tk.END, iid=f"category-{category_id}",
+                    text=self.format_category(category_id), values=(category_id,)
+                )
+                self.show_status(f"分类 '{name}' 已添加")
+            
+            self.run_db(create, done)
     
     def edit_category(self):
         """
@@ -437,43 +1181,51 @@ class MainWindow:
         
         作用:
             获取当前选中的分类，打开分类对话框让用户编辑信息，
-            然后更新数据库中的分类并刷新界面
+            然后在后台更新数据库中的分类并刷新界面
         """
         # 获取当前选中的项
         selected_items = self.category_list.selection()
-        # 如果没有选中项，显示错误消息并返回
-        if not selected_items:
+        # 如果没有选中项或选中的是智能列表，显示错误消息并返回
+        if not selected_items or not selected_items[0].startswith("category-"):
             self.show_status("未选择分类")
             return
             
         # 获取选中项的第一个
         item = selected_items[0]
         # 从选中项的values中获取分类ID
-        category_id = self.category_list.item(item, "values")[0]
-        
-        # 获取数据库会话
-        db = get_db()
-        # 查询选中的分类
-        category = db.query(Category).filter(Category.id == category_id).first()
-        
-        # 创建分类对话框，传入当前分类对象
-        dialog = CategoryDialog(self.root, category)
-        # 如果用户点击了保存按钮
-        if dialog.result:
+        category_id = int(self.category_list.item(item, "values")[0])
+        
+        def load(service):
+            """查询选中的分类，如果已在标识映射中则不会再次查询数据库"""
+            return snapshot(service.get_category(category_id))
+        
+        def open_dialog(category):
+            """用查询到的分类打开对话框"""
+            # 创建分类对话框，传入当前分类的快照
+            from views.category_dialog import CategoryDialog
+            dialog = CategoryDialog(self.root, category)
+            # 如果用户点击了保存按钮
+            if not dialog.result:
+                return
             # 解包对话框返回的结果
             name, icon, color = dialog.result
             
-            # 更新分类信息
-            category.name = name
-            category.icon = icon
-            category.color = color
-            # 提交事务
-            db.commit()
+            def update(service):
+                """更新分类信息，工作单元结束时自动提交事务"""
+                service.update_category(category_id, name, icon, color)
             
-            # 重新加载分类列表
-            self.load_categories()
-            # 在状态栏显示成功消息
-            self.show_status(f"分类 '{name}' 已更新")
+            def done(result):
+                """更新完成后只修改这一个分类项并显示成功消息"""
+                self.category_names[category_id] = name
+                self.category_list.item(f"category-{category_id}", text=self.format_category(category_id))
+                # 如果正在显示该分类的任务，同时更新任务列表标题
+                if self.current_category == category_id:
+                    self.task_header.config(text=f"任务 - {name}")
+                self.show_status(f"分类 '{name}' 已更新")
+            
+            self.run_db(update, done)
+        
+        self.run_db(load, open_dialog)
     
     def delete_category(self):
         """
@@ -481,47 +1233,56 @@ class MainWindow:
         
         作用:
             获取当前选中的分类，询问用户是否确认删除，
-            如果确认，则从数据库中删除该分类及其所有任务，并更新界面
+            如果确认，则在后台从数据库中删除该分类及其所有任务，并更新界面
         """
         # 获取当前选中的项
         selected_items = self.category_list.selection()
-        # 如果没有选中项，显示错误消息并返回
-        if not selected_items:
+        # 如果没有选中项或选中的是智能列表，显示错误消息并返回
+        if not selected_items or not selected_items[0].startswith("category-"):
             self.show_status("未选择分类")
             return
             
         # 获取选中项的第一个
         item = selected_items[0]
         # 从选中项的values中获取分类ID
-        category_id = self.category_list.item(item, "values")[0]
-        # 从选中项的text中获取分类名称
-        category_name = self.category_list.item(item, "text")
+        category_id = int(self.category_list.item(item, "values")[0])
+        # 获取分类名称
+        category_name = self.category_names[category_id]
         
         # 确认删除
         # 显示确认对话框，询问用户是否确认删除
         if not messagebox.askyesno("确认删除", f"删除分类 '{category_name}' 及其所有任务?"):
             return
         
-        # 获取数据库会话
-        db = get_db()
-        # 删除选中的分类（级联删除会自动删除属于该分类的所有任务）
-        db.query(Category).filter(Category.id == category_id).delete()
-        # 提交事务
-        db.commit()
-        
-        # 重新加载分类列表
-        self.load_categories()
-        # 清除当前选中的分类
-        self.current_category = None
-        
-        # 清除任务列表
-        for item in self.task_list.get_children():
-            self.task_list.delete(item)
+        def delete(service):
+            """在一个事务中删除分类及其所有任务"""
+            service.delete_category(category_id)
+        
+        def done(result):
+            """删除完成后更新界面"""
+            # 只从分类列表中删除这一项，以及它的名称和计数
+            self.category_list.delete(f"category-{category_id}")
+            self.category_names.pop(category_id, None)
+            self.category_counts.pop(category_id, None)
+            # 分类中的任务也被删除了，所有智能列表的缓存都失效
+            self.tasks_bulk_changed((), None)
+            if self.current_view:
+                self.task_list.refresh()
             
-        # 重置任务列表标题
-        self.task_header.config(text="任务")
-        # 在状态栏显示成功消息
-        self.show_status(f"分类 '{category_name}' 已删除")
+            # 如果删除的是当前选中的分类，清除任务列表
+            if self.current_category == category_id:
+                # 清除当前选中的分类
+                self.current_category = None
+                
+                # 清除任务列表
+                self.task_list.clear()
+                    
+                # 重置任务列表标题
+                self.task_header.config(text="任务")
+            # 在状态栏显示成功消息
+            self.show_status(f"分类 '{category_name}' 已删除")
+        
+        self.run_db(delete, done)
     
     def add_task(self):
         """
@@ -529,38 +1290,48 @@ class MainWindow:
         
         作用:
             检查是否选择了分类，然后打开任务对话框让用户输入新任务的信息，
-            将新任务添加到数据库并更新界面
+            在后台将新任务添加到数据库并更新界面
         """
         # 如果没有选择分类，显示错误消息并返回
         if not self.current_category:
             self.show_status("请先选择一个分类")
             return
             
-        # 创建任务对话框
+        # 记录打开对话框的耗时，对话框显示后的第一个空闲时刻结束计时
+        timer = perf.timer("open_task_dialog")
+        self.root.after_idle(timer.stop)
+        # 创建任务对话框，第一次打开时才导入对话框模块
+        from views.task_dialog import TaskDialog
         dialog = TaskDialog(self.root)
         # 如果用户点击了保存按钮
         if dialog.result:
-            # 解包对话框返回的结果，忽略截止日期（使用None）
-            title, description, priority, _ = dialog.result  # 忽略截止日期
-            
-            # 获取数据库会话
-            db = get_db()
-            # 创建新的任务对象
-            new_task = Task(
-                title=title,
-                description=description,
-                priority=priority,
-                category_id=self.current_category
-            )
-            # 将新任务添加到数据库
-            db.add(new_task)
-            # 提交事务
-            db.commit()
+            # 解包对话框返回的结果
+            title, description, priority, due_date = dialog.result
+            category_id = self.current_category
             
-            # 重新加载任务列表
-            self.load_tasks()
-            # 在状态栏显示成功消息
-            self.show_status(f"任务 '{title}' 已添加")
+            def create(service):
+                """在工作单元中添加任务，结束时自动提交事务"""
+                from models.models import task_row
+                new_task = service.create_task(title, description, priority, category_id, due_date)
+                return new_task.id, self.format_task(new_task), task_row(new_task)
+            
+            def done(result):
+                """添加完成后更新界面"""
+                task_id, values, row = result
+                # 如果用户还停留在同一个分类，只在任务列表末尾追加新任务，不重新加载整个列表
+                if self.current_category == category_id:
+                    # 只有按ID升序时新任务才位于末尾，其他排序下重新获取视口内的任务
+                    if self.sort_key == "id" and not self.sort_descending:
+                        self.task_list.append_row(task_id, values)
+                    else:
+                        self.task_list.refresh()
+                # 新任务是未完成的，两个计数都加一
+                self.update_category_count(category_id, 1, 1)
+                self.tasks_changed([(None, row)])
+                # 在状态栏显示成功消息
+                self.show_status(f"任务 '{title}' 已添加")
+            
+            self.run_db(create, done)
     
     def edit_task(self):
         """
@@ -568,7 +1339,7 @@ class MainWindow:
         
         作用:
             获取当前选中的任务，打开任务对话框让用户编辑信息，
-            然后更新数据库中的任务并刷新界面
+            然后在后台更新数据库中的任务并刷新界面
         """
         # 获取当前选中的项
         selected_items = self.task_list.selection()
@@ -577,42 +1348,49 @@ class MainWindow:
             self.show_status("未选择任务")
             return
             
-        # 获取选中项的第一个
-        item = selected_items[0]
-        # 从选中项的values中获取任务ID
-        task_id = self.task_list.item(item, "values")[0]
-        
-        # 获取数据库会话
-        db = get_db()
-        # 查询选中的任务
-        task = db.query(Task).filter(Task.id == task_id).first()
-        
-        # 创建任务对话框，传入当前任务对象
-        dialog = TaskDialog(self.root, task)
-        # 如果用户点击了保存按钮
-        if dialog.result:
-            # 解包对话框返回的结果，忽略截止日期
-            title, description, priority, _ = dialog.result  # 忽略截止日期
+        # 获取选中项的第一个（任务列表的选择直接是任务ID）
+        task_id = selected_items[0]
+        # 记录从读取任务到对话框显示的耗时
+        timer = perf.timer("open_task_dialog")
+        
+        def load(service):
+            """查询选中的任务，描述是延迟加载的，在创建快照时才读取"""
+            return snapshot(service.require_task(task_id))
+        
+        def open_dialog(task):
+            """用查询到的任务打开对话框"""
+            # 对话框显示后的第一个空闲时刻结束计时
+            self.root.after_idle(timer.stop)
+            # 创建任务对话框，传入当前任务的快照
+            from views.task_dialog import TaskDialog
+            dialog = TaskDialog(self.root, task)
+            # 如果用户点击了保存按钮
+            if not dialog.result:
+                return
+            # 解包对话框返回的结果
+            title, description, priority, due_date = dialog.result
             
-            # 更新任务信息
-            task.title = title
-            task.description = description
-            task.priority = priority
-            # 提交事务
-            db.commit()
+            def done(result):
+                """更新完成后原地更新这一行，排序位置变化时重新获取视口内的任务"""
+                before, after = result
+                self.update_task_row(task_id, self.format_task(after), before, after)
+                # 修改优先级或截止日期后任务可能加入或离开智能列表
+                self.tasks_changed([(before, after)])
+                # 在状态栏显示成功消息
+                self.show_status(f"任务 '{title}' 已更新")
             
-            # 重新加载任务列表
-            self.load_tasks()
-            # 在状态栏显示成功消息
-            self.show_status(f"任务 '{title}' 已更新")
+            fields = dict(title=title, description=description, priority=priority, due_date=due_date)
+            self.run_write(task_id, "update", done, fields)
+        
+        self.run_db(load, open_dialog, deferred=True, errback=self.on_task_error)
     
     def toggle_task_completion(self):
         """
         切换选定任务的完成状态
         
         作用:
-            获取当前选中的任务，切换其完成状态（完成/未完成），
-            然后更新数据库并刷新界面
+            获取当前选中的任务，在后台切换其完成状态（完成/未完成），
+            然后更新界面
         """
         # 获取当前选中的项
         selected_items = self.task_list.selection()
@@ -621,26 +1399,27 @@ class MainWindow:
             self.show_status("未选择任务")
             return
             
-        # 获取选中项的第一个
-        item = selected_items[0]
-        # 从选中项的values中获取任务ID
-        task_id = self.task_list.item(item, "values")[0]
-        
-        # 获取数据库会话
-        db = get_db()
-        # 查询选中的任务
-        task = db.query(Task).filter(Task.id == task_id).first()
-        # 切换完成状态
-        task.completed = not task.completed
-        # 提交事务
-        db.commit()
-        
-        # 重新加载任务列表
-        self.load_tasks()
-        # 根据新的完成状态设置状态消息
-        status = "已完成" if task.completed else "标记为未完成"
-        # 在状态栏显示成功消息
-        self.show_status(f"任务 '{task.title}' {status}")
+        # 选中多个任务时作为批量操作执行
+        if len(selected_items) > 1:
+            self.bulk_toggle(selected_items)
+            return
+            
+        # 获取选中项的第一个（任务列表的选择直接是任务ID）
+        task_id = selected_items[0]
+        
+        def done(result):
+            """切换完成后更新这一行和所属分类的计数，按完成状态排序时重新获取视口内的任务"""
+            before, after = result
+            self.update_task_row(task_id, self.format_task(after), before, after)
+            self.update_category_count(after.category_id, -1 if after.completed else 1, 0)
+            # 完成的任务离开未完成的智能列表，加入"最近完成"
+            self.tasks_changed([(before, after)])
+            # 根据新的完成状态设置状态消息
+            status = "已完成" if after.completed else "标记为未完成"
+            # 在状态栏显示成功消息
+            self.show_status(f"任务 '{after.title}' {status}")
+        
+        self.run_write(task_id, "toggle", done)
     
     def delete_task(self):
         """
@@ -648,7 +1427,7 @@ class MainWindow:
         
         作用:
             获取当前选中的任务，询问用户是否确认删除，
-            如果确认，则从数据库中删除该任务并更新界面
+            如果确认，则在后台从数据库中删除该任务并更新界面
         """
         # 获取当前选中的项
         selected_items = self.task_list.selection()
@@ -657,29 +1436,336 @@ class MainWindow:
             self.show_status("未选择任务")
             return
             
-        # 获取选中项的第一个
-        item = selected_items[0]
-        # 从选中项的values中获取任务ID
-        task_id = self.task_list.item(item, "values")[0]
+        # 选中多个任务时作为批量删除执行
+        if len(selected_items) > 1:
+            self.bulk_delete()
+            return
+            
+        # 获取选中项的第一个（任务列表的选择直接是任务ID）
+        task_id = selected_items[0]
+        
+        def load(service):
+            """查询选中任务的标题，用于确认和显示消息"""
+            return service.require_task(task_id).title
+        
+        def confirm(task_title):
+            """确认后在后台删除任务"""
+            # 显示确认对话框，询问用户是否确认删除
+            if not messagebox.askyesno("确认删除", f"删除任务 '{task_title}'?"):
+                return
+            
+            def done(result):
+                """删除完成后只从任务列表中移除这一行"""
+                row, _ = result
+                self.task_list.remove_row(task_id)
+                # 更新所属分类的计数
+                self.update_category_count(row.category_id, 0 if row.completed else -1, -1)
+                self.tasks_changed([(row, None)])
+                # 在状态栏显示成功消息
+                self.show_status(f"任务 '{task_title}' 已删除")
+            
+            self.run_write(task_id, "delete", done)
         
-        # 获取数据库会话
-        db = get_db()
-        # 查询选中的任务
-        task = db.query(Task).filter(Task.id == task_id).first()
-        # 保存任务标题，用于显示消息
-        task_title = task.title
+        self.run_db(load, confirm, deferred=True, errback=self.on_task_error)
+    
+    def run_bulk(self, operation, message, task_ids=None, fields=None):
+        """
+        对选中的任务执行批量操作
         
-        # 确认删除
+        参数:
+            operation: 在工作线程中执行的函数operation(service, task_ids)，返回分类计数的变化列表
+            message: 操作完成后显示的消息，{count}会被替换为任务数量
+            task_ids: 要操作的任务ID列表，为None时使用当前选中的任务
+            fields: 操作修改的TaskRow字段，用于让受影响的智能列表缓存失效，为None时表示删除
+            
+        作用:
+            所有任务在一个事务中用集合语句处理，完成后更新分类计数并只刷新一次任务列表
+        """
+        if task_ids is None:
+            task_ids = self.task_list.selection()
+        # 如果没有选中项，显示错误消息并返回
+        if not task_ids:
+            self.show_status("未选择任务")
+            return
+        
+        def done(changes):
+            """批量操作完成后更新分类计数并刷新任务列表"""
+            for category_id, open_delta, total_delta in changes:
+                self.update_category_count(category_id, open_delta, total_delta)
+            self.tasks_bulk_changed(task_ids, fields)
+            self.task_list.refresh()
+            self.show_status(message.format(count=len(task_ids)))
+        
+        self.run_db(lambda service: operation(service, task_ids), done)
+    
+    def bulk_set_completed(self, completed):
+        """
+        把选中的任务批量标记为已完成或未完成
+        
+        参数:
+            completed: 新的完成状态
+        """
+        message = "{count} 个任务已完成" if completed else "{count} 个任务标记为未完成"
+        self.run_bulk(
+            lambda service, task_ids: service.set_completed(task_ids, completed), message,
+            fields={"completed", "completed_at"},
+        )
+    
+    def bulk_toggle(self, task_ids):
+        """
+        批量切换完成状态
+        
+        参数:
+            task_ids: 任务ID列表
+            
+        作用:
+            如果所有任务都已完成，则全部标记为未完成，否则全部标记为已完成
+        """
+        self.run_bulk(
+            lambda service, task_ids: service.toggle_tasks(task_ids), "{count} 个任务已切换完成状态", task_ids,
+            fields={"completed", "completed_at"},
+        )
+    
+    def bulk_set_priority(self, priority):
+        """
+        批量设置选中任务的优先级
+        
+        参数:
+            priority: 新的优先级("low"、"medium"或"high")
+        """
+        self.run_bulk(
+            lambda service, task_ids: service.set_priority(task_ids, priority), "{count} 个任务的优先级已更新",
+            fields={"priority"},
+        )
+    
+    def build_move_menu(self):
+        """
+        生成"移动到分类"子菜单
+        
+        作用:
+            每次打开子菜单时，根据当前的分类列表重新生成菜单项
+        """
+        self.bulk_move_menu.delete(0, tk.END)
+        for category_id, name in self.category_names.items():
+            self.bulk_move_menu.add_command(
+                label=name, command=lambda category_id=category_id: self.bulk_move(category_id)
+            )
+    
+    def bulk_move(self, category_id):
+        """
+        把选中的任务批量移动到另一个分类
+        
+        参数:
+            category_id: 目标分类ID
+        """
+        name = self.category_names[category_id]
+        self.run_bulk(
+            lambda service, task_ids: service.move_tasks(task_ids, category_id),
+            f"{{count}} 个任务已移动到 '{name}'",
+            fields={"category_id"},
+        )
+        # 移走的任务不再属于当前列表，取消选择
+        self.task_list.clear_selection()
+    
+    def bulk_delete(self):
+        """
+        批量删除选中的任务
+        
+        作用:
+            确认后在一个事务中删除所有选中的任务
+        """
+        task_ids = self.task_list.selection()
+        # 如果没有选中项，显示错误消息并返回
+        if not task_ids:
+            self.show_status("未选择任务")
+            return
         # 显示确认对话框，询问用户是否确认删除
-        if not messagebox.askyesno("确认删除", f"删除任务 '{task_title}'?"):
+        if not messagebox.askyesno("确认删除", f"删除选中的 {len(task_ids)} 个任务?"):
+            return
+        self.run_bulk(lambda service, task_ids: service.delete_tasks(task_ids), "{count} 个任务已删除", task_ids)
+        # 删除的任务不再存在，取消选择
+        self.task_list.clear_selection()
+    
+    def import_tasks(self):
+        """
+        从CSV或JSON Lines文件导入任务
+        
+        作用:
+            在后台逐条读取文件并分批插入数据库，状态栏显示导入进度，
+            完成后重新加载分类列表和当前的任务列表
+        """
+        path = filedialog.askopenfilename(
+            title="导入任务",
+            filetypes=[("JSON Lines", "*.jsonl"), ("CSV", "*.csv"), ("所有文件", "*.*")],
+        )
+        if not path:
             return
         
-        # 删除任务
-        db.delete(task)
-        # 提交事务
-        db.commit()
+        def progress(count):
+            """在状态栏显示已导入的任务数"""
+            self.status_bar.config(text=f"正在导入... 已导入 {count:,} 个任务")
         
-        # 重新加载任务列表
-        self.load_tasks()
-        # 在状态栏显示成功消息
-        self.show_status(f"任务 '{task_title}' 已删除") 
\ No newline at end of file
+        def run(service):
+            """在工作线程中导入，通过notify把进度发回界面线程"""
+            return service.import_file(path, progress=lambda count: self.worker.notify(progress, count))
+        
+        def done(count):
+            """导入完成后刷新分类计数和任务列表"""
+            self.tasks_changed_externally()
+            self.show_status(f"已导入 {count:,} 个任务")
+        
+        self.run_db(run, done)
+    
+    def archive_tasks(self):
+        """
+        归档很久以前完成的任务
+        
+        作用:
+            询问归档的天数(保存在配置项archive_days中)，然后在后台分批把完成时间更早的任务
+            移动到归档表，每个批次单独提交，状态栏显示进度。完成后重新加载分类计数和当前的任务列表
+        """
+        from tkinter import simpledialog
+        # 工作线程已经导入了数据库模块，这里导入不会在界面线程中加载SQLAlchemy
+        from models.archive import DEFAULT_ARCHIVE_DAYS
+        days = simpledialog.askinteger(
+            "归档已完成任务", "归档完成超过多少天的任务:",
+            initialvalue=config_store.get("archive_days", DEFAULT_ARCHIVE_DAYS), minvalue=0, parent=self.root,
+        )
+        if days is None:
+            return
+        config_store.set("archive_days", days)
+        
+        def progress(count):
+            """在状态栏显示已归档的任务数"""
+            self.status_bar.config(text=f"正在归档... 已归档 {count:,} 个任务")
+        
+        def run(service):
+            """在工作线程中归档，通过notify把进度发回界面线程"""
+            return service.archive_completed(days, progress=lambda count: self.worker.notify(progress, count))
+        
+        def done(count):
+            """归档完成后刷新分类计数和任务列表"""
+            self.tasks_changed_externally()
+            self.show_status(f"已归档 {count:,} 个任务")
+        
+        self.run_db(run, done)
+    
+    def show_archive(self):
+        """
+        打开归档任务窗口
+        
+        作用:
+            窗口已经打开时把它显示到最前面
+        """
+        if self.archive_window is not None and self.archive_window.is_open():
+            self.archive_window.lift()
+            return
+        
+        def restored(count):
+            """恢复任务后刷新分类计数和任务列表"""
+            self.tasks_changed_externally()
+            self.show_status(f"已恢复 {count:,} 个任务")
+        
+        from views.archive_window import ArchiveWindow
+        self.archive_window = ArchiveWindow(
+            self.root, self.run_db, self.format_task, self.format_search_result, restored
+        )
+    
+    def ask_sync_url(self):
+        """
+        询问同步服务器的地址
+        
+        返回:
+            输入的地址，取消时返回None。地址保存在配置项sync_url中
+        """
+        from tkinter import simpledialog
+        url = simpledialog.askstring(
+            "同步服务器", "同步服务器的地址:",
+            initialvalue=config_store.get("sync_url", "http://127.0.0.1:8765"), parent=self.root,
+        )
+        if url is None or not url.strip():
+            return None
+        url = url.strip()
+        config_store.set("sync_url", url)
+        return url
+    
+    def sync_now(self):
+        """
+        与同步服务器进行一次增量同步
+        
+        作用:
+            第一次同步时询问服务器地址。同步在后台工作线程中执行，完成后在状态栏显示上传和下载的修改数
+            以及传输的数据量。同步的修改由工作线程的连接写入，修改检测不会报告它们，
+            因此完成或失败后(失败前已下载的批次已经提交)都重新加载分类计数和任务列表
+        """
+        url = config_store.get("sync_url") or self.ask_sync_url()
+        if not url:
+            return
+        self.status_bar.config(text="正在同步...")
+        
+        def done(stats):
+            """同步完成后刷新界面并显示统计"""
+            self.synced_externally()
+            self.show_status(
+                f"同步完成: 上传 {stats['pushed']:,} 个修改，下载 {stats['pulled']:,} 个修改"
+                f"(发送 {stats['sent'] / 1024:.1f} KB，接收 {stats['received'] / 1024:.1f} KB)"
+            )
+        
+        def failed(error):
+            """同步失败时提示错误，并刷新界面显示已经应用的修改"""
+            self.synced_externally()
+            self.show_status("同步失败")
+            messagebox.showerror("同步失败", str(error))
+        
+        self.run_db(lambda service: service.sync(url), done, errback=failed)
+    
+    def synced_externally(self):
+        """
+        同步之后重新加载界面
+        
+        作用:
+            下载的修改可能删除或修改任何分类和任务，与修改太多时的修改检测一样重新加载分类列表，
+            当前分类已被删除时清空任务列表
+        """
+        self.tasks_bulk_changed((), None)
+        self.load_categories(callback=self.categories_changed_externally)
+    
+    def tasks_changed_externally(self):
+        """
+        在无法确定哪些任务被修改时刷新界面
+        
+        作用:
+            让所有智能列表的缓存失效，重新加载分类列表和计数，之后恢复当前显示的列表；
+            当前分类已被删除时清空任务列表
+        """
+        self.tasks_bulk_changed((), None)
+        self.load_categories(callback=self.categories_changed_externally)
+    
+    def export_tasks(self):
+        """
+        把所有分类和任务导出到CSV或JSON Lines文件
+        
+        作用:
+            在后台逐条查询并写入文件，状态栏显示导出进度
+        """
+        path = filedialog.asksaveasfilename(
+            title="导出任务",
+            defaultextension=".jsonl",
+            filetypes=[("JSON Lines", "*.jsonl"), ("CSV", "*.csv")],
+        )
+        if not path:
+            return
+        
+        def progress(count):
+            """在状态栏显示已导出的记录数"""
+            self.status_bar.config(text=f"正在导出... 已导出 {count:,} 条记录")
+        
+        def run(service):
+            """在工作线程中导出，通过notify把进度发回界面线程"""
+            return service.export_file(path, progress=lambda count: self.worker.notify(progress, count))
+        
+        def done(count):
+            """导出完成后显示消息"""
+            self.show_status(f"已导出 {count:,} 条记录到 {path}")
+        
+        self.run_db(run, done)
@@ -0,0 +1,142 @@
+import tkinter as tk  # 导入tkinter库，Python的标准GUI库
+from tkinter import ttk, filedialog, messagebox  # 导入ttk模块、文件选择对话框和消息对话框
+
+# 面板打开时自动刷新的间隔(毫秒)
+REFRESH_INTERVAL = 1000
+# 显示的最慢SQL语句数
+STATEMENT_LIMIT = 20
+
+class PerfPanel:
+    """
+    性能调试面板
+
+    显示每个操作最近耗时的p50/p95/最大值，以及最近执行过的最慢的SQL语句，
+    可以把数据导出为JSON文件附在性能问题报告中。
+    面板不是模态的，打开时每秒刷新一次，由主窗口的Ctrl+Shift+P打开
+    """
+    def __init__(self, parent, recorder):
+        """
+        创建并显示面板
+
+        参数:
+            parent: 父窗口
+            recorder: models.perf.PerfRecorder对象
+        """
+        self.recorder = recorder  # 保存计时记录器引用
+
+        # 创建面板窗口
+        self.window = tk.Toplevel(parent)
+        self.window.title("性能")
+        self.window.geometry("760x520")
+        self.window.transient(parent)
+
+        # 操作耗时表格
+        ttk.Label(self.window, text="操作耗时 (毫秒)", font=("TkDefaultFont", 10, "bold")).pack(
+            anchor=tk.W, padx=10, pady=(10, 0)
+        )
+        self.operation_tree = self.create_tree(
+            ("name", "count", "p50", "p95", "max"),
+            {"name": ("操作", 220), "count": ("次数", 80), "p50": ("p50", 90), "p95": ("p95", 90), "max": ("最大", 90)},
+            height=8,
+        )
+
+        # 最慢的SQL语句表格
+        ttk.Label(self.window, text="最慢的SQL语句 (毫秒)", font=("TkDefaultFont", 10, "bold")).pack(
+            anchor=tk.W, padx=10, pady=(10, 0)
+        )
+        self.statement_tree = self.create_tree(
+            ("max", "p50", "count", "statement"),
+            {"max": ("最大", 80), "p50": ("p50", 80), "count": ("次数", 60), "statement": ("语句", 520)},
+            height=10,
+        )
+
+        # 按钮
+        button_frame = ttk.Frame(self.window)
+        button_frame.pack(fill=tk.X, padx=10, pady=10)
+        ttk.Button(button_frame, text="导出JSON...", command=self.export).pack(side=tk.RIGHT, padx=2)
+        ttk.Button(button_frame, text="清空", command=self.clear).pack(side=tk.RIGHT, padx=2)
+        ttk.Button(button_frame, text="刷新", command=self.refresh).pack(side=tk.RIGHT, padx=2)
+
+        self._after_id = None  # 下一次自动刷新的定时器
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.refresh()
+
+    def create_tree(self, columns, headings, height):
+        """
+        创建一个表格
+
+        参数:
+            columns: 列名元组
+            headings: 字典{列名: (标题, 宽度)}
+            height: 显示的行数
+
+        返回:
+            Treeview对象
+        """
+        tree = ttk.Treeview(self.window, columns=columns, show="headings", height=height)
+        for column in columns:
+            text, width = headings[column]
+            # 数字列右对齐，文本列左对齐
+            anchor = tk.W if column in ("name", "statement") else tk.E
+            tree.heading(column, text=text)
+            tree.column(column, width=width, anchor=anchor, stretch=column == "statement")
+        tree.pack(fill=tk.BOTH, expand=True, padx=10)
+        return tree
+
+    def is_open(self):
+        """面板窗口是否仍然存在"""
+        return bool(self.window.winfo_exists())
+
+    def lift(self):
+        """把已打开的面板显示到最前面"""
+        self.window.deiconify()
+        self.window.lift()
+
+    def refresh(self):
+        """重新汇总计时数据并更新两个表格，然后安排下一次自动刷新"""
+        if self._after_id is not None:
+            self.window.after_cancel(self._after_id)
+
+        self.operation_tree.delete(*self.operation_tree.get_children())
+        for stats in self.recorder.operations():
+            self.operation_tree.insert("", tk.END, values=(
+                stats["name"], stats["count"],
+                f"{stats['p50_ms']:.2f}", f"{stats['p95_ms']:.2f}", f"{stats['max_ms']:.2f}",
+            ))
+
+        self.statement_tree.delete(*self.statement_tree.get_children())
+        for stats in self.recorder.slowest_statements(STATEMENT_LIMIT):
+            # 多行语句压缩为一行显示
+            statement = " ".join(stats["statement"].split())
+            self.statement_tree.insert("", tk.END, values=(
+                f"{stats['max_ms']:.2f}", f"{stats['p50_ms']:.2f}", stats["count"], statement,
+            ))
+
+        self._after_id = self.window.after(REFRESH_INTERVAL, self.refresh)
+
+    def clear(self):
+        """清空所有计时数据"""
+        self.recorder.clear()
+        self.refresh()
+
+    def export(self):
+        """把计时报告导出为JSON文件"""
+        path = filedialog.asksaveasfilename(
+            parent=self.window,
+            title="导出性能数据",
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json")],
+        )
+        if not path:
+            return
+        try:
+            self.recorder.dump(path)
+        except OSError as error:
+            messagebox.showerror("导出失败", str(error), parent=self.window)
+
+    def close(self):
+        """停止自动刷新并关闭面板"""
+        if self._after_id is not None:
+            self.window.after_cancel(self._after_id)
+            self._after_id = None
+        self.window.destroy()
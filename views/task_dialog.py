@@ -2,6 +2,8 @@ import tkinter as tk  # 导入tkinter库，Python的标准GUI库
 from tkinter import ttk, messagebox  # 导入ttk模块(提供主题化的小部件)和messagebox模块(用于显示消息对话框)
 import datetime  # 导入datetime模块，用于处理日期和时间
 
+from tkcalendar import DateEntry  # 导入日期选择框，点击时弹出日历
+
 from models import PriorityEnum  # 从models模块导入优先级枚举类
 
 class TaskDialog:
@@ -78,6 +80,19 @@ class TaskDialog:
         # 将优先级下拉框放置在网格的第2行第1列
         self.priority_combo.grid(row=2, column=1, sticky=tk.W, pady=5)
         
+        # 截止日期字段
+        # 复选框表示是否设置截止日期，未勾选时日期选择框不可用，保存时截止日期为None
+        self.has_due_var = tk.BooleanVar(value=False)
+        self.due_check = ttk.Checkbutton(
+            self.form_frame, text="截止日期:", variable=self.has_due_var, command=self.update_due_state
+        )
+        self.due_check.grid(row=3, column=0, sticky=tk.W, pady=5)
+        # 创建日期选择框，日期格式与数据库中保存的格式一致
+        self.due_entry = DateEntry(self.form_frame, width=12, date_pattern="yyyy-mm-dd")
+        # 将日期选择框放置在网格的第3行第1列
+        self.due_entry.grid(row=3, column=1, sticky=tk.W, pady=5)
+        self.update_due_state()
+        
         # 按钮
         # 创建一个Frame作为按钮容器
         self.button_frame = ttk.Frame(self.dialog)
@@ -129,6 +144,18 @@ class TaskDialog:
             elif self.task.priority == "high":
                 priority_index = 2
             self.priority_combo.current(priority_index)
+        
+        # 如果有截止日期，勾选复选框并设置日期
+        if self.task.due_date:
+            self.has_due_var.set(True)
+            self.due_entry.set_date(self.task.due_date)
+            self.update_due_state()
+    
+    def update_due_state(self):
+        """
+        根据复选框启用或禁用日期选择框
+        """
+        self.due_entry.config(state="normal" if self.has_due_var.get() else "disabled")
     
     def save(self):
         """
@@ -157,8 +184,11 @@ class TaskDialog:
         else:
             priority = "medium"
         
-        # 设置结果元组，包含标题、描述、优先级和None(截止日期)
-        self.result = (title, description, priority, None)
+        # 获取截止日期，未勾选复选框时为None
+        due_date = self.due_entry.get_date() if self.has_due_var.get() else None
+        
+        # 设置结果元组，包含标题、描述、优先级和截止日期
+        self.result = (title, description, priority, due_date)
         # 销毁对话框
         self.dialog.destroy()
     
@@ -0,0 +1,472 @@
+import tkinter as tk  # 导入tkinter库，Python的标准GUI库
+from tkinter import ttk  # 导入ttk模块，提供主题化的小部件
+
+# 每一行的高度(像素)，虚拟列表需要固定行高才能计算视口内可容纳的行数
+ROW_HEIGHT = 22
+# 视口上下额外缓存的行数，滚动时小范围移动不需要重新查询数据库
+BUFFER_ROWS = 50
+
+class VirtualTaskList:
+    """
+    虚拟化任务列表
+
+    只为视口内可见的行创建Treeview项，数据按需从数据源分页获取，
+    打开包含大量任务的分类时所需的时间与任务总数无关
+    """
+    def __init__(self, parent, columns, buffer_rows=BUFFER_ROWS):
+        """
+        初始化虚拟任务列表
+
+        参数:
+            parent: 父容器
+            columns: Treeview的列名元组
+            buffer_rows: 视口上下额外缓存的行数
+        """
+        self.buffer_rows = buffer_rows  # 缓冲行数
+
+        # 异步数据源
+        # count_fn(callback)：获取总行数后调用callback(total)
+        # fetch_fn(offset, limit, callback, after, before)：获取行后调用callback(rows)，rows是(任务ID, 列值)列表
+        self.count_fn = None
+        self.fetch_fn = None
+        # 数据源的版本号，切换数据源后旧数据源返回的结果会被丢弃
+        self._generation = 0
+        # 正在获取中的行范围，同一时间最多只有一个获取请求
+        self._pending_fetch = None
+
+        self.total = 0  # 数据源中的总行数
+        self.first = 0  # 视口第一行在数据源中的位置
+        self.visible_rows = 20  # 视口可容纳的行数，窗口大小变化时重新计算
+
+        # 已缓存的行，_rows[i]对应数据源中第_cache_start + i行
+        self._cache_start = 0
+        self._rows = []
+
+        # 选中的任务ID，使用字典保持选择顺序
+        # 选择状态按任务ID保存，滚动出视口的行依然保持选中
+        self._selected = {}
+
+        # 使用独立的样式固定行高
+        style = ttk.Style()
+        style.configure("Task.Treeview", rowheight=ROW_HEIGHT)
+
+        # 创建Treeview，只用于显示视口内的行
+        self.tree = ttk.Treeview(parent, columns=columns, show="headings", style="Task.Treeview")
+        self.tree.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
+
+        # 创建滚动条，滚动条的位置由虚拟列表自己计算，而不是由Treeview决定
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(fill=tk.Y, side=tk.RIGHT)
+
+        # 窗口大小变化时重新计算可见行数
+        self.tree.bind("<Configure>", self._on_configure)
+        # 记录用户的选择
+        self.tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        # 鼠标滚轮(Windows/macOS使用MouseWheel，Linux使用Button-4/5)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(3))
+        # 键盘导航需要越过视口边界，因此由虚拟列表自己处理
+        self.tree.bind("<Up>", lambda event: self._move_focus(-1))
+        self.tree.bind("<Down>", lambda event: self._move_focus(1))
+        self.tree.bind("<Prior>", lambda event: self._move_focus(-self.visible_rows))
+        self.tree.bind("<Next>", lambda event: self._move_focus(self.visible_rows))
+        self.tree.bind("<Home>", lambda event: self._move_focus(-self.total))
+        self.tree.bind("<End>", lambda event: self._move_focus(self.total))
+
+    def set_source(self, count_fn, fetch_fn):
+        """
+        设置数据源并从头开始显示
+
+        参数:
+            count_fn: 函数count_fn(callback)，获取数据源的总行数后调用callback(total)
+            fetch_fn: 函数fetch_fn(offset, limit, callback, after=None, before=None)，
+                获取行后调用callback(rows)，rows是(任务ID, 列值元组)的列表。
+                after/before是已缓存的相邻行的任务ID，数据源可以据此用键集分页
+                读取紧跟在after之后或紧挨在before之前的limit行，而不必使用OFFSET
+        """
+        self.count_fn = count_fn
+        self.fetch_fn = fetch_fn
+        self.first = 0
+        self._selected = {}
+        self.refresh()
+
+    def clear(self):
+        """
+        清空列表并移除数据源
+        """
+        self.count_fn = None
+        self.fetch_fn = None
+        self.total = 0
+        self.first = 0
+        self._selected = {}
+        self._invalidate()
+        self._render()
+
+    def refresh(self):
+        """
+        丢弃缓存并重新从数据源加载，保持当前滚动位置
+        """
+        self._invalidate()
+        if not self.count_fn:
+            self.total = 0
+            self._render()
+            return
+        generation = self._generation
+
+        def on_count(total):
+            """收到总行数后重新绘制"""
+            if generation != self._generation:
+                return
+            self.total = total
+            self._render()
+
+        self.count_fn(on_count)
+
+    def selection(self):
+        """
+        获取选中的任务ID
+
+        返回:
+            按选择顺序排列的任务ID列表
+        """
+        return list(self._selected)
+
+    def clear_selection(self):
+        """
+        取消所有选择，包括视口外的行
+        """
+        self._selected = {}
+        self.tree.selection_set([])
+
+    def scroll(self, delta):
+        """
+        滚动指定的行数
+
+        参数:
+            delta: 滚动的行数，负数向上，正数向下
+        """
+        self.first += delta
+        self._render()
+        return "break"
+
+    def contains(self, task_id):
+        """
+        判断任务是否在已缓存的行中
+
+        参数:
+            task_id: 任务ID
+
+        返回:
+            在缓存中时返回True，视口附近以外的行不在缓存中
+        """
+        return self._cache_index(task_id) is not None
+
+    def row_values(self, task_id):
+        """
+        获取缓存中一行的列值
+
+        参数:
+            task_id: 任务ID
+
+        返回:
+            列值元组，不在缓存中时返回None
+        """
+        index = self._cache_index(task_id)
+        return self._rows[index][1] if index is not None else None
+
+    def update_row(self, task_id, values):
+        """
+        原地更新一行
+
+        参数:
+            task_id: 任务ID
+            values: 新的列值元组
+
+        作用:
+            只更新缓存中的这一行，如果该行在视口内则只修改对应的Treeview项
+        """
+        index = self._cache_index(task_id)
+        if index is not None:
+            self._rows[index] = (task_id, values)
+        if self.tree.exists(str(task_id)):
+            self.tree.item(str(task_id), values=values)
+
+    def append_row(self, task_id, values):
+        """
+        在数据源末尾追加一行
+
+        参数:
+            task_id: 任务ID
+            values: 列值元组
+
+        作用:
+            新任务按ID排序总是位于末尾，只有当末尾在视口内时才插入一个Treeview项，
+            滚动位置和选择状态保持不变
+        """
+        position = self.total
+        self.total += 1
+        # 如果缓存覆盖到末尾，直接追加到缓存
+        if self._cache_start + len(self._rows) == position:
+            self._rows.append((task_id, values))
+        # 如果末尾在视口内，插入一个Treeview项
+        if position < self.first + self.visible_rows:
+            self.tree.insert("", tk.END, iid=str(task_id), values=values, tags=("task_item",))
+        self._update_scrollbar()
+
+    def remove_row(self, task_id):
+        """
+        删除一行
+
+        参数:
+            task_id: 任务ID
+
+        作用:
+            从缓存中删除这一行，如果该行在视口内则删除对应的Treeview项，
+            并从缓存中补充一行以填满视口
+        """
+        self._selected.pop(task_id, None)
+        index = self._cache_index(task_id)
+        if index is None:
+            # 不在缓存中，无法确定它的位置，重新获取视口内的行
+            self.total = max(0, self.total - 1)
+            self._invalidate()
+            self._render()
+            return
+
+        position = self._cache_start + index
+        del self._rows[index]
+        self.total -= 1
+
+        if not self.tree.exists(str(task_id)):
+            # 删除的行在视口上方，视口跟着上移一行，显示的内容保持不变
+            if position < self.first:
+                self.first -= 1
+            self._update_scrollbar()
+            return
+
+        self.tree.delete(str(task_id))
+        bottom = self.first + self.visible_rows - 1
+        if bottom < self.total:
+            # 视口下方还有行，补充到视口底部
+            row = self._cached_row(bottom)
+            if row is None:
+                self._render()
+                return
+            self.tree.insert("", tk.END, iid=str(row[0]), values=row[1], tags=("task_item",))
+        elif self.first > 0:
+            # 已经到达末尾，视口上移一行，补充到视口顶部
+            self.first -= 1
+            row = self._cached_row(self.first)
+            if row is None:
+                self._render()
+                return
+            self.tree.insert("", 0, iid=str(row[0]), values=row[1], tags=("task_item",))
+        self._update_scrollbar()
+
+    def _cache_index(self, task_id):
+        """
+        查找任务在缓存中的下标
+
+        返回:
+            缓存下标，如果不在缓存中则返回None
+        """
+        for index, row in enumerate(self._rows):
+            if row[0] == task_id:
+                return index
+        return None
+
+    def _cached_row(self, position):
+        """
+        获取数据源中指定位置的已缓存行
+
+        返回:
+            (任务ID, 列值元组)，如果不在缓存中则返回None
+        """
+        index = position - self._cache_start
+        if 0 <= index < len(self._rows):
+            return self._rows[index]
+        return None
+
+    def _invalidate(self):
+        """
+        丢弃已缓存的行
+
+        作用:
+            同时使正在进行中的获取请求失效
+        """
+        self._generation += 1
+        self._pending_fetch = None
+        self._cache_start = 0
+        self._rows = []
+
+    def _ensure_cached(self, start, end):
+        """
+        确保数据源中[start, end)范围内的行已缓存
+
+        作用:
+            如果范围已在缓存中则不做任何事，否则连同上下缓冲区一次性异步获取，
+            获取完成后重新绘制。已有获取请求在进行中时不会重复请求。
+            滚动到与缓存相邻的范围时，把相邻的已缓存行作为锚点传给数据源；
+            拖动滚动条等远距离跳转时没有锚点，数据源按位置获取
+        """
+        if start >= self._cache_start and end <= self._cache_start + len(self._rows):
+            return
+        if not self.fetch_fn or self._pending_fetch is not None:
+            return
+        # 在请求范围两侧各多取buffer_rows行
+        fetch_start = max(0, start - self.buffer_rows)
+        limit = (end - start) + 2 * self.buffer_rows
+        generation = self._generation
+        self._pending_fetch = (fetch_start, fetch_start + limit)
+
+        # 查找锚点
+        cache_end = self._cache_start + len(self._rows)
+        after = before = None
+        if self._cache_start < fetch_start <= cache_end:
+            # 向下滚动：新范围的前一行已缓存
+            after = self._rows[fetch_start - 1 - self._cache_start][0]
+        elif self._cache_start <= fetch_start + limit < cache_end:
+            # 向上滚动：新范围的后一行已缓存
+            before = self._rows[fetch_start + limit - self._cache_start][0]
+
+        def on_rows(rows):
+            """收到行后替换缓存并重新绘制"""
+            if generation != self._generation:
+                return
+            self._pending_fetch = None
+            self._cache_start = fetch_start
+            self._rows = list(rows)
+            self._render()
+
+        self.fetch_fn(fetch_start, limit, on_rows, after=after, before=before)
+
+    def _render(self):
+        """
+        重新绘制视口内的行
+
+        作用:
+            只为视口内可见的行创建Treeview项，并同步滚动条和选择状态
+        """
+        # 限制视口位置在有效范围内
+        self.first = max(0, min(self.first, self.total - self.visible_rows))
+        end = min(self.total, self.first + self.visible_rows)
+        self._ensure_cached(self.first, end)
+
+        # 删除旧的行，视口内的行数是固定的，因此开销是常数
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+
+        # 插入视口内已缓存的行，任务ID作为Treeview项的ID
+        # 尚未获取到的行暂时不显示，获取完成后会再次绘制
+        for index in range(self.first - self._cache_start, end - self._cache_start):
+            if index < 0:
+                continue
+            if index >= len(self._rows):
+                break
+            task_id, values = self._rows[index]
+            self.tree.insert("", tk.END, iid=str(task_id), values=values, tags=("task_item",))
+
+        # 恢复视口内的选择状态
+        visible_selected = [str(task_id) for task_id in self._selected if self.tree.exists(str(task_id))]
+        self.tree.selection_set(visible_selected)
+
+        # 更新滚动条
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        """
+        根据视口位置和总行数更新滚动条
+        """
+        if self.total:
+            end = min(self.total, self.first + self.visible_rows)
+            self.scrollbar.set(self.first / self.total, end / self.total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _on_configure(self, event):
+        """
+        处理窗口大小变化
+
+        参数:
+            event: Tkinter事件对象
+        """
+        # 减去一行作为列标题的高度
+        visible_rows = max(1, event.height // ROW_HEIGHT - 1)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self._render()
+
+    def _on_scrollbar(self, *args):
+        """
+        处理滚动条拖动和点击
+
+        参数:
+            args: 滚动条命令参数，("moveto", 比例)或("scroll", 数量, "units"/"pages")
+        """
+        if args[0] == "moveto":
+            self.first = int(float(args[1]) * self.total)
+            self._render()
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.visible_rows
+            self.scroll(amount)
+
+    def _on_mousewheel(self, event):
+        """
+        处理鼠标滚轮事件
+
+        参数:
+            event: Tkinter事件对象，delta为滚动量
+        """
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    def _on_select(self, event):
+        """
+        同步用户在视口内的选择
+
+        参数:
+            event: Tkinter事件对象
+        """
+        # 视口内的行以Treeview的选择为准，视口外的行保持原有状态
+        visible = {int(item) for item in self.tree.get_children()}
+        selected = [int(item) for item in self.tree.selection()]
+        self._selected = {task_id: None for task_id in self._selected if task_id not in visible}
+        for task_id in selected:
+            self._selected[task_id] = None
+
+    def _move_focus(self, delta):
+        """
+        移动焦点行，必要时滚动视口
+
+        参数:
+            delta: 移动的行数，负数向上，正数向下
+        """
+        if not self.total:
+            return "break"
+
+        # 计算焦点行在数据源中的位置
+        focus = self.tree.focus()
+        if focus and self.tree.exists(focus):
+            index = self.first + self.tree.index(focus)
+        else:
+            index = self.first
+        target = max(0, min(self.total - 1, index + delta))
+
+        # 如果目标行在视口外，滚动视口
+        if target < self.first:
+            self.first = target
+        elif target >= self.first + self.visible_rows:
+            self.first = target - self.visible_rows + 1
+        self._render()
+
+        # 选中并聚焦目标行
+        row_index = target - self._cache_start
+        if 0 <= row_index < len(self._rows):
+            task_id = self._rows[row_index][0]
+            self._selected = {task_id: None}
+            self.tree.selection_set(str(task_id))
+            self.tree.focus(str(task_id))
+        return "break"